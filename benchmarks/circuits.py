@@ -0,0 +1,87 @@
+"""Builders for synthetic test circuits made from the builtin package"""
+import random
+
+from circuit import package_manager
+from circuit.backend.project import Project
+
+BUILTINS = "packages._builtins"
+
+
+def builtin_project(name="bench"):
+    """New project including every builtin component, and the package datas"""
+    package = package_manager.load_package(BUILTINS)
+    package_datas = {package.PACKAGE.uid(): package}
+    project = Project(name)
+    for chip in package.PACKAGE.get_ambiguous_component_names():
+        project.included_components[package.PACKAGE.mangled_name(chip)] = \
+            package.PACKAGE[chip]
+    return project, package_datas
+
+
+def _builtin(project, package_datas, name):
+    return project.getComponent("lcst._builtins." + name, package_datas)
+
+
+def connect(component, pin, endpoint):
+    """Wire pin `pin` of `component` to `endpoint`, reusing the pin's wire"""
+    p = component.get_pin(str(pin))
+    if p.linked_to_wire:
+        component.wire_connect(str(p.wire), f"p{pin}", endpoint)
+    else:
+        component.new_wire(f"p{pin}", endpoint)
+
+
+def add_nand(project, package_datas, id_="nand"):
+    """CMOS NAND gate, io pins a, b, y"""
+    nand = project.new_component(id_)
+    for label in ("a", "b", "y"):
+        nand.new_pin(0, 0)
+    for idx, label in enumerate(("a", "b", "y")):
+        nand.get_pin(str(idx)).label(label)
+        nand.mark_pin_as_io(str(idx))
+    for chip in ("vcc", "pmos_fet", "pmos_fet", "nmos_fet", "nmos_fet", "gnd"):
+        nand.add_chip(_builtin(project, package_datas, chip), 0, 0)
+    # pmos pins: drain, gate, source; nmos pins: source, gate, drain
+    nand.new_wire("c0.0", "c1.2")
+    nand.wire_connect("0", "c0.0", "c2.2")
+    connect(nand, 0, "c1.1")
+    connect(nand, 0, "c3.1")
+    connect(nand, 1, "c2.1")
+    connect(nand, 1, "c4.1")
+    connect(nand, 2, "c1.0")
+    connect(nand, 2, "c2.0")
+    connect(nand, 2, "c3.2")
+    nand.new_wire("c3.0", "c4.2")
+    nand.new_wire("c4.0", "c5.0")
+    return nand
+
+
+def add_tied_pulldown(project, package_datas, id_="pulldown"):
+    """NMOS with its gate tied to vcc pulling io pin "out" to gnd"""
+    pulldown = project.new_component(id_)
+    pulldown.new_pin(0, 0)
+    pulldown.get_pin("0").label("out")
+    pulldown.mark_pin_as_io("0")
+    for chip in ("vcc", "nmos_fet", "gnd"):
+        pulldown.add_chip(_builtin(project, package_datas, chip), 0, 0)
+    pulldown.new_wire("c0.0", "c1.1")
+    pulldown.new_wire("c1.0", "c2.0")
+    pulldown.new_wire("p0", "c1.2")
+    return pulldown
+
+
+def add_random_logic(project, package_datas, id_="logic", inputs=16,
+                     gates=500, seed=0):
+    """Random acyclic NAND network. Pins p0..p<inputs-1> are inputs, every
+    gate output gets its own pin after those"""
+    rng = random.Random(seed)
+    nand = add_nand(project, package_datas, id_ + "_nand")
+    logic = project.new_component(id_)
+    for _ in range(inputs + gates):
+        logic.new_pin(0, 0)
+    for k in range(gates):
+        logic.add_chip(nand, 0, 0)
+        connect(logic, rng.randrange(inputs + k), f"c{k}.0")
+        connect(logic, rng.randrange(inputs + k), f"c{k}.1")
+        connect(logic, inputs + k, f"c{k}.2")
+    return logic
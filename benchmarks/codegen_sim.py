@@ -0,0 +1,70 @@
+"""Steady-state cycles/sec of the compiled vs the interpreted simulator.
+
+Run from the repository root: python -m benchmarks.codegen_sim
+"""
+import random
+from time import perf_counter
+
+from circuitlogger import DBG, LOG_WARN
+from circuit.backend.flattener import Flattener
+from circuit.backend.simulator import Simulator, V0, V1, VX
+from circuit.backend.codegen import CompiledSimulator
+from .circuits import builtin_project, add_random_logic, add_nand
+
+INPUTS = 16
+GATES = 500
+CYCLES = 500
+
+
+def cycles_per_second(simulator, inputs, vectors):
+    start = perf_counter()
+    for vector in vectors:
+        for name, value in zip(inputs, vector):
+            simulator.set(name, value)
+        simulator.run()
+    return len(vectors) / (perf_counter() - start)
+
+
+def check_masked_x(project, package_datas):
+    """An x input masked by the other NAND input must show up again once
+    that input stops masking it"""
+    add_nand(project, package_datas)
+    flattener = Flattener(project, package_datas)
+    compiled = CompiledSimulator(flattener.flatten("nand"), flattener)
+    compiled.set("a", VX)
+    compiled.set("b", V0)
+    compiled.run()
+    assert compiled.probe("y") == V1
+    compiled.set("b", V1)
+    compiled.run()
+    assert compiled.probe("y") == VX
+
+
+def main():
+    DBG.set(LOG_WARN)
+    project, package_datas = builtin_project()
+    check_masked_x(project, package_datas)
+    add_random_logic(project, package_datas, "logic", INPUTS, GATES)
+    flattener = Flattener(project, package_datas)
+    template = flattener.flatten("logic")
+    inputs = [f"p{i}" for i in range(INPUTS)]
+    rng = random.Random(1)
+    vectors = [[rng.randrange(2) for _ in inputs] for _ in range(CYCLES)]
+
+    interpreted = Simulator(template, flattener)
+    interpreted.run()
+    start = perf_counter()
+    compiled = CompiledSimulator(template, flattener)
+    compile_time = perf_counter() - start
+
+    print(f"{GATES} NAND gates, {template.device_count} devices, "
+          f"{CYCLES} random input vectors")
+    print(f"compile time: {compile_time:8.3f}s")
+    t_interpreted = cycles_per_second(interpreted, inputs, vectors)
+    t_compiled = cycles_per_second(compiled, inputs, vectors)
+    print(f"interpreted:  {t_interpreted:8.0f} cycles/s")
+    print(f"compiled:     {t_compiled:8.0f} cycles/s ({t_compiled / t_interpreted:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Resolving console commands through the CCP command trie against the
+previous hasattr / getattr walk, and a 100k-line script run through
+execute against feeding its lines to process_command, with logging
+filtered out and with the script lines logged (LOG_DEBG, console output
+to /dev/null).
+
+Run from the repository root: python -m benchmarks.command_dispatch
+"""
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+from circuitlogger import DBG, LOG_DEBG, LOG_WARN, setup_logger, exit_logger, flush_logger
+from circuit.backend.terminal import CCP
+from thread_communicator import ServerData
+from .circuits import builtin_project
+from .script_logging import LINES, write_script
+
+COMMANDS = ["pin place 10 20", "chip place lcst._builtins.vcc 15 0", "pin io set 3",
+            "wire connect 0 p0 c1.0", "project meta set description text", "sim probe a b"]
+ROUNDS = 20000
+# script runs per case, the fastest one counts
+REPEATS = 3
+
+
+def hasattr_walk(ccp, command):
+    operation, *args = command.split()
+    for arg in args.copy():
+        if hasattr(ccp, f"{operation}_{arg}"):
+            operation = f"{operation}_{arg}"
+            del args[0]
+        else:
+            break
+    if hasattr(ccp, operation) and not operation.startswith("__"):
+        return getattr(ccp, operation), args
+    return None, args
+
+
+def trie_walk(ccp, command):
+    command, args = ccp.commands.resolve(command.split())
+    return command.method, command.arguments(args)
+
+
+def new_ccp():
+    _, package_datas = builtin_project()
+    return CCP(ServerData(package_datas))
+
+
+def run_lines(path, level) -> float:
+    ccp = new_ccp()
+    DBG.set(level)
+    start = perf_counter()
+    with open(path) as file:
+        for line in file:
+            ccp.process_command(line.removesuffix("\n"), help_on_fail=False)
+    flush_logger()
+    return perf_counter() - start
+
+
+def run_execute(path, level) -> float:
+    ccp = new_ccp()
+    DBG.set(level)
+    start = perf_counter()
+    ccp.execute(path)
+    flush_logger()
+    return perf_counter() - start
+
+
+def main():
+    DBG.set(LOG_WARN)
+    ccp = new_ccp()
+    for name, resolve in (("hasattr walk", hasattr_walk), ("command trie", trie_walk)):
+        start = perf_counter()
+        for _ in range(ROUNDS):
+            for command in COMMANDS:
+                resolve(ccp, command)
+        t_resolve = (perf_counter() - start) / (ROUNDS * len(COMMANDS))
+        print(f"{name}: {t_resolve * 1e6:.2f}us per command")
+
+    with tempfile.TemporaryDirectory() as directory:
+        script = os.path.join(directory, "script.txt")
+        write_script(script)
+        setup_logger(os.path.join(directory, "program.log"))
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+        try:
+            times = [(level,
+                      min(run_lines(script, level) for _ in range(REPEATS)),
+                      min(run_execute(script, level) for _ in range(REPEATS)))
+                     for level in (LOG_WARN, LOG_DEBG)]
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+            DBG.set(LOG_WARN)
+            exit_logger()
+    for level, t_lines, t_execute in times:
+        print(f"{LINES} line script, {'lines logged' if level == LOG_DEBG else 'quiet':12s}: "
+              f"{t_lines:.2f}s through process_command, {t_execute:.2f}s through execute")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Overhead of the console command statistics on a 100k-line script:
+recording off, timing only, and timing with tracemalloc allocations.
+
+Run from the repository root: python -m benchmarks.command_stats
+"""
+import os
+import tempfile
+from time import perf_counter
+
+from circuitlogger import DBG, LOG_WARN
+from circuit.backend.terminal import CCP
+from thread_communicator import ServerData
+from .circuits import builtin_project
+from .script_logging import LINES, write_script
+
+
+def run_script(path, stats=None):
+    _, package_datas = builtin_project()
+    ccp = CCP(ServerData(package_datas))
+    if stats is not None:
+        ccp.process_command(f"stats on {stats}")
+    start = perf_counter()
+    ccp.execute(path)
+    elapsed = perf_counter() - start
+    ccp.command_stats.disable()
+    return elapsed, ccp.command_stats
+
+
+def main():
+    DBG.set(LOG_WARN)
+    with tempfile.TemporaryDirectory() as directory:
+        script = os.path.join(directory, "script.txt")
+        write_script(script)
+        t_off, _ = run_script(script)
+        t_timed, _ = run_script(script, "")
+        t_alloc, alloc_stats = run_script(script, "alloc")
+    print(f"{LINES} line script: {t_off:.2f}s off, {t_timed:.2f}s timed "
+          f"({(t_timed / t_off - 1) * 100:+.0f}%), {t_alloc:.2f}s with allocations "
+          f"({(t_alloc / t_off - 1) * 100:+.0f}%)")
+    for line in alloc_stats.report():
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
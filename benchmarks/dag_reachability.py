@@ -0,0 +1,49 @@
+"""Places 10k chips across a deep component hierarchy.
+
+Run from the repository root: python -m benchmarks.dag_reachability
+"""
+from time import perf_counter
+
+from circuit.backend.dag import DAG
+from circuit.backend.project import Project
+
+DEPTH = 500
+CHIPS_PER_COMPONENT = 20
+FANOUT = 4
+
+
+class DFSDAG(DAG):
+    """Reference DAG answering reachability with a full DFS per query"""
+    def connection_exists(self, from_, to):
+        self.init_marked()
+        self.dfs(from_)
+        return self.marked[to]
+
+    def _update_closure(self, from_, to):
+        pass
+
+
+def place_chips(dag_class):
+    project = Project("bench")
+    project.ddag = dag_class()
+    components = [project.new_component(f"c{i}") for i in range(DEPTH)]
+    start = perf_counter()
+    for i, component in enumerate(components[:-1]):
+        # each level places chips of the next few levels below it
+        for j in range(CHIPS_PER_COMPONENT):
+            child = components[min(DEPTH - 1, i + 1 + j % FANOUT)]
+            component.add_chip(child, j, j)
+    return perf_counter() - start
+
+
+def main():
+    chips = (DEPTH - 1) * CHIPS_PER_COMPONENT
+    print(f"Placing {chips} chips over {DEPTH} nested components")
+    t_index = place_chips(DAG)
+    print(f"reachability index: {t_index:8.3f}s")
+    t_dfs = place_chips(DFSDAG)
+    print(f"dfs per query:      {t_dfs:8.3f}s ({t_dfs / t_index:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
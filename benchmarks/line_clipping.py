@@ -0,0 +1,81 @@
+"""WindowPane.lines against a WindowPane.line call per segment, for wire
+segments partly outside the pane; clipping alone and clipping + drawing.
+
+Needs pygame (numpy optional); runs without a display.
+Run from the repository root: python -m benchmarks.line_clipping
+"""
+import os
+import random
+from time import perf_counter
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+
+from gui import pane as pane_module
+from gui.pane import WindowPane, RootPane, clip_segments
+
+SIZE = (1200, 900)
+BOUNDS = (800, 600)
+SEGMENTS = 50000
+COLOR = (64, 192, 64)
+
+
+def random_segments(rng):
+    segments = []
+    for _ in range(SEGMENTS):
+        x, y = rng.randrange(-200, 1000), rng.randrange(-200, 800)
+        if rng.random() < 0.8:
+            # wires are mostly horizontal / vertical
+            length = rng.randrange(-100, 100)
+            end = (x + length, y) if rng.random() < 0.5 else (x, y + length)
+        else:
+            end = (x + rng.randrange(-100, 100), y + rng.randrange(-100, 100))
+        segments.append(((x, y), end))
+    return segments
+
+
+def timed(fn):
+    start = perf_counter()
+    result = fn()
+    return perf_counter() - start, result
+
+
+def main():
+    pygame.init()
+    dsp = pygame.display.set_mode(SIZE)
+    root = RootPane(dsp)
+    root.update()
+    pane = WindowPane(dsp, (50, 50), BOUNDS, root)
+    segments = random_segments(random.Random(0))
+    print(f"{SEGMENTS} segments, numpy {'installed' if pane_module.numpy else 'missing'}")
+
+    numpy = pane_module.numpy
+    # warm up
+    clip_segments(segments, 0, 0, *BOUNDS)
+    t_clip_numpy, clipped = timed(lambda: clip_segments(segments, 0, 0, *BOUNDS))
+    pane_module.numpy = None
+    t_clip_python, expected = timed(lambda: clip_segments(segments, 0, 0, *BOUNDS))
+    pane_module.numpy = numpy
+    assert len(clipped) == len(expected)
+    assert all(abs(a - b) < 1e-6 for c, e in zip(clipped, expected) for a, b in zip(c, e))
+
+    def per_line():
+        for start, end in segments:
+            pane.line(COLOR, start, end, 1)
+
+    t_line, _ = timed(per_line)
+    t_lines, _ = timed(lambda: pane.lines(COLOR, segments, 1))
+    pane_module.numpy = None
+    t_lines_python, _ = timed(lambda: pane.lines(COLOR, segments, 1))
+    pane_module.numpy = numpy
+    print(f"{len(clipped)} segments survive clipping")
+    print(f"clip only:   python {t_clip_python * 1000:8.1f}ms"
+          + (f"  numpy {t_clip_numpy * 1000:8.1f}ms" if numpy else ""))
+    print(f"clip + draw: line() {t_line * 1000:8.1f}ms  lines() python "
+          f"{t_lines_python * 1000:8.1f}ms ({t_line / t_lines_python:.1f}x)"
+          + (f"  numpy {t_lines * 1000:8.1f}ms ({t_line / t_lines:.1f}x)" if numpy else ""))
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Frame time of panning a ComponentView across a component with 50k
+placed chips, drawn as labeled boxes and from cached surfaces, and of
+drawing the whole view (after zooming).
+
+Needs pygame; runs without a display (SDL dummy video driver).
+Run from the repository root: python -m benchmarks.lod_renderer
+"""
+import os
+import random
+from time import perf_counter
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+
+from circuitlogger import DBG, LOG_WARN
+from configuration import LOD_CACHE_BYTES
+from gui.pane import WindowPane, RootPane
+from gui.renderer import Renderer
+from gui.lod import ComponentView
+from gui.surface_cache import SurfaceCache
+from .circuits import builtin_project
+
+SIZE = (1600, 1000)
+CHIPS = 50000
+TYPES = 8
+AREA = 12000
+FRAMES = 120
+# zoom, pan step in pixels
+RUNS = ((0.25, (23, 11)), (0.5, (23, 11)), (1.0, (23, 11)), (4.0, (23, 11)))
+
+
+def build_component(project, rng):
+    types = []
+    for i in range(TYPES):
+        part = project.new_component(f"part{i}")
+        part.metadata.update({"width": 16, "height": 10,
+                              "background-color": f"#{rng.randrange(0x1000000):06x}",
+                              "box-label": f"P{i}"})
+        for j in range(4):
+            part.new_pin(0, 2 + 2 * j)
+            part.new_pin(16, 2 + 2 * j)
+        for j in range(4):
+            part.new_wire(f"p{2 * j}", f"p{2 * j + 1}")
+        types.append(part)
+    top = project.new_component("top")
+    for _ in range(CHIPS):
+        top.add_chip(rng.choice(types), rng.randrange(AREA), rng.randrange(AREA))
+    return top
+
+
+def main():
+    DBG.set(LOG_WARN)
+    pygame.init()
+    dsp = pygame.display.set_mode(SIZE)
+    font = pygame.font.Font(None, 14)
+    root = RootPane(dsp)
+    root.update()
+    pane = WindowPane(dsp, (10, 10), (SIZE[0] - 20, SIZE[1] - 20), root, 0x101010)
+    project, _ = builtin_project()
+    top = build_component(project, random.Random(0))
+
+    renderer = Renderer(root)
+    cache = SurfaceCache(LOD_CACHE_BYTES)
+    start = perf_counter()
+    view = ComponentView(top, font, AREA / 3, AREA / 3, cache=cache)
+    print(f"{CHIPS} chips, view built in {perf_counter() - start:.3f}s")
+    renderer.add(pane, view)
+    renderer.render()
+    for zoom, (dx, dy) in RUNS:
+        view.set_zoom(zoom)
+        start = perf_counter()
+        renderer.render()
+        t_full = perf_counter() - start
+        visible = len(view.visible_chips(pane))
+        start = perf_counter()
+        for frame in range(FRAMES):
+            # back and forth, so the view stays over the chips
+            sign = 1 if frame // 30 % 2 == 0 else -1
+            view.pan(sign * dx, sign * dy)
+            renderer.render()
+        t_frame = (perf_counter() - start) / FRAMES
+        print(f"zoom {view.zoom:5.2f}: {visible:6d} chips visible, "
+              f"{t_frame * 1000:6.2f}ms per panned frame ({1 / t_frame:.0f} fps), "
+              f"full frame {t_full * 1000:.1f}ms")
+    print(f"surface cache: {cache.stats()}")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
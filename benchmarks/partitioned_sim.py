@@ -0,0 +1,69 @@
+"""Cycles/sec of the partitioned simulator for 1/2/4/8 worker processes.
+
+Run from the repository root: python -m benchmarks.partitioned_sim
+"""
+import os
+import random
+from time import perf_counter
+
+from circuitlogger import DBG, LOG_WARN
+from circuit.backend.flattener import Flattener
+from circuit.backend.simulator import Simulator, TimedSimulator, V0
+from circuit.backend.partition import PartitionedSimulator
+from .circuits import builtin_project, add_random_logic, add_tied_pulldown
+
+INPUTS = 32
+GATES = 4000
+CYCLES = 50
+WORKERS = (1, 2, 4, 8)
+
+
+def cycles_per_second(simulator, inputs, vectors):
+    start = perf_counter()
+    for vector in vectors:
+        for name, value in zip(inputs, vector):
+            simulator.set(name, value)
+        simulator.run()
+    return len(vectors) / (perf_counter() - start)
+
+
+def check_supply_gates(project, package_datas):
+    """Transistors gated by a supply conduct from the start in every
+    simulator"""
+    add_tied_pulldown(project, package_datas)
+    flattener = Flattener(project, package_datas)
+    template = flattener.flatten("pulldown")
+    simulators = [Simulator(template, flattener), TimedSimulator(template, flattener)]
+    with PartitionedSimulator(template, flattener, 2) as partitioned:
+        for simulator in simulators + [partitioned]:
+            simulator.run()
+            assert simulator.probe("out") == V0, type(simulator).__name__
+
+
+def main():
+    DBG.set(LOG_WARN)
+    project, package_datas = builtin_project()
+    check_supply_gates(project, package_datas)
+    add_random_logic(project, package_datas, "logic", INPUTS, GATES)
+    flattener = Flattener(project, package_datas)
+    template = flattener.flatten("logic")
+    inputs = [f"p{i}" for i in range(INPUTS)]
+    rng = random.Random(1)
+    vectors = [[rng.randrange(2) for _ in inputs] for _ in range(CYCLES)]
+
+    print(f"{GATES} NAND gates, {template.device_count} devices, "
+          f"{CYCLES} random input vectors, {os.cpu_count()} cpus")
+    single = Simulator(template, flattener)
+    single.run()
+    t_single = cycles_per_second(single, inputs, vectors)
+    print(f"single process: {t_single:8.1f} cycles/s")
+    for workers in WORKERS:
+        with PartitionedSimulator(template, flattener, workers) as simulator:
+            simulator.run()
+            t = cycles_per_second(simulator, inputs, vectors)
+            assert simulator.events == single.events
+        print(f"{workers} workers:      {t:8.1f} cycles/s ({t / t_single:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
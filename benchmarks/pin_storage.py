@@ -0,0 +1,82 @@
+"""Memory per pin and (de)serialization times of a component's pins as a
+dict of Pin objects and as a PinTable.
+
+Run from the repository root: python -m benchmarks.pin_storage
+"""
+import random
+import tracemalloc
+from time import perf_counter
+
+from circuit.base_classes import Pin, PinTable, serialize
+
+PINS = 200000
+LABELED = 0.01
+
+
+class DictPin:
+    """A pin as it was before Pin got __slots__: attributes in a dict"""
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.has_label = False
+        self.label_ = ""
+        self.linked_to_wire = False
+        self.wire = -1
+        self.owner = None
+
+
+def pin_json(seed=0) -> dict:
+    rng = random.Random(seed)
+    json = {}
+    for pid in range(PINS):
+        pin = {"wire": pid // 4, "x": rng.randrange(1000), "y": rng.randrange(1000)}
+        if rng.random() < LABELED:
+            pin["label"] = f"l{pid}"
+        json[str(pid)] = pin
+    return json
+
+
+def measure(build):
+    tracemalloc.start()
+    start = perf_counter()
+    pins = build()
+    elapsed = perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pins, size / PINS, elapsed
+
+
+def dict_pins(json, cls):
+    pins = {}
+    for k, d in json.items():
+        pin = cls(d["x"], d["y"])
+        if "label" in d:
+            pin.has_label = True
+            pin.label_ = d["label"]
+        pin.linked_to_wire = True
+        pin.wire = d["wire"]
+        pins[k] = pin
+    return pins
+
+
+def main():
+    json = pin_json()
+    _, dict_size, _ = measure(lambda: dict_pins(json, DictPin))
+    pins, slots_size, t_objects = measure(lambda: {k: Pin.from_json(d) for k, d in json.items()})
+    table, table_size, t_table = measure(lambda: PinTable.from_json(json))
+    start = perf_counter()
+    assert serialize(pins) == json
+    t_objects_out = perf_counter() - start
+    start = perf_counter()
+    assert table.serialize() == json
+    t_table_out = perf_counter() - start
+    print(f"{PINS} pins, {LABELED:.0%} labeled")
+    print(f"{'':18} {'bytes/pin':>9} {'load':>8} {'save':>8}")
+    print(f"dict pin objects:  {dict_size:9.1f}")
+    print(f"Pin objects:       {slots_size:9.1f} {t_objects:8.3f} {t_objects_out:8.3f}")
+    print(f"PinTable:          {table_size:9.1f} {t_table:8.3f} {t_table_out:8.3f} "
+          f"({dict_size / table_size:.0f}x less memory)")
+
+
+if __name__ == "__main__":
+    main()
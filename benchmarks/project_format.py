@@ -0,0 +1,90 @@
+"""Save/load times of the JSON and the binary project format for a
+synthetic project with a million pins.
+
+Run from the repository root: python -m benchmarks.project_format
+"""
+import random
+from os import walk
+from os.path import join, getsize
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from circuitlogger import DBG, LOG_WARN
+from circuit.base_classes import Pin, Wire, Chip
+from circuit.backend.project import Project
+from circuit.backend.binary_project import save_binary, load_binary
+from .circuits import builtin_project
+
+COMPONENTS = 100
+PINS_PER_COMPONENT = 10000
+CHIPS_PER_COMPONENT = 500
+PINS_PER_WIRE = 4
+
+
+def build_project(seed=0) -> Project:
+    rng = random.Random(seed)
+    project, _ = builtin_project("format")
+    ids = []
+    for i in range(COMPONENTS):
+        c = project.new_component(f"c{i}")
+        for pid in range(PINS_PER_COMPONENT):
+            pin = Pin(rng.randrange(1000), rng.randrange(1000))
+            if pid % 100 == 0:
+                pin.label(f"bus{pid // 100}")
+            c.pins[str(pid)] = pin
+        for iid in range(16):
+            c.io_pins[str(iid)] = iid
+        # leaf components place builtins, the others earlier components
+        for cid in range(CHIPS_PER_COMPONENT if ids else 0):
+            c.chips[str(cid)] = Chip(None, cid, cid, rng.choice(ids))
+        for wid in range(PINS_PER_COMPONENT // PINS_PER_WIRE):
+            wire = Wire()
+            first = wid * PINS_PER_WIRE
+            for pid in range(first, first + PINS_PER_WIRE):
+                c.pins[str(pid)].link_to_wire(wid)
+                if pid > first:
+                    wire.connect(f"p{first}", f"p{pid}")
+            c.wires[str(wid)] = wire
+        c.sync_indices()
+        ids.append(c.id_)
+    return project
+
+
+def timed(fn, *args):
+    start = perf_counter()
+    result = fn(*args)
+    return perf_counter() - start, result
+
+
+def load_all(project, package_datas):
+    for ckey in project.config["components"]:
+        project.getComponent(ckey, package_datas)
+
+
+def size(path) -> int:
+    return sum(getsize(join(root, f)) for root, _, files in walk(path) for f in files)
+
+
+def main():
+    DBG.set(LOG_WARN)
+    _, package_datas = builtin_project()
+    project = build_project()
+    print(f"{COMPONENTS} components, {COMPONENTS * PINS_PER_COMPONENT} pins")
+    with TemporaryDirectory() as tmp:
+        json_path = join(tmp, "json")
+        binary_path = join(tmp, "project.lcsp")
+        t_json_save, _ = timed(project.save, json_path)
+        t_binary_save, _ = timed(save_binary, project, binary_path)
+        t_json_open, loaded = timed(Project.load, json_path, package_datas)
+        t_json_all, _ = timed(load_all, loaded, package_datas)
+        t_binary_open, loaded = timed(load_binary, binary_path, package_datas)
+        t_binary_all, _ = timed(load_all, loaded, package_datas)
+        print(f"           {'save':>8} {'open':>8} {'all':>8} {'size':>8}")
+        print(f"json:      {t_json_save:8.3f} {t_json_open:8.3f} "
+              f"{t_json_open + t_json_all:8.3f} {size(json_path) >> 20:6d}MB")
+        print(f"binary:    {t_binary_save:8.3f} {t_binary_open:8.3f} "
+              f"{t_binary_open + t_binary_all:8.3f} {getsize(binary_path) >> 20:6d}MB")
+
+
+if __name__ == "__main__":
+    main()
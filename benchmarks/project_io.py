@@ -0,0 +1,120 @@
+"""Serial vs pooled component I/O on a synthetic 10k-component project:
+loading a config without children lists (every file parsed up front),
+loading every component of a lazy project, and saving to a new directory.
+
+Run from the repository root: python -m benchmarks.project_io
+"""
+import os
+import random
+from json import dumps
+from os import makedirs
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from circuitlogger import DBG, LOG_WARN
+import configuration
+from circuit.backend.project import Project
+from .circuits import builtin_project
+
+COMPONENTS = 10000
+PINS_PER_COMPONENT = 40
+CHIPS_PER_COMPONENT = 3
+WINDOW = 50
+# (label, IO_POOL_SIZE, IO_PARSE_PROCESSES)
+MODES = (("serial", 1, False), ("threads", 8, False), ("processes", 8, True))
+
+
+def component_json(rng, children: list[str]) -> dict:
+    pins = {
+        str(pid): {"x": rng.randrange(1000), "y": rng.randrange(1000),
+                   "wire": pid // 4}
+        for pid in range(PINS_PER_COMPONENT)
+    }
+    wires = {
+        str(wid): {"connections": [
+            {"from": {"type": "pin", "id": str(wid * 4)},
+             "to": {"type": "pin", "id": str(wid * 4 + i)}}
+            for i in range(1, 4)
+        ]}
+        for wid in range(PINS_PER_COMPONENT // 4)
+    }
+    return {
+        "component-meta": {"data-version": 1, "width": 10, "height": 10},
+        "pins": pins,
+        "io-pins": {"0": 0, "1": 1},
+        "subcomponents": {
+            str(cid): {"x": 0, "y": 0, "type": child}
+            for cid, child in enumerate(children)
+        },
+        "wires": wires
+    }
+
+
+def write_project(path, with_children, seed=0):
+    rng = random.Random(seed)
+    makedirs(join(path, "components"))
+    ids = [f"c{i}" for i in range(COMPONENTS)]
+    components = {}
+    for i, id_ in enumerate(ids):
+        children = [rng.choice(ids[max(0, i - WINDOW):i])
+                    for _ in range(CHIPS_PER_COMPONENT)] if i else []
+        with open(join(path, "components", id_ + ".json"), "w") as file:
+            file.write(dumps(component_json(rng, children), indent=4))
+        components[id_] = {"name": id_, "path": id_ + ".json"}
+        if with_children:
+            components[id_]["children"] = sorted(set(children))
+    config = {
+        "meta": {"data-version": 1, "name": "big", "description": ""},
+        "settings": {"true_subsize": False},
+        # no root: nothing is prefetched in the background
+        "root-component": {"id": None},
+        "required-packages": {},
+        "components": components
+    }
+    with open(join(path, "config.json"), "w") as file:
+        file.write(dumps(config))
+
+
+def timed(fn, *args):
+    start = perf_counter()
+    result = fn(*args)
+    return perf_counter() - start, result
+
+
+def shape(project: Project):
+    """What has to come out the same whatever the pool does"""
+    return (
+        list(project.config["components"]),
+        project.ddag.topo_order(f"c{COMPONENTS - 1}"),
+        [cw.serialize() for cw in project.config["components"].values()],
+    )
+
+
+def main():
+    DBG.set(LOG_WARN)
+    _, package_datas = builtin_project()
+    print(f"{COMPONENTS} components, {PINS_PER_COMPONENT} pins each, "
+          f"{os.cpu_count()} cpus")
+    with TemporaryDirectory() as tmp:
+        eager_path = join(tmp, "eager")
+        lazy_path = join(tmp, "lazy")
+        write_project(eager_path, False)
+        write_project(lazy_path, True)
+        print(f"{'':10} {'load':>8} {'load all':>8} {'save':>8}")
+        expected = None
+        for label, size, processes in MODES:
+            configuration.IO_POOL_SIZE = size
+            configuration.IO_PARSE_PROCESSES = processes
+            t_load, project = timed(Project.load, eager_path, package_datas)
+            lazy = Project.load(lazy_path, package_datas)
+            t_all, _ = timed(lazy.load_components)
+            t_save, _ = timed(project.save, join(tmp, label))
+            if expected is None:
+                expected = shape(project)
+            assert shape(project) == expected and shape(lazy) == expected
+            print(f"{label:10} {t_load:8.3f} {t_all:8.3f} {t_save:8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Project.load of a synthetic 5000-component project, with a config that
+lists every component's children (lazy loading) and with an older config
+that doesn't (every component file is parsed up front).
+
+Run from the repository root: python -m benchmarks.project_load
+"""
+import random
+from json import dumps
+from os import makedirs
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import perf_counter, sleep
+
+from circuitlogger import DBG, LOG_WARN
+from circuit.backend.project import Project
+from .circuits import builtin_project
+
+COMPONENTS = 5000
+CHIPS_PER_COMPONENT = 3
+# chips place one of the last few components before them
+WINDOW = 50
+
+
+def component_json(children: list[str]) -> dict:
+    return {
+        "component-meta": {"data-version": 1, "width": 10, "height": 10},
+        "pins": {},
+        "io-pins": {},
+        "subcomponents": {
+            str(cid): {"x": 0, "y": 0, "type": child}
+            for cid, child in enumerate(children)
+        },
+        "wires": {}
+    }
+
+
+def write_project(path, with_children, seed=0):
+    rng = random.Random(seed)
+    makedirs(join(path, "components"))
+    ids = [f"c{i}" for i in range(COMPONENTS)]
+    components = {}
+    for i, id_ in enumerate(ids):
+        children = [rng.choice(ids[max(0, i - WINDOW):i])
+                    for _ in range(CHIPS_PER_COMPONENT)] if i else []
+        with open(join(path, "components", id_ + ".json"), "w") as file:
+            file.write(dumps(component_json(children)))
+        components[id_] = {"name": id_, "path": id_ + ".json"}
+        if with_children:
+            components[id_]["children"] = sorted(set(children))
+    config = {
+        "meta": {"data-version": 1, "name": "big", "description": ""},
+        "settings": {"true_subsize": False},
+        "root-component": {"id": ids[-1]},
+        "required-packages": {},
+        "components": components
+    }
+    with open(join(path, "config.json"), "w") as file:
+        file.write(dumps(config))
+
+
+def load(path, package_datas):
+    start = perf_counter()
+    project = Project.load(path, package_datas)
+    return perf_counter() - start, project
+
+
+def main():
+    DBG.set(LOG_WARN)
+    _, package_datas = builtin_project()
+    with TemporaryDirectory() as tmp:
+        lazy_path = join(tmp, "lazy")
+        eager_path = join(tmp, "eager")
+        write_project(lazy_path, True)
+        write_project(eager_path, False)
+        print(f"{COMPONENTS} components, {CHIPS_PER_COMPONENT} chips each")
+        t_eager, _ = load(eager_path, package_datas)
+        print(f"without children in config: {t_eager:8.3f}s")
+        t_lazy, project = load(lazy_path, package_datas)
+        print(f"lazy:                       {t_lazy:8.3f}s ({t_eager / t_lazy:.0f}x)")
+        wrappers = project.config["components"].values()
+        start = perf_counter()
+        while project.prefetch_thread.is_alive():
+            sleep(0.01)
+        parsed = sum(cw.is_prefetched for cw in wrappers)
+        print(f"prefetched {parsed} component files reachable from the root "
+              f"in another {perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
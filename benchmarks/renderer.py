@@ -0,0 +1,65 @@
+"""Frame time of the dirty-rectangle renderer for a single wire edit on a
+dense schematic, against redrawing everything.
+
+Needs pygame; runs without a display (SDL dummy video driver).
+Run from the repository root: python -m benchmarks.renderer
+"""
+import os
+import random
+from time import perf_counter
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+
+from gui.pane import WindowPane, RootPane
+from gui.renderer import Renderer, RectItem, WireItem
+
+SIZE = (1600, 1000)
+CHIPS = 5000
+WIRES = 20000
+EDITS = 200
+
+
+def build(renderer, pane, rng):
+    w, h = pane.bounds
+    for _ in range(CHIPS):
+        renderer.add(pane, RectItem(rng.randrange(w), rng.randrange(h), 12, 8, 0x3060a0))
+    wires = []
+    for _ in range(WIRES):
+        x, y = rng.randrange(w), rng.randrange(h)
+        wire = WireItem([((x, y), (x + rng.randrange(-30, 30), y)),
+                         ((x + 10, y), (x + 10, y + rng.randrange(-30, 30)))], 0x40c040)
+        renderer.add(pane, wire)
+        wires.append(wire)
+    return wires
+
+
+def main():
+    pygame.init()
+    dsp = pygame.display.set_mode(SIZE)
+    root = RootPane(dsp)
+    root.update()
+    schematic = WindowPane(dsp, (10, 10), (SIZE[0] - 20, SIZE[1] - 20), root, 0x101010)
+    renderer = Renderer(root)
+    rng = random.Random(0)
+    wires = build(renderer, schematic, rng)
+
+    start = perf_counter()
+    renderer.render()
+    t_full = perf_counter() - start
+    print(f"{CHIPS} chips, {WIRES} wires: full frame {t_full * 1000:.1f}ms")
+
+    start = perf_counter()
+    for _ in range(EDITS):
+        wire = rng.choice(wires)
+        (x, y), _ = wire.segments[0]
+        wire.set_segments([((x, y), (x + rng.randrange(-30, 30), y))])
+        renderer.render()
+    t_edit = (perf_counter() - start) / EDITS
+    print(f"single wire edit: {t_edit * 1000:.2f}ms per frame "
+          f"({t_full / t_edit:.0f}x faster than a full frame)")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
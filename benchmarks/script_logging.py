@@ -0,0 +1,75 @@
+"""A 100k-line console script run with verbose logging to the console and
+program.log, against the same run with logging filtered out, and the
+cost of a single log() call.
+
+Run from the repository root: python -m benchmarks.script_logging
+"""
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+from circuitlogger import (DBG, LOG_BASE, LOG_VERB, LOG_WARN, log, setup_logger,
+                           exit_logger, flush_logger)
+from circuit.backend.terminal import CCP
+from thread_communicator import ServerData
+from .circuits import builtin_project
+
+LINES = 100000
+CALLS = 200000
+
+
+def write_script(path):
+    with open(path, "w") as f:
+        f.write("project new bench\ncomponent add top\ncomponent select top\n")
+        for i in range(LINES - 3):
+            f.write(f"pin place {i % 1000} {i // 1000}\n")
+
+
+def run_script(path, level):
+    _, package_datas = builtin_project()
+    ccp = CCP(ServerData(package_datas))
+    DBG.set(level)
+    start = perf_counter()
+    ccp.execute(path)
+    flush_logger()
+    return perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        script = os.path.join(directory, "script.txt")
+        write_script(script)
+        setup_logger(os.path.join(directory, "program.log"))
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+        try:
+            t_quiet = run_script(script, LOG_WARN)
+            t_verbose = run_script(script, LOG_BASE)
+
+            DBG.set(LOG_WARN)
+            start = perf_counter()
+            for i in range(CALLS):
+                log(LOG_VERB, "Loading component %s from %s", i, directory)
+            t_filtered = (perf_counter() - start) / CALLS
+            DBG.set(LOG_BASE)
+            start = perf_counter()
+            for i in range(CALLS):
+                log(LOG_VERB, "Loading component %s from %s", i, directory)
+            t_queued = (perf_counter() - start) / CALLS
+            flush_logger()
+            t_written = (perf_counter() - start) / CALLS
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+            DBG.set(LOG_WARN)
+            exit_logger()
+        log_lines = sum(1 for _ in open(os.path.join(directory, "program.log")))
+    print(f"{LINES} line script: {t_quiet:.2f}s quiet, {t_verbose:.2f}s verbose "
+          f"({log_lines} lines in program.log)")
+    print(f"log(): {t_filtered * 1e9:.0f}ns filtered out, {t_queued * 1e9:.0f}ns queued, "
+          f"{t_written * 1e9:.0f}ns including writing")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Point, rectangle and nearest pin queries on a component with 100k pins
+and chips, through the spatial index and by scanning.
+
+Run from the repository root: python -m benchmarks.spatial_index
+"""
+import random
+from math import hypot
+from time import perf_counter
+
+from circuitlogger import DBG, LOG_WARN
+from .circuits import builtin_project
+
+PINS = 80000
+CHIPS = 20000
+AREA = 5000
+QUERIES = 1000
+RECT = 64
+
+
+def build_component(project, rng):
+    c = project.new_component("big")
+    part = project.new_component("part")
+    part.metadata["width"] = 6
+    part.metadata["height"] = 4
+    for _ in range(PINS):
+        c.new_pin(rng.randrange(AREA), rng.randrange(AREA))
+    for _ in range(CHIPS):
+        c.add_chip(part, rng.randrange(AREA), rng.randrange(AREA))
+    return c
+
+
+def scan_rect(c, x0, y0, x1, y1):
+    pins = [pid for pid, pin in c.pins.items()
+            if x0 <= pin.x <= x1 and y0 <= pin.y <= y1]
+    chips = []
+    for cid, chip in c.chips.items():
+        rx0, ry0, rx1, ry1 = c.chip_rect(chip)
+        if rx0 <= x1 and x0 <= rx1 and ry0 <= y1 and y0 <= ry1:
+            chips.append(cid)
+    return pins, chips
+
+
+def scan_nearest(c, x, y):
+    return min(c.pins, key=lambda pid: hypot(c.pins[pid].x - x, c.pins[pid].y - y))
+
+
+def timed(fn, points):
+    start = perf_counter()
+    results = [fn(*point) for point in points]
+    return (perf_counter() - start) / len(points), results
+
+
+def main():
+    DBG.set(LOG_WARN)
+    rng = random.Random(0)
+    project, _ = builtin_project()
+    c = build_component(project, rng)
+    start = perf_counter()
+    index = c.get_spatial_index()
+    t_build = perf_counter() - start
+    points = [(rng.randrange(AREA), rng.randrange(AREA)) for _ in range(QUERIES)]
+    print(f"{PINS} pins, {CHIPS} chips, index built in {t_build:.3f}s")
+
+    t_rect, found = timed(lambda x, y: index.query_rect(x, y, x + RECT, y + RECT), points)
+    t_scan_rect, expected = timed(lambda x, y: scan_rect(c, x, y, x + RECT, y + RECT), points[:10])
+    for (pins, chips), (scan_pins, scan_chips) in zip(found, expected):
+        assert sorted(pins) == sorted(scan_pins) and sorted(chips) == sorted(scan_chips)
+    print(f"query_rect:  {t_rect * 1e6:10.1f}us  scan {t_scan_rect * 1e6:10.1f}us "
+          f"({t_scan_rect / t_rect:.0f}x)")
+
+    t_point, _ = timed(index.query_point, points)
+    t_scan_point, _ = timed(lambda x, y: scan_rect(c, x, y, x, y), points[:10])
+    print(f"query_point: {t_point * 1e6:10.1f}us  scan {t_scan_point * 1e6:10.1f}us "
+          f"({t_scan_point / t_point:.0f}x)")
+
+    t_nearest, found = timed(index.nearest_pin, points)
+    t_scan_nearest, expected = timed(lambda x, y: scan_nearest(c, x, y), points[:10])
+    for (x, y), pid, scan_pid in zip(points, found, expected):
+        pin, scan_pin = c.pins[pid], c.pins[scan_pid]
+        assert hypot(pin.x - x, pin.y - y) == hypot(scan_pin.x - x, scan_pin.y - y)
+    print(f"nearest_pin: {t_nearest * 1e6:10.1f}us  scan {t_scan_nearest * 1e6:10.1f}us "
+          f"({t_scan_nearest / t_nearest:.0f}x)")
+
+    # moves keep the index up to date
+    start = perf_counter()
+    for pid, (x, y) in zip(list(c.pins)[:QUERIES], points):
+        c.get_pin(pid).move(x, y)
+    t_move = (perf_counter() - start) / QUERIES
+    for pid, (x, y) in zip(list(c.pins)[:QUERIES], points):
+        assert pid in index.query_point(x, y)[0]
+    print(f"Pin.move:    {t_move * 1e6:10.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Drawing thousands of pin labels with WindowPane.render_text, rendering
+every label with font.render against the shared text cache.
+
+Needs pygame; runs without a display (SDL dummy video driver).
+Run from the repository root: python -m benchmarks.text_cache
+"""
+import os
+import random
+from time import perf_counter
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+
+from gui.pane import WindowPane, RootPane, hex_to_tuple, text_cache
+
+SIZE = (1600, 1000)
+LABELS = 5000
+FRAMES = 10
+COLOR = 0xe0e040
+
+
+def random_labels(rng, w, h):
+    names = ["X", "!X", "A", "B", "Y", "CLK", "EN", "!RST"]
+    return [(rng.choice(names), (rng.randrange(w), rng.randrange(h))) for _ in range(LABELS)]
+
+
+def main():
+    pygame.init()
+    dsp = pygame.display.set_mode(SIZE)
+    font = pygame.font.Font(None, 14)
+    root = RootPane(dsp)
+    root.update()
+    pane = WindowPane(dsp, (10, 10), (SIZE[0] - 20, SIZE[1] - 20), root, 0x101010)
+    labels = random_labels(random.Random(0), *pane.bounds)
+
+    def uncached():
+        for text, position in labels:
+            pane.blit(font.render(text, True, hex_to_tuple(COLOR), pane.color), position, None)
+
+    def cached():
+        for text, position in labels:
+            pane.render_text(font, text, COLOR, position)
+
+    for name, draw in (("font.render", uncached), ("text cache", cached)):
+        start = perf_counter()
+        for _ in range(FRAMES):
+            draw()
+        t_frame = (perf_counter() - start) / FRAMES
+        print(f"{name:12s} {t_frame * 1000:7.2f}ms per frame of {LABELS} labels")
+    print(f"text cache: {text_cache.stats()}")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Hold model: pop the next event time, reschedule its events a random delay
+later, with a large pending set. Timing wheel vs a binary heap.
+
+Run from the repository root: python -m benchmarks.timing_wheel
+"""
+import random
+from heapq import heappush, heappop
+from time import perf_counter
+
+from circuit.backend.timing_wheel import Event, TimingWheel
+
+PENDING = 1_000_000
+POPS = 200_000
+MAX_DELAY = 1000
+CANCEL_RATE = 0.25
+
+
+class HeapScheduler:
+    """Reference scheduler with the TimingWheel interface"""
+    def __init__(self):
+        self.heap = []
+        self.now = 0
+        self.size = 0
+        self.counter = 0
+
+    def __len__(self):
+        return self.size
+
+    def schedule(self, time, payload) -> Event:
+        event = Event(time, payload)
+        # counter keeps equal times in insertion order without comparing events
+        self.counter += 1
+        heappush(self.heap, (time, self.counter, event))
+        self.size += 1
+        return event
+
+    def cancel(self, event: Event):
+        if event.active:
+            event.active = False
+            self.size -= 1
+
+    def pop_next(self, until=None):
+        heap = self.heap
+        while heap and not heap[0][2].active:
+            heappop(heap)
+        if not heap or (until is not None and heap[0][0] > until):
+            return None
+        time = self.now = heap[0][0]
+        payloads = []
+        while heap and heap[0][0] == time:
+            event = heappop(heap)[2]
+            if event.active:
+                event.active = False
+                payloads.append(event.payload)
+        self.size -= len(payloads)
+        return time, payloads
+
+
+def hold(scheduler, seed=0):
+    rng = random.Random(seed)
+    events = [scheduler.schedule(rng.randrange(MAX_DELAY), i)
+              for i in range(PENDING)]
+    start = perf_counter()
+    popped = 0
+    while popped < POPS:
+        time, payloads = scheduler.pop_next()
+        for i in payloads:
+            events[i] = scheduler.schedule(time + 1 + rng.randrange(MAX_DELAY), i)
+            # inertial delays: some gate changes undo a pending switch
+            if rng.random() < CANCEL_RATE:
+                scheduler.cancel(events[i])
+                events[i] = scheduler.schedule(time + 1 + rng.randrange(MAX_DELAY), i)
+        popped += len(payloads)
+    return popped / (perf_counter() - start)
+
+
+def main():
+    print(f"{PENDING} pending events, {POPS} pops, delays 1..{MAX_DELAY}, "
+          f"{CANCEL_RATE:.0%} cancelled")
+    t_wheel = hold(TimingWheel())
+    t_heap = hold(HeapScheduler())
+    print(f"timing wheel: {t_wheel:10.0f} events/s")
+    print(f"binary heap:  {t_heap:10.0f} events/s ({t_wheel / t_heap:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
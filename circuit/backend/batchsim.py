@@ -0,0 +1,276 @@
+from collections import deque
+
+from circuitlogger import *
+from .flattener import Flattener, FlatTemplate
+from .simulator import (
+    SwitchNetwork, parse_value, VALUE_CHARS, V1, VX, S_SUPPLY
+)
+
+
+# Group quantities, OR-ed over every net of a channel-connected group.
+# Drivers reached (by strength and value), unknown transistors, charge.
+Q_SUP1, Q_SUP0, Q_IN1, Q_IN0, Q_INX, Q_UNC, Q_C1, Q_C0, Q_CX = range(9)
+Q_COUNT = 9
+
+
+class BatchResult:
+    """Output values of a batch run, packed as one (ones, xs) int pair per
+    output; bit i belongs to vector i"""
+    def __init__(self, outputs: list[str], width: int):
+        self.outputs = outputs
+        self.width = width
+        self.ones: list[int] = []
+        self.xs: list[int] = []
+
+    def value(self, vector: int, output: int) -> int:
+        if self.xs[output] >> vector & 1:
+            return VX
+        return self.ones[output] >> vector & 1
+
+    def row(self, vector: int) -> str:
+        return "".join(VALUE_CHARS[self.value(vector, o)]
+                       for o in range(len(self.outputs)))
+
+    def rows(self) -> list[str]:
+        return [self.row(v) for v in range(self.width)]
+
+
+class BatchSimulator:
+    """Bit-parallel version of Simulator.
+
+    Every net holds one bit per stimulus vector, as two ints: the bits
+    where it is 1 and the bits where it is x (the remaining bits are 0).
+    Each group evaluation handles all vectors at once; for combinational
+    circuits each vector settles to what Simulator computes for it."""
+    def __init__(self, template: FlatTemplate, flattener: Flattener):
+        self.network = SwitchNetwork(template, flattener)
+        self.template = template
+
+    @staticmethod
+    def for_project(project, package_datas, id_=None):
+        flattener = Flattener(project, package_datas)
+        return BatchSimulator(flattener.flatten(id_), flattener)
+
+    def run(self, inputs: list[str], outputs: list[str],
+            vectors: list[str], max_steps=10000) -> BatchResult:
+        """Simulate every vector (one '0'/'1'/'x'/'z' char per input)"""
+        width = len(vectors)
+        run = _BatchRun(self.network, width)
+        for i, name in enumerate(inputs):
+            net = self.network.net(name)
+            d1 = dx = driven = 0
+            for bit, vector in enumerate(vectors):
+                value = parse_value(vector[i])
+                if value is None:
+                    continue
+                driven |= 1 << bit
+                if value == V1:
+                    d1 |= 1 << bit
+                elif value == VX:
+                    dx |= 1 << bit
+            run.drive(net, driven, d1, dx)
+        run.settle(max_steps)
+        result = BatchResult(outputs, width)
+        for name in outputs:
+            net = self.network.net(name)
+            result.ones.append(run.v1[net])
+            result.xs.append(run.vx[net])
+        return result
+
+    def run_file(self, path, max_steps=10000) -> BatchResult:
+        inputs, outputs, vectors = read_vector_file(path)
+        return self.run(inputs, outputs, vectors, max_steps)
+
+
+def read_vector_file(path):
+    """Parse a vector file.
+
+    The first line names the inputs and outputs ("a b : y"), every other
+    line is one vector, either as a single token ("01") or one value per
+    input ("0 1"). Empty lines and lines starting with '#' are skipped."""
+    inputs = outputs = None
+    vectors = []
+    with open(path) as file:
+        for line in file.readlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if inputs is None:
+                ins, _, outs = line.partition(":")
+                inputs = ins.split()
+                outputs = outs.split()
+                continue
+            vector = "".join(line.split())
+            if len(vector) != len(inputs):
+                raise ValueError(f"Vector '{line}' does not match inputs {inputs}")
+            vectors.append(vector)
+    if inputs is None:
+        raise ValueError(f"Vector file {path} has no header")
+    return inputs, outputs, vectors
+
+
+class _BatchRun:
+    # State of one batch run, mirrors Simulator's event loop
+    def __init__(self, network: SwitchNetwork, width: int):
+        self.network = network
+        self.mask = mask = (1 << width) - 1
+        n = network.net_count
+        self.v1 = [0] * n
+        self.vx = [mask] * n
+        # per net: driven bits (supply or input), drive values
+        self.supply = [0] * n
+        self.driven = [0] * n
+        self.d1 = [0] * n
+        self.dx = [0] * n
+        for net in range(n):
+            if network.drive_strengths[net] == S_SUPPLY:
+                self.supply[net] = self.driven[net] = mask
+                self.d1[net] = mask if network.drive_values[net] == V1 else 0
+                self.v1[net] = self.d1[net]
+                self.vx[net] = 0
+        self.is_nmos = [c[V1] for c in network.t_conduction]
+        self._pending = deque(range(n))
+        self._queued = bytearray([1]) * n
+
+    def drive(self, net, driven, d1, dx):
+        self.driven[net] = driven
+        self.d1[net] = d1
+        self.dx[net] = dx
+        self.v1[net] = (self.v1[net] & ~driven) | d1
+        self.vx[net] = (self.vx[net] & ~driven) | dx
+
+    def _schedule(self, net):
+        if not self._queued[net]:
+            self._queued[net] = 1
+            self._pending.append(net)
+
+    def _changed(self, net):
+        network = self.network
+        for t in network.gate_fanout[net]:
+            self._schedule(network.t_a[t])
+            self._schedule(network.t_b[t])
+        if self.driven[net]:
+            for t in network.channels[net]:
+                a = network.t_a[t]
+                self._schedule(network.t_b[t] if a == net else a)
+
+    def _conduction(self, t):
+        """(conducting, unknown) masks of transistor t"""
+        gate = self.network.t_gate[t]
+        unknown = self.vx[gate]
+        if self.is_nmos[t]:
+            on = self.v1[gate]
+        else:
+            on = self.mask & ~self.v1[gate] & ~unknown
+        return on | unknown, unknown
+
+    def settle(self, max_steps):
+        steps = 0
+        while self._pending:
+            if steps >= max_steps:
+                log(LOG_WARN, f"Batch simulation did not settle after {max_steps} steps")
+                break
+            wave = self._pending
+            self._pending = deque()
+            for net in wave:
+                self._queued[net] = 0
+            done = set()
+            for net in wave:
+                if net in done or self.driven[net] == self.mask:
+                    continue
+                self._evaluate(net, done)
+            steps += 1
+
+    def _evaluate(self, start, done):
+        network = self.network
+        mask = self.mask
+        driven = self.driven
+        # Collect the union (over all vectors) of the group around start
+        group = [start]
+        done.add(start)
+        transistors = {}
+        i = 0
+        while i < len(group):
+            net = group[i]
+            i += 1
+            for t in network.channels[net]:
+                if t in transistors:
+                    continue
+                conducting, unknown = self._conduction(t)
+                if not conducting:
+                    continue
+                transistors[t] = (conducting, unknown)
+                a = network.t_a[t]
+                other = network.t_b[t] if a == net else a
+                if driven[other] != mask and other not in done:
+                    done.add(other)
+                    group.append(other)
+        # Local quantities of the undriven bits of each net
+        q = {}
+        for net in group:
+            u = mask & ~driven[net]
+            v1 = self.v1[net]
+            vx = self.vx[net]
+            qn = [0] * Q_COUNT
+            qn[Q_C1] = v1 & u
+            qn[Q_CX] = vx & u
+            qn[Q_C0] = u & ~v1 & ~vx
+            q[net] = qn
+        # Drivers seen through conducting transistors
+        edges = []
+        for t, (conducting, unknown) in transistors.items():
+            a = network.t_a[t]
+            b = network.t_b[t]
+            for src, dst in ((a, b), (b, a)):
+                if dst not in q:
+                    continue
+                u = mask & ~driven[dst]
+                qd = q[dst]
+                qd[Q_UNC] |= unknown & u
+                reach = conducting & u
+                if driven[src]:
+                    sup = reach & self.supply[src]
+                    inp = reach & driven[src] & ~self.supply[src]
+                    d1 = self.d1[src]
+                    dx = self.dx[src]
+                    qd[Q_SUP1] |= sup & d1
+                    qd[Q_SUP0] |= sup & ~d1
+                    qd[Q_IN1] |= inp & d1
+                    qd[Q_INX] |= inp & dx
+                    qd[Q_IN0] |= inp & ~d1 & ~dx
+                if src in q:
+                    edges.append((src, dst, reach & ~driven[src]))
+        # OR everything across the group until nothing changes
+        changed = True
+        while changed:
+            changed = False
+            for src, dst, reach in edges:
+                if not reach:
+                    continue
+                qs = q[src]
+                qd = q[dst]
+                for k in range(Q_COUNT):
+                    new = qd[k] | (qs[k] & reach)
+                    if new != qd[k]:
+                        qd[k] = new
+                        changed = True
+        for net in group:
+            qn = q[net]
+            u = mask & ~driven[net]
+            has_supply = qn[Q_SUP1] | qn[Q_SUP0]
+            has_input = qn[Q_IN1] | qn[Q_IN0] | qn[Q_INX]
+            ones = qn[Q_SUP1] | (qn[Q_IN1] & ~has_supply)
+            zeros = qn[Q_SUP0] | (qn[Q_IN0] & ~has_supply)
+            xs = qn[Q_INX] & ~has_supply
+            charge = (mask & ~(has_supply | has_input)) | qn[Q_UNC]
+            ones |= qn[Q_C1] & charge
+            zeros |= qn[Q_C0] & charge
+            xs |= qn[Q_CX] & charge
+            one = ones & ~zeros & ~xs
+            zero = zeros & ~ones & ~xs
+            v1 = (self.v1[net] & ~u) | (one & u)
+            vx = (self.vx[net] & ~u) | (u & ~one & ~zero)
+            if v1 != self.v1[net] or vx != self.vx[net]:
+                self.v1[net] = v1
+                self.vx[net] = vx
+                self._changed(net)
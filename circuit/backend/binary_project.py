@@ -0,0 +1,260 @@
+from array import array
+from contextlib import contextmanager
+from functools import partial
+import gc
+from json import loads, dumps
+from mmap import mmap, ACCESS_READ
+from os import replace
+from os.path import basename, splitext
+from struct import Struct
+from threading import current_thread, main_thread
+
+from circuitlogger import *
+from circuit.base_classes import Component, Wire, PinTable, ChipTable
+from .project import Project, ProjectLoaderError
+
+# Projects saved to a path with this extension use the binary format,
+# everything else is a JSON project directory
+BINARY_EXTENSION = ".lcsp"
+
+MAGIC = b"LCSP"
+VERSION = 1
+HEADER = Struct("<4sHH")   # magic, version, section count
+SECTION = Struct("<4sQQ")  # tag, offset, size
+ALIGN = 8
+
+# Sections. Records are int32 arrays; strings are indices into the string
+# table (-1 for none), pin/chip/wire/io keys are stored as integers.
+#   CONF: project config json, components map to their COMP record
+#   STRO: string table offsets (uint64, one more than strings)
+#   STRD: string table utf-8 data
+#   COMP: id, name, metadata json, then (start, count) into KIDS, PINS,
+#         IOPN, CHIP and WIRE
+#   KIDS: ids of the components a component places
+#   PINS: key, x, y, label, wire
+#   IOPN: key, pin
+#   CHIP: key, x, y, type
+#   WIRE: key, start and count into CONN
+#   CONN: from cid, from id, to cid, to id (cid -1 for pin endpoints)
+COMP_FIELDS = 13
+PINS = Struct("<5i")
+IOPN = Struct("<2i")
+CHIP = Struct("<4i")
+WIRE = Struct("<3i")
+CONN = Struct("<4i")
+
+
+def is_binary_path(path: str) -> bool:
+    return path.endswith(BINARY_EXTENSION)
+
+
+def _key(key) -> int:
+    if not str(key).isdigit():
+        raise ValueError(f"Key {key} can't be stored in a binary project")
+    return int(key)
+
+
+def _pin_records(pins):
+    if isinstance(pins, PinTable):
+        yield from pins.records()
+        pins = pins.others
+    for k, pin in pins.items():
+        yield (_key(k), pin.x, pin.y, pin.label_ if pin.has_label else None,
+               pin.wire if pin.linked_to_wire else -1)
+
+
+def _chip_records(chips):
+    if isinstance(chips, ChipTable):
+        yield from chips.records()
+        chips = chips.others
+    for k, chip in chips.items():
+        yield _key(k), chip.x, chip.y, chip.type_id
+
+
+class _StringTable:
+    def __init__(self):
+        self.indices: dict[str: int] = {}
+        self.offsets = array("Q", [0])
+        self.data = bytearray()
+
+    def add(self, s: str | None) -> int:
+        if s is None:
+            return -1
+        idx = self.indices.get(s)
+        if idx is None:
+            idx = self.indices[s] = len(self.offsets) - 1
+            self.data += s.encode()
+            self.offsets.append(len(self.data))
+        return idx
+
+
+def save_binary(project: Project, path: str):
+    """Write `project` as a single binary file (atomically)"""
+    strings = _StringTable()
+    sections = {tag: array("i") for tag in
+                (b"COMP", b"KIDS", b"PINS", b"IOPN", b"CHIP", b"WIRE", b"CONN")}
+    kids, pins, iopins, chips, wires, conns = (
+        sections[tag] for tag in
+        (b"KIDS", b"PINS", b"IOPN", b"CHIP", b"WIRE", b"CONN")
+    )
+    config = {"meta": project.metadata}
+    config |= project.config
+    config["components"] = {}
+    for record, ckey in enumerate(project.config["components"]):
+        cw = project.getComponentWrapper(ckey)
+        c = cw.component
+        config["components"][ckey] = cw.serialize() | {"record": record}
+        starts = [len(kids), len(pins), len(iopins), len(chips), len(wires)]
+        for child in cw.children():
+            kids.append(strings.add(child))
+        for key, x, y, label, wire in _pin_records(c.pins):
+            pins.extend((key, x, y, strings.add(label), wire))
+        for k, pid in c.io_pins.items():
+            iopins.extend((_key(k), int(pid)))
+        for key, x, y, type_id in _chip_records(c.chips):
+            chips.extend((key, x, y, strings.add(type_id)))
+        for k, wire in c.wires.items():
+            # CONN records are the wire's ends as they are
+            wires.extend((_key(k), len(conns) // 4, len(wire.ends) // 4))
+            conns.extend(wire.ends)
+        ends = [len(kids), len(pins) // 5, len(iopins) // 2,
+                len(chips) // 4, len(wires) // 3]
+        starts = [starts[0], starts[1] // 5, starts[2] // 2,
+                  starts[3] // 4, starts[4] // 3]
+        sections[b"COMP"].extend((
+            strings.add(ckey), strings.add(cw.name),
+            strings.add(dumps(c.metadata))
+        ))
+        for start, end in zip(starts, ends):
+            sections[b"COMP"].extend((start, end - start))
+    blobs = [
+        (b"CONF", dumps(config).encode()),
+        (b"STRO", strings.offsets.tobytes()),
+        (b"STRD", bytes(strings.data)),
+    ] + [(tag, data.tobytes()) for tag, data in sections.items()]
+    # section index right after the header, sections aligned after it
+    offset = HEADER.size + SECTION.size * len(blobs)
+    index = []
+    for tag, blob in blobs:
+        offset += -offset % ALIGN
+        index.append((tag, offset, len(blob)))
+        offset += len(blob)
+    temp = path + ".tmp"
+    with open(temp, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(blobs)))
+        for entry in index:
+            file.write(SECTION.pack(*entry))
+        for (tag, blob), (_, offset, _) in zip(blobs, index):
+            file.write(bytes(offset - file.tell()))
+            file.write(blob)
+    replace(temp, path)
+    project.path = path
+    project.dirty = False
+    for cw in project.config["components"].values():
+        if cw.is_loaded:
+            cw.component.dirty.clear()
+
+
+@contextmanager
+def _no_gc():
+    # Building hundreds of thousands of objects would run the cyclic
+    # collector over and over although none of them is garbage. The
+    # switch is process-wide, so only loads on the main thread flip it;
+    # other threads must not turn it back on in the middle of those.
+    if current_thread() is not main_thread():
+        yield
+        return
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class BinaryProjectReader:
+    """Memory-mapped binary project file; components are built from their
+    records on demand"""
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self.map = mmap(file.fileno(), 0, access=ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ProjectLoaderError(f"{path} is not a binary project")
+        if version != VERSION:
+            raise ProjectLoaderError(f"Unsupported binary project version {version}")
+        self.sections: dict[bytes: memoryview] = {}
+        view = memoryview(self.map)
+        for i in range(count):
+            tag, offset, size = SECTION.unpack_from(self.map, HEADER.size + SECTION.size * i)
+            self.sections[tag] = view[offset:offset + size]
+        self._string_offsets = self.sections[b"STRO"].cast("Q")
+        self._string_data = self.sections[b"STRD"]
+        self._records = self.sections[b"COMP"].cast("i")
+
+    def config(self) -> dict:
+        return loads(bytes(self.sections[b"CONF"]))
+
+    def string(self, idx: int) -> str | None:
+        if idx < 0:
+            return None
+        start = self._string_offsets[idx]
+        return str(self._string_data[start:self._string_offsets[idx + 1]], "utf-8")
+
+    def _rows(self, tag, struct: Struct, start, count):
+        size = struct.size
+        return struct.iter_unpack(self.sections[tag][start * size:(start + count) * size])
+
+    def _columns(self, tag, struct: Struct, start, count) -> list[memoryview]:
+        """Fields of records start..start+count, one (strided) view each"""
+        size = struct.size
+        fields = size // 4
+        records = self.sections[tag][start * size:(start + count) * size].cast("i")
+        return [records[i::fields] for i in range(fields)]
+
+    def component(self, project: Project, record: int) -> Component:
+        with _no_gc():
+            return self._component(project, record)
+
+    def _component(self, project: Project, record: int) -> Component:
+        r = self._records[record * COMP_FIELDS:(record + 1) * COMP_FIELDS]
+        id_ = self.string(r[0])
+        log(LOG_VERB, "Loading component %s from %s", id_, self.path)
+        c = Component(project, id_)
+        c.metadata = loads(self.string(r[2]))
+        keys, xs, ys, labels, wires = self._columns(b"PINS", PINS, r[5], r[6])
+        c.pins = PinTable.from_columns(c, keys, xs, ys, wires, {
+            i: self.string(label) for i, label in enumerate(labels) if label >= 0
+        })
+        for key, pid in self._rows(b"IOPN", IOPN, r[7], r[8]):
+            c.io_pins[str(key)] = pid
+        keys, xs, ys, types = self._columns(b"CHIP", CHIP, r[9], r[10])
+        c.chips = ChipTable.from_columns(c, keys, xs, ys, [self.string(t) for t in types])
+        for type_id in c.chips.used_type_ids():
+            c.projectDDAG.add_node(type_id, True)
+            c.projectDDAG.connect(id_, type_id)
+        conns = self.sections[b"CONN"]
+        size = CONN.size
+        for key, start, count in self._rows(b"WIRE", WIRE, r[11], r[12]):
+            wire = Wire()
+            wire.ends.frombytes(conns[start * size:(start + count) * size])
+            c.wires[str(key)] = wire
+        c.sync_indices()
+        c.dirty.clear()
+        return c
+
+
+def load_binary(path, package_datas: dict) -> Project:
+    """Open a binary project; component records are only read when the
+    component is first used"""
+    reader = BinaryProjectReader(path)
+    config = reader.config()
+    project = Project(splitext(basename(path))[0])
+    project.path = path
+    project.load_from_config(config, package_datas)
+    for ckey, cdict in config["components"].items():
+        cw = project.getComponentWrapper(ckey)
+        cw.source = partial(reader.component, project, cdict["record"])
+    return project
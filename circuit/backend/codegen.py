@@ -0,0 +1,320 @@
+from array import array
+from hashlib import sha256
+
+from circuitlogger import *
+from .flattener import Flattener, FlatTemplate
+from .simulator import SwitchNetwork, NMOS_CONDUCTION, V1, VX, S_SUPPLY
+
+
+# Beyond these a channel group is not a plain CMOS gate anymore and the
+# path expressions would blow up
+MAX_GROUP_TRANSISTORS = 24
+MAX_GROUP_PATHS = 64
+
+# content hash -> (code object, input nets)
+_code_cache: dict[str: tuple] = {}
+
+
+class CompileError(ValueError): pass
+
+
+def network_hash(network: SwitchNetwork) -> str:
+    h = sha256()
+    h.update(network.net_count.to_bytes(8, "little"))
+    h.update(array("l", network.t_gate).tobytes())
+    h.update(array("l", network.t_a).tobytes())
+    h.update(array("l", network.t_b).tobytes())
+    h.update(bytes(c is NMOS_CONDUCTION for c in network.t_conduction))
+    h.update(bytes(network.drive_values))
+    h.update(bytes(network.drive_strengths))
+    return h.hexdigest()
+
+
+class _Codegen:
+    # Builds the source of evaluate(v1, vx, M) for a static CMOS network.
+    # Each net is dual-rail like in the batch simulator: bits set in v1 are
+    # 1, bits set in vx are x, so one call evaluates len(M) vectors at once.
+    def __init__(self, network: SwitchNetwork):
+        self.network = network
+        self.supply = [s == S_SUPPLY for s in network.drive_strengths]
+        self.groups: list[list[int]] = []
+        self.group_of: dict[int: int] = {}
+        self.inputs: list[int] = []
+        self.order: list[int] = []
+        self.used: set[int] = set()
+        self.paths: dict[int: tuple] = {}
+        self.terms: set[str] = set()
+        self.lines: list[str] = []
+
+    def _find_groups(self):
+        # channel-connected groups, ignoring gate state; supplies split them
+        network = self.network
+        for start in range(network.net_count):
+            if self.supply[start] or start in self.group_of \
+                    or not network.channels[start]:
+                continue
+            gid = len(self.groups)
+            group = [start]
+            self.group_of[start] = gid
+            i = 0
+            while i < len(group):
+                net = group[i]
+                i += 1
+                for t in network.channels[net]:
+                    a = network.t_a[t]
+                    other = network.t_b[t] if a == net else a
+                    if not self.supply[other] and other not in self.group_of:
+                        self.group_of[other] = gid
+                        group.append(other)
+            self.groups.append(group)
+        # everything else (gate-only or unconnected nets) is driven from outside
+        self.inputs = [net for net in range(network.net_count)
+                       if net not in self.group_of and not self.supply[net]]
+
+    def _levelize(self) -> list[int]:
+        network = self.network
+        depends = []
+        for group in self.groups:
+            deps = set()
+            for net in group:
+                for t in network.channels[net]:
+                    gid = self.group_of.get(network.t_gate[t])
+                    if gid is not None:
+                        deps.add(gid)
+            depends.append(deps)
+        order = []
+        state = bytearray(len(self.groups))  # 0 new, 1 open, 2 done
+        for root in range(len(self.groups)):
+            if state[root]:
+                continue
+            stack = [(root, iter(depends[root]))]
+            state[root] = 1
+            while stack:
+                gid, deps = stack[-1]
+                for dep in deps:
+                    if state[dep] == 1:
+                        raise CompileError("Circuit has feedback, it is not combinational")
+                    if state[dep] == 0:
+                        state[dep] = 1
+                        stack.append((dep, iter(depends[dep])))
+                        break
+                else:
+                    state[gid] = 2
+                    order.append(gid)
+                    stack.pop()
+        return order
+
+    def _paths(self, net, group_set) -> tuple[list, list]:
+        """Transistor paths from `net` to vcc and to gnd"""
+        network = self.network
+        to_vcc = []
+        to_gnd = []
+        path = []
+        visited = {net}
+
+        def walk(n):
+            for t in network.channels[n]:
+                if t in path:
+                    continue
+                a = network.t_a[t]
+                other = network.t_b[t] if a == n else a
+                if self.supply[other]:
+                    target = to_vcc if network.drive_values[other] == V1 else to_gnd
+                    target.append(path + [t])
+                    if len(to_vcc) + len(to_gnd) > MAX_GROUP_PATHS:
+                        raise CompileError(f"Too many conduction paths at net {net}")
+                elif other in group_set and other not in visited:
+                    visited.add(other)
+                    path.append(t)
+                    walk(other)
+                    path.pop()
+                    visited.discard(other)
+        walk(net)
+        return to_vcc, to_gnd
+
+    def _term(self, t, kind) -> str:
+        """Expression for transistor t conducting. kind is "on" / "possible"
+        for the dual-rail code and "binary" for the two-valued code"""
+        network = self.network
+        g = network.t_gate[t]
+        nmos = network.t_conduction[t] is NMOS_CONDUCTION
+        if g not in self.used:
+            # gate tied to a supply
+            return "M" if (network.drive_values[g] == V1) == nmos else "0"
+        if nmos:
+            if kind != "possible":
+                return f"a{g}"
+            name, expr = f"h{g}", f"a{g} | x{g}"
+        elif kind == "binary":
+            name, expr = f"n{g}", f"M ^ a{g}"
+        elif kind == "possible":
+            name, expr = f"m{g}", f"M & ~a{g}"
+        else:
+            name, expr = f"l{g}", f"M & ~(a{g} | x{g})"
+        if name not in self.terms:
+            self.terms.add(name)
+            self.lines.append(f"    {name} = {expr}")
+        return name
+
+    def _any(self, paths, kind) -> str:
+        if not paths:
+            return "0"
+        return " | ".join(
+            "(" + " & ".join(self._term(t, kind) for t in path) + ")"
+            for path in paths
+        )
+
+    def prepare(self):
+        network = self.network
+        self._find_groups()
+        for group in self.groups:
+            if any(net in self.inputs for net in group):
+                raise CompileError("Inputs must only drive transistor gates")
+        self.order = self._levelize()
+        # Only nets something can look at get computed: gates, inputs and
+        # named pins. Internal nodes of transistor stacks are skipped.
+        observable = set(self.inputs)
+        observable.update(network.t_gate)
+        observable.update(network.template.net_names.values())
+        self.used = {net for net in observable if not self.supply[net]}
+        self.paths = {}
+        for gid in self.order:
+            group = self.groups[gid]
+            transistors = {t for net in group for t in network.channels[net]}
+            if len(transistors) > MAX_GROUP_TRANSISTORS:
+                raise CompileError(f"Channel group of {len(transistors)} transistors is too large")
+            group_set = set(group)
+            for net in group:
+                if net in self.used:
+                    self.paths[net] = self._paths(net, group_set)
+
+    def generate_dual(self) -> str:
+        """evaluate(v1, vx, M): full 0/1/x evaluation. Returns the bits that
+        are x on any computed net"""
+        self.lines = ["def evaluate(v1, vx, M):"]
+        self.terms = set()
+        emit = self.lines.append
+        emit("    xs = 0")
+        for net in sorted(self.used):
+            emit(f"    a{net} = v1[{net}]; x{net} = vx[{net}]")
+        for net, (to_vcc, to_gnd) in self.paths.items():
+            d1 = self._any(to_vcc, "on")
+            p1 = self._any(to_vcc, "possible")
+            d0 = self._any(to_gnd, "on")
+            p0 = self._any(to_gnd, "possible")
+            emit(f"    d1 = {d1}; p1 = {p1}; d0 = {d0}; p0 = {p0}")
+            emit(f"    one = d1 & ~p0; zero = d0 & ~p1; f = M & ~(p1 | p0)")
+            emit(f"    a{net} = one | (f & a{net}); "
+                 + f"x{net} = (M & ~(one | zero | f)) | (f & x{net})")
+            emit(f"    xs |= x{net}")
+        for net in self.paths:
+            emit(f"    v1[{net}] = a{net}; vx[{net}] = x{net}")
+        emit("    return xs")
+        return "\n".join(self.lines) + "\n"
+
+    def generate_binary(self) -> str:
+        """evaluate_binary(v1, M): evaluation while no net is x. Returns
+        False without storing anything if a net got driven both ways"""
+        self.lines = ["def evaluate_binary(v1, M):"]
+        self.terms = set()
+        emit = self.lines.append
+        emit("    bad = 0")
+        for net in sorted(self.used):
+            emit(f"    a{net} = v1[{net}]")
+        for net, (to_vcc, to_gnd) in self.paths.items():
+            d1 = self._any(to_vcc, "binary")
+            d0 = self._any(to_gnd, "binary")
+            emit(f"    d1 = {d1}; d0 = {d0}; bad |= d1 & d0")
+            emit(f"    a{net} = d1 | (a{net} & ~d0)")
+        emit("    if bad:")
+        emit("        return False")
+        for net in self.paths:
+            emit(f"    v1[{net}] = a{net}")
+        emit("    return True")
+        return "\n".join(self.lines) + "\n"
+
+
+def compile_network(network: SwitchNetwork) -> tuple:
+    """(code object, input nets) for `network`, cached by content hash"""
+    key = network_hash(network)
+    if key not in _code_cache:
+        log(LOG_VERB, f"Compiling network {key[:12]}...")
+        codegen = _Codegen(network)
+        codegen.prepare()
+        source = codegen.generate_dual() + "\n\n" + codegen.generate_binary()
+        code = compile(source, f"<lcst-compiled {key[:12]}>", "exec")
+        _code_cache[key] = (code, codegen.inputs)
+    return _code_cache[key]
+
+
+class CompiledSimulator:
+    """Simulator running generated straight-line Python code.
+
+    Only static CMOS circuits without feedback can be compiled (inputs
+    only drive gates); a compile error means the interpreted Simulator has
+    to be used. For 0/1 inputs results match Simulator; with x inputs this
+    engine is less pessimistic than Simulator's group rule."""
+    def __init__(self, template: FlatTemplate, flattener: Flattener,
+                 width=1):
+        self.network = SwitchNetwork(template, flattener)
+        self.template = template
+        code, inputs = compile_network(self.network)
+        namespace = {}
+        exec(code, namespace)
+        self._evaluate = namespace["evaluate"]
+        self._evaluate_binary = namespace["evaluate_binary"]
+        self.inputs = set(inputs)
+        self.mask = (1 << width) - 1
+        n = template.net_count
+        self.v1 = [0] * n
+        self.vx = [self.mask] * n
+        for net in range(n):
+            if self.network.drive_strengths[net] == S_SUPPLY:
+                self.vx[net] = 0
+                self.v1[net] = self.mask if self.network.drive_values[net] == V1 else 0
+        # inputs with x bits; while there are none and no computed net is
+        # x either, the cheaper two-valued code can be used
+        self.x_inputs = set(self.inputs)
+        self.binary = False
+        self.time = 0
+        self.events = 0
+
+    @staticmethod
+    def for_project(project, package_datas, id_=None, width=1):
+        flattener = Flattener(project, package_datas)
+        return CompiledSimulator(flattener.flatten(id_), flattener, width)
+
+    def net(self, name: str) -> int:
+        return self.network.net(name)
+
+    def set(self, name: str, value: int | None):
+        net = self.net(name)
+        if net not in self.inputs:
+            raise KeyError(f"Net {name} is not an input of the compiled circuit")
+        if value is None:
+            raise ValueError("Compiled circuits can't release inputs")
+        self.v1[net] = self.mask if value == V1 else 0
+        if value == VX:
+            self.vx[net] = self.mask
+            self.x_inputs.add(net)
+            self.binary = False
+        else:
+            self.vx[net] = 0
+            self.x_inputs.discard(net)
+
+    def run(self) -> int:
+        """Evaluate the whole circuit once, returns the number of nets"""
+        if not (self.binary and self._evaluate_binary(self.v1, self.mask)):
+            xs = self._evaluate(self.v1, self.vx, self.mask)
+            # x inputs can be masked on every computed net, they still
+            # need the dual-rail code once they get unmasked
+            self.binary = not xs and not self.x_inputs
+        self.time += 1
+        self.events += len(self.v1)
+        return len(self.v1)
+
+    def probe(self, name: str) -> int:
+        net = self.net(name)
+        if self.vx[net] & 1:
+            return VX
+        return self.v1[net] & 1
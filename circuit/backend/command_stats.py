@@ -0,0 +1,136 @@
+import cProfile
+import pstats
+import tracemalloc
+from io import StringIO
+from time import perf_counter
+
+# Upper bounds (seconds) of the latency histogram buckets, the last one
+# takes everything slower
+LATENCY_BUCKETS = (1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0)
+BUCKET_NAMES = ("<10us", "<100us", "<1ms", "<10ms", "<100ms", "<1s", ">=1s")
+HISTOGRAM_WIDTH = 30
+# Functions listed for a profiled command
+PROFILE_LINES = 25
+
+
+def format_seconds(seconds) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f}us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f}ms"
+    return f"{seconds:.2f}s"
+
+
+class OperationStats:
+    __slots__ = ("calls", "seconds", "max_seconds", "allocated", "histogram")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        # net bytes still allocated after the calls (tracemalloc)
+        self.allocated = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, seconds, allocated=0):
+        self.calls += 1
+        self.seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+        self.allocated += allocated
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds < bound:
+                self.histogram[i] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+
+class CommandStats:
+    """Wall time, allocations and call counts of console commands, by the
+    operation (CCP method) they resolve to.
+
+    Off by default: the terminal only calls through call() while enabled,
+    so disabled instrumentation costs one attribute check per command.
+    Nested commands (execute) count in both the outer and inner
+    operation."""
+    def __init__(self):
+        self.enabled = False
+        self.trace_allocations = False
+        self.operations: dict[str: OperationStats] = {}
+        self._started_tracemalloc = False
+
+    def enable(self, trace_allocations=False):
+        self.enabled = True
+        self.trace_allocations = trace_allocations
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def disable(self):
+        self.enabled = False
+        self.trace_allocations = False
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def reset(self):
+        self.operations = {}
+
+    def call(self, operation: str, method, args):
+        """Run method(*args), recording it under `operation` even if it raises"""
+        trace = self.trace_allocations
+        before = tracemalloc.get_traced_memory()[0] if trace else 0
+        start = perf_counter()
+        try:
+            return method(*args)
+        finally:
+            seconds = perf_counter() - start
+            allocated = tracemalloc.get_traced_memory()[0] - before if trace else 0
+            stats = self.operations.get(operation)
+            if stats is None:
+                stats = self.operations[operation] = OperationStats()
+            stats.add(seconds, allocated)
+
+    def report(self) -> list[str]:
+        """Table of the operations by total time, then a latency histogram
+        of each"""
+        if not self.operations:
+            return ["No commands recorded"]
+        ordered = sorted(self.operations.items(), key=lambda item: -item[1].seconds)
+        lines = [f"{'operation':20s} {'calls':>8s} {'total':>10s} {'mean':>10s} "
+                 f"{'max':>10s} {'alloc/call':>11s}"]
+        for operation, stats in ordered:
+            if stats.allocated or self.trace_allocations:
+                allocated = f"{stats.allocated / stats.calls:10.0f}B"
+            else:
+                allocated = f"{'-':>11s}"
+            lines.append(f"{operation:20s} {stats.calls:8d} "
+                         f"{format_seconds(stats.seconds):>10s} "
+                         f"{format_seconds(stats.seconds / stats.calls):>10s} "
+                         f"{format_seconds(stats.max_seconds):>10s} {allocated}")
+        for operation, stats in ordered:
+            lines.append(f"{operation}:")
+            most = max(stats.histogram)
+            for name, count in zip(BUCKET_NAMES, stats.histogram):
+                if count:
+                    bar = "#" * max(1, round(count / most * HISTOGRAM_WIDTH))
+                    lines.append(f"  {name:>7s} {count:8d} {bar}")
+        return lines
+
+
+def profile_call(fn, *args, dump_path=None) -> list[str]:
+    """Run fn(*args) under cProfile. Returns the functions with the most
+    cumulative time; with dump_path, also writes the pstats data there
+    (for pstats / snakeviz)"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        fn(*args)
+    finally:
+        profiler.disable()
+    if dump_path is not None:
+        profiler.dump_stats(dump_path)
+    out = StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    return out.getvalue().strip("\n").splitlines()
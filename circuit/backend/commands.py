@@ -0,0 +1,105 @@
+from inspect import signature, Parameter
+
+
+class InvalidCommandException(SyntaxError): pass
+
+
+class Command:
+    """A console command: the method it runs (None for a name that only
+    leads to subcommands, like "component"), the subcommands below it and
+    what arguments the method takes.
+
+    Arguments are converted with the method's parameter annotations
+    (int, float; others are left as strings)."""
+    __slots__ = ("name", "method", "children", "min_args", "max_args",
+                 "converters", "usage")
+
+    def __init__(self, name, method):
+        self.name = name
+        self.method = method
+        self.children: dict[str: Command] = {}
+        self.usage = None
+        parameters = list(signature(method).parameters.values()) if method else []
+        positional = [p for p in parameters
+                      if p.kind in (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD)]
+        self.min_args = sum(1 for p in positional if p.default is Parameter.empty)
+        variadic = any(p.kind is Parameter.VAR_POSITIONAL for p in parameters)
+        self.max_args = None if variadic else len(positional)
+        # (argument index, parameter name, converter) of the arguments
+        # that aren't passed as strings
+        self.converters = tuple(
+            (i, p.name, p.annotation) for i, p in enumerate(positional)
+            if p.annotation in (int, float)
+        )
+
+    def arguments(self, args: list[str]) -> list:
+        """args checked against the method's arity and converted"""
+        if len(args) < self.min_args or (self.max_args is not None and len(args) > self.max_args):
+            expected = (f"{self.min_args}" if self.max_args == self.min_args
+                        else f"at least {self.min_args}" if self.max_args is None
+                        else f"{self.min_args} to {self.max_args}")
+            raise InvalidCommandException(
+                f"'{self.name}' takes {expected} arguments, got {len(args)}"
+                + (f" (usage: {self.usage})" if self.usage else ""))
+        if self.converters:
+            args = list(args)
+            for i, name, converter in self.converters:
+                if i < len(args):
+                    try:
+                        args[i] = converter(args[i])
+                    except ValueError:
+                        raise InvalidCommandException(
+                            f"Invalid {name} '{args[i]}', expected {converter.__name__}")
+        return args
+
+
+class CommandTrie:
+    """Commands of a console object, built once from its public methods
+    except the `internal` ones.
+
+    A command line names the method joining its first tokens with "_":
+    "project meta set" runs `project_meta_set`. Like looking the names up
+    one token at a time, every name after the first token must be a
+    method ("component add" works without a `component` method), and the
+    tokens after the longest such name are the arguments."""
+    def __init__(self, target, manual: dict | None = None, internal=()):
+        names = [name for name in dir(target)
+                 if not name.startswith("_") and name not in internal
+                 and callable(getattr(target, name))]
+        # any name a command line can start with -> its command
+        self.root: dict[str: Command] = {
+            name: Command(name, getattr(target, name)) for name in names
+        }
+        for name in names:
+            parts = name.split("_")
+            for split in range(1, len(parts)):
+                prefix = "_".join(parts[:split])
+                parent = self.root.get(prefix)
+                if parent is None:
+                    parent = self.root[prefix] = Command(prefix, None)
+                parent.children["_".join(parts[split:])] = self.root[name]
+        if manual:
+            self._add_usage(self.root, manual)
+
+    def _add_usage(self, commands: dict, manual: dict):
+        for token, command in commands.items():
+            entry = manual.get(token)
+            if not isinstance(entry, dict):
+                continue
+            command.usage = entry.get("format")
+            self._add_usage(command.children, entry.get("subcommands", {}))
+
+    def resolve(self, tokens: list[str]) -> tuple[Command | None, list[str]]:
+        """Command named by the leading tokens (None if there is none) and
+        the remaining tokens, its arguments"""
+        command = self.root.get(tokens[0])
+        if command is None:
+            return None, tokens[1:]
+        i = 1
+        while i < len(tokens):
+            child = command.children.get(tokens[i])
+            if child is None:
+                break
+            command = child
+            i += 1
+        return command, tokens[i:]
@@ -1,8 +1,28 @@
+def iter_bits(bits: int):
+    """Yield the indices of all set bits in `bits`, lowest first"""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
 class DAG:
     """Directed Acyclic Graph utility"""
     def __init__(self):
         self.adjacencies: dict[str: list] = {}
         self.marked = {}
+        # Reachability index (transitive closure as int bitsets).
+        # Bit i of _descendants[n] is set if node _nodes[i] is reachable
+        # from n, bit i of _ancestors[n] if n is reachable from _nodes[i].
+        # Every node reaches itself.
+        self._nodes: list = []
+        self._bit: dict = {}
+        self._descendants: dict[str: int] = {}
+        self._ancestors: dict[str: int] = {}
+        # Cached topological order / layering, dropped whenever the graph
+        # changes (see _invalidate_order)
+        self._topo_order: list | None = None
+        self._levels: list[list] | None = None
 
     def add_node(self, name, allow_exist=False):
         if name in self.adjacencies.keys():
@@ -10,6 +30,12 @@ class DAG:
                 return
             raise KeyError("Node already exists!")
         self.adjacencies[name] = []
+        bit = len(self._nodes)
+        self._nodes.append(name)
+        self._bit[name] = bit
+        self._descendants[name] = 1 << bit
+        self._ancestors[name] = 1 << bit
+        self._invalidate_order()
 
     def connect(self, from_, to):
         assert from_ in self.adjacencies.keys() and to in self.adjacencies.keys()
@@ -18,6 +44,56 @@ class DAG:
         if self.connection_exists(to, from_):
             raise ValueError("Cannot connect due to acyclic graph condition")
         self.adjacencies[from_].append(to)
+        self._update_closure(from_, to)
+        self._invalidate_order()
+
+    def connect_all(self, edges):
+        """Add many (from_, to) edges at once. The reachability index is
+        rebuilt in one pass instead of being updated for every edge. If the
+        edges would make a cycle, none of them are added"""
+        added = []
+        for from_, to in edges:
+            assert from_ in self.adjacencies.keys() and to in self.adjacencies.keys()
+            if to not in self.adjacencies[from_]:
+                self.adjacencies[from_].append(to)
+                added.append((from_, to))
+        self._invalidate_order()
+        self._build_order()
+        if len(self._topo_order) != len(self.adjacencies):
+            # the reachability index wasn't touched yet
+            for from_, to in added:
+                self.adjacencies[from_].remove(to)
+            self._invalidate_order()
+            raise ValueError("Cannot connect due to acyclic graph condition")
+        bit = self._bit
+        for node in reversed(self._topo_order):
+            descendants = 1 << bit[node]
+            for child in self.adjacencies[node]:
+                descendants |= self._descendants[child]
+            self._descendants[node] = descendants
+        for node in self._topo_order:
+            self._ancestors[node] = 1 << bit[node]
+        for node in self._topo_order:
+            ancestors = self._ancestors[node]
+            for child in self.adjacencies[node]:
+                self._ancestors[child] |= ancestors
+
+    def _update_closure(self, from_, to):
+        # Everything that reaches from_ now reaches everything to reaches.
+        # Nodes which already reached `to` (or are already reached by from_)
+        # are complete and get skipped.
+        from_bit = self._bit[from_]
+        to_bit = self._bit[to]
+        new_descendants = self._descendants[to]
+        new_ancestors = self._ancestors[from_]
+        for i in iter_bits(new_ancestors):
+            node = self._nodes[i]
+            if not self._descendants[node] >> to_bit & 1:
+                self._descendants[node] |= new_descendants
+        for i in iter_bits(new_descendants):
+            node = self._nodes[i]
+            if not self._ancestors[node] >> from_bit & 1:
+                self._ancestors[node] |= new_ancestors
 
     def get_children(self, name):
         return self.adjacencies[name]
@@ -28,30 +104,80 @@ class DAG:
             self.marked[k] = False
 
     def connection_exists(self, from_, to):
-        self.init_marked()
-        self.dfs(from_)
-        return self.marked[to]
+        """Check whether `to` is reachable from `from_` (runs in o(1))"""
+        return bool(self._descendants[from_] >> self._bit[to] & 1)
+
+    def get_descendants(self, name):
+        return [self._nodes[i] for i in iter_bits(self._descendants[name])]
+
+    def get_ancestors(self, name):
+        return [self._nodes[i] for i in iter_bits(self._ancestors[name])]
 
     def dfs(self, from_):
+        # Iterative, so deep hierarchies don't hit the recursion limit
         self.marked[from_] = True
-        for child in self.get_children(from_):
-            if not self.marked[child]:
-                self.dfs(child)
+        stack = [from_]
+        while stack:
+            for child in self.get_children(stack.pop()):
+                if not self.marked[child]:
+                    self.marked[child] = True
+                    stack.append(child)
 
-    def get_bottom_layer(self):
-        bottom_layer = []
-        for k in self.adjacencies:
-            if len(self.adjacencies[k]) == 0:
-                bottom_layer.append(k)
-        return bottom_layer
+    def _invalidate_order(self):
+        self._topo_order = None
+        self._levels = None
 
-    def get_top_layer(self):
-        top_layer = set(self.adjacencies.keys())
+    def _build_order(self):
+        # Kahn's algorithm, layer by layer. A node's level is the length of
+        # the longest path leading to it from the top layer.
+        in_degree = dict.fromkeys(self.adjacencies, 0)
         for k in self.adjacencies:
             for child in self.adjacencies[k]:
-                if child in top_layer:
-                    top_layer.remove(child)
-        return list(top_layer)
+                in_degree[child] += 1
+        layer = [k for k in self.adjacencies if in_degree[k] == 0]
+        order = []
+        levels = []
+        while layer:
+            order.extend(layer)
+            levels.append(layer)
+            next_layer = []
+            for k in layer:
+                for child in self.adjacencies[k]:
+                    in_degree[child] -= 1
+                    if in_degree[child] == 0:
+                        next_layer.append(child)
+            layer = next_layer
+        self._topo_order = order
+        self._levels = levels
+
+    def topo_order(self, from_=None) -> list:
+        """Nodes ordered so that every node comes before its children.
+
+        If `from_` is given, only the nodes reachable from it are returned.
+        Reverse the result for a bottom-up walk."""
+        if self._topo_order is None:
+            self._build_order()
+        if from_ is None:
+            return list(self._topo_order)
+        descendants = self._descendants[from_]
+        bit = self._bit
+        return [k for k in self._topo_order if descendants >> bit[k] & 1]
+
+    def levels(self) -> list[list]:
+        """Nodes grouped by depth; level 0 is the top layer"""
+        if self._levels is None:
+            self._build_order()
+        return [list(level) for level in self._levels]
+
+    def get_bottom_layer(self):
+        if self._topo_order is None:
+            self._build_order()
+        return [k for k in self._topo_order if not self.adjacencies[k]]
+
+    def get_top_layer(self):
+        if self._levels is None:
+            self._build_order()
+        return list(self._levels[0]) if self._levels else []
 
 if __name__ == "__main__":
     dag = DAG()
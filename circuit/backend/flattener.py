@@ -0,0 +1,170 @@
+from array import array
+
+from circuitlogger import *
+from circuit.base_classes import Component, PluginComponent
+from .netlist import DisjointSet, pin_terminal, chip_terminal
+
+
+class FlatTemplate:
+    """Flattened, relocatable netlist of one component.
+
+    Nets are numbered 0..net_count-1; a placed instance adds its own net
+    offset. Leaf devices are the plugin components at the bottom of the
+    hierarchy."""
+    def __init__(self, component_id):
+        self.component_id = component_id
+        self.net_count = 0
+        # io index -> net
+        self.ports: dict[str: int] = {}
+        # per device: plugin component id, instance path (c<cid>/c<cid>...)
+        # and the nets of its pins, in get_io_indices() order
+        self.device_types: list[str] = []
+        self.device_paths: list[str] = []
+        self.device_nets: list[tuple] = []
+        # hierarchical pin names (p<id> and pin labels) -> net
+        self.net_names: dict[str: int] = {}
+        # component id -> truth table, for devices that are tabulated
+        # components instead of plugins
+        self.tables: dict[str: object] = {}
+
+    @property
+    def device_count(self) -> int:
+        return len(self.device_types)
+
+    def net(self, name: str) -> int:
+        return self.net_names[name]
+
+    @staticmethod
+    def from_plugin(component: PluginComponent):
+        t = FlatTemplate(component.id_)
+        io_indices = component.get_io_indices()
+        t.net_count = len(io_indices)
+        t.ports = {iid: i for i, iid in enumerate(io_indices)}
+        t.device_types.append(component.id_)
+        t.device_paths.append("")
+        t.device_nets.append(tuple(range(len(io_indices))))
+        return t
+
+    @staticmethod
+    def from_table(component: Component, table):
+        """Template of a component simulated as a single truth table device"""
+        t = FlatTemplate.from_plugin(component)
+        t.tables[component.id_] = table
+        for iid, net in t.ports.items():
+            pid = component.io_pin_id(iid)
+            t.net_names[f"p{pid}"] = net
+            pin = component.get_pin(pid)
+            if pin.has_label:
+                t.net_names[pin.label_] = net
+        return t
+
+
+class Flattener:
+    """Expands project components into flat, device-level netlists.
+
+    Every distinct component is flattened once into a FlatTemplate; a chip
+    reuses its component's template with its nets shifted by an offset.
+    With a TruthTableCache, chips of combinational components become single
+    truth table devices."""
+    def __init__(self, project, package_datas, tables=None):
+        self.project = project
+        self.package_datas = package_datas
+        self.templates: dict[str: FlatTemplate] = {}
+        self._components: dict[str: Component] = {}
+        self.tables = tables
+        # component id -> table template, or None if it can't be tabulated
+        self.table_templates: dict[str: FlatTemplate | None] = {}
+        self._fingerprints: dict[str: str] = {}
+        # characterization needs the full transistor-level templates
+        self._plain = None if tables is None else Flattener(project, package_datas)
+
+    def get_component(self, id_) -> Component:
+        if id_ not in self._components:
+            self._components[id_] = self.project.getComponent(
+                id_, self.package_datas
+            )
+        return self._components[id_]
+
+    def flatten(self, id_=None) -> FlatTemplate:
+        id_ = id_ or self.project.config["root-component"]["id"]
+        if id_ is None:
+            raise ValueError("Project has no root component!")
+        return self.template(id_)
+
+    def template(self, id_) -> FlatTemplate:
+        if id_ not in self.templates:
+            # Build children first, bottom-up along the project DAG
+            for cid in reversed(self.project.ddag.topo_order(id_)):
+                if cid not in self.templates:
+                    self.templates[cid] = self._build(cid)
+        return self.templates[id_]
+
+    def invalidate(self, id_):
+        """Drop the templates of `id_` and everything that places it"""
+        self._components.pop(id_, None)
+        for aid in self.project.ddag.get_ancestors(id_):
+            self.templates.pop(aid, None)
+            self.table_templates.pop(aid, None)
+            self._fingerprints.pop(aid, None)
+        if self._plain is not None:
+            self._plain.invalidate(id_)
+
+    def _chip_template(self, id_) -> FlatTemplate:
+        if self.tables is None or isinstance(self.get_component(id_), PluginComponent):
+            return self.template(id_)
+        if id_ not in self.table_templates:
+            table = self.tables.table(self._plain, id_, self._fingerprints)
+            self.table_templates[id_] = None if table is None else \
+                FlatTemplate.from_table(self.get_component(id_), table)
+        return self.table_templates[id_] or self.template(id_)
+
+    def _build(self, id_) -> FlatTemplate:
+        component = self.get_component(id_)
+        if isinstance(component, PluginComponent):
+            return FlatTemplate.from_plugin(component)
+        log(LOG_VERB, f"Flattening component {id_}...")
+        netlist = component.get_netlist().compile()
+        terminal_ids = netlist.terminal_ids
+        local_nets = netlist.terminal_nets()
+        # Local nets first, then every chip's template nets at its offset
+        total = netlist.net_count
+        children = []
+        for cid, chip in component.chips.items():
+            child = self._chip_template(chip.type_id)
+            children.append((cid, child, total))
+            total += child.net_count
+        # Merge each chip's port nets with the nets wired to them
+        sets = DisjointSet(total)
+        for cid, child, offset in children:
+            for iid, port_net in child.ports.items():
+                tid = terminal_ids.get(chip_terminal(cid, iid))
+                if tid is not None:
+                    sets.union(local_nets[tid], offset + port_net)
+        # Renumber densely in order of first appearance
+        find = sets.find
+        roots = {}
+        remap = array("l", bytes(array("l").itemsize * total))
+        for net in range(total):
+            remap[net] = roots.setdefault(find(net), len(roots))
+
+        t = FlatTemplate(id_)
+        t.net_count = len(roots)
+        for iid in component.get_io_indices():
+            tid = terminal_ids[pin_terminal(component.io_pin_id(iid))]
+            t.ports[iid] = remap[local_nets[tid]]
+        for pid, pin in component.pins.items():
+            net = remap[local_nets[terminal_ids[pin_terminal(pid)]]]
+            t.net_names[f"p{pid}"] = net
+            if pin.has_label:
+                t.net_names[pin.label_] = net
+        for cid, child, offset in children:
+            prefix = f"c{cid}"
+            for name, net in child.net_names.items():
+                t.net_names[f"{prefix}/{name}"] = remap[offset + net]
+            t.device_types.extend(child.device_types)
+            t.tables.update(child.tables)
+            for path in child.device_paths:
+                t.device_paths.append(f"{prefix}/{path}" if path else prefix)
+            for nets in child.device_nets:
+                t.device_nets.append(tuple(remap[offset + n] for n in nets))
+        return t
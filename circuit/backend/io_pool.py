@@ -0,0 +1,51 @@
+"""Pooled file I/O for projects: component files are read, parsed and
+written concurrently, results always come back in input order"""
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from json import loads, JSONDecodeError
+
+from circuitlogger import *
+import configuration
+
+
+def pool_size(workers: int | None = None) -> int:
+    return configuration.IO_POOL_SIZE if workers is None else workers
+
+
+def pool_map(fn, items, workers: int | None = None) -> list:
+    """[fn(item) for item in items], on a thread pool of `workers` threads
+    (IO_POOL_SIZE by default)"""
+    items = list(items)
+    workers = pool_size(workers)
+    if workers <= 1 or len(items) < 2:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(min(workers, len(items)), "project-io") as pool:
+        return list(pool.map(fn, items))
+
+
+def read_json(path) -> dict | Exception:
+    """Parsed json file, or the error that prevented it"""
+    try:
+        with open(path) as file:
+            return loads(file.read())
+    except FileNotFoundError as e:
+        log(LOG_FAIL, f"Component from {path} could not be loaded")
+        return e
+    except JSONDecodeError as e:
+        log(LOG_FAIL, f"Component from {path} has invalid json")
+        return e
+
+
+def read_json_files(paths, workers: int | None = None,
+                    processes: bool | None = None) -> list[dict | Exception]:
+    """read_json of every path. With `processes` (IO_PARSE_PROCESSES by
+    default) files are parsed in worker processes, which sidesteps the GIL
+    but pays for sending the parsed json back"""
+    paths = list(paths)
+    workers = pool_size(workers)
+    if processes is None:
+        processes = configuration.IO_PARSE_PROCESSES
+    if not processes or workers <= 1 or len(paths) < 2:
+        return pool_map(read_json, paths, workers)
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(min(workers, len(paths))) as pool:
+        return list(pool.map(read_json, paths, chunksize=chunksize))
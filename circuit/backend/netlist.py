@@ -0,0 +1,145 @@
+from array import array
+
+
+# Terminal keys: ("p", pin_id) for a pin of the component itself,
+# ("c", chip_id, iid) for a pin of a placed chip, where iid is one of the
+# chip component's io indices (see Component.get_io_indices).
+def pin_terminal(pid) -> tuple:
+    return ("p", int(pid))
+
+
+def chip_terminal(cid, iid) -> tuple:
+    return ("c", int(cid), int(iid))
+
+
+class DisjointSet:
+    """Union-find over dense integer ids (path halving, union by size)"""
+    def __init__(self, count=0):
+        self.parent: list[int] = list(range(count))
+        self.size: list[int] = [1] * count
+
+    def __len__(self):
+        return len(self.parent)
+
+    def add(self) -> int:
+        idx = len(self.parent)
+        self.parent.append(idx)
+        self.size.append(1)
+        return idx
+
+    def find(self, idx: int) -> int:
+        parent = self.parent
+        while parent[idx] != idx:
+            parent[idx] = parent[parent[idx]]
+            idx = parent[idx]
+        return idx
+
+    def union(self, a: int, b: int) -> bool:
+        a = self.find(a)
+        b = self.find(b)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return True
+
+
+class Netlist:
+    """Electrically connected terminals of a component, as dense net ids.
+
+    Terminals and connections can be added at any time; the net numbering
+    is recompiled lazily on the next query after a change."""
+    def __init__(self):
+        self.terminals: list[tuple] = []
+        self.terminal_ids: dict[tuple: int] = {}
+        self._sets = DisjointSet()
+        # wire id -> terminal id of the first endpoint seen on that wire
+        self._wire_anchors: dict[int: int] = {}
+        self._dirty = True
+        self._terminal_nets = array("l")
+        self._nets: list[array] = []
+
+    @staticmethod
+    def from_component(component):
+        netlist = Netlist()
+        for pid in component.pins:
+            netlist.add_terminal(pin_terminal(pid))
+        for cid in component.chips:
+            netlist.add_chip(cid, component.get_chip(cid))
+        for wid in component.wires:
+            for conn in component.get_wire(wid).connections:
+                netlist.add_connection(wid, conn)
+        return netlist
+
+    def add_terminal(self, key: tuple) -> int:
+        tid = self.terminal_ids.get(key)
+        if tid is None:
+            tid = self._sets.add()
+            self.terminals.append(key)
+            self.terminal_ids[key] = tid
+            self._dirty = True
+        return tid
+
+    def add_chip(self, cid, chip):
+        # Chips loaded from json without a resolved component only get the
+        # terminals their wires mention
+        if chip.component is None:
+            return
+        for iid in chip.component.get_io_indices():
+            self.add_terminal(chip_terminal(cid, iid))
+
+    def add_connection(self, wid, conn):
+        t1 = self.add_terminal(conn.from_.terminal())
+        t2 = self.add_terminal(conn.to.terminal())
+        self._union(t1, t2)
+        # All endpoints of a wire share a net, even if its connections
+        # don't form a connected chain
+        anchor = self._wire_anchors.setdefault(int(wid), t1)
+        self._union(anchor, t1)
+
+    def _union(self, t1, t2):
+        if self._sets.union(t1, t2):
+            self._dirty = True
+
+    def compile(self):
+        if not self._dirty:
+            return self
+        find = self._sets.find
+        root_nets = {}
+        terminal_nets = array("l", bytes(array("l").itemsize * len(self.terminals)))
+        nets = []
+        for tid in range(len(self.terminals)):
+            root = find(tid)
+            net = root_nets.get(root)
+            if net is None:
+                net = root_nets[root] = len(nets)
+                nets.append(array("l"))
+            terminal_nets[tid] = net
+            nets[net].append(tid)
+        self._terminal_nets = terminal_nets
+        self._nets = nets
+        self._dirty = False
+        return self
+
+    @property
+    def net_count(self) -> int:
+        return len(self.compile()._nets)
+
+    def net_of(self, key: tuple) -> int:
+        return self.compile()._terminal_nets[self.terminal_ids[key]]
+
+    def net_terminal_ids(self, net: int) -> array:
+        return self.compile()._nets[net]
+
+    def net_terminals(self, net: int) -> list[tuple]:
+        return [self.terminals[tid] for tid in self.net_terminal_ids(net)]
+
+    def terminal_nets(self) -> array:
+        """Net id of every terminal, indexed by terminal id"""
+        return self.compile()._terminal_nets
+
+    def connected(self, key1: tuple, key2: tuple) -> bool:
+        find = self._sets.find
+        return find(self.terminal_ids[key1]) == find(self.terminal_ids[key2])
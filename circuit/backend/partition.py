@@ -0,0 +1,288 @@
+import traceback
+from multiprocessing import get_context
+from threading import BrokenBarrierError
+
+from circuitlogger import *
+from .flattener import Flattener, FlatTemplate
+from .netlist import DisjointSet
+from .simulator import Simulator, SimulationError, SwitchNetwork, S_SUPPLY
+
+# Seconds a worker waits for the others at the end of a step before it
+# gives up on them (one crashed or hangs)
+BARRIER_TIMEOUT = 60
+# Seconds between checks that the workers are still alive while waiting
+# for an answer
+POLL_INTERVAL = 0.5
+
+
+def partition_nets(network: SwitchNetwork, parts: int) -> list[int]:
+    """Owning partition of every net.
+
+    Nets joined by any transistor channel always end up together, so every
+    channel-connected group is evaluated by one partition; supplies never
+    change and split groups. The groups are kept together by the top-level
+    chip their transistors belong to as long as there are enough chips to
+    balance the transistor count over `parts`."""
+    n = network.net_count
+    supply = [s == S_SUPPLY for s in network.drive_strengths]
+    sets = DisjointSet(n)
+    for a, b in zip(network.t_a, network.t_b):
+        if not supply[a] and not supply[b]:
+            sets.union(a, b)
+    # top-level chip of the first device seen on each net
+    top_chip = {}
+    for path, nets in zip(network.template.device_paths,
+                          network.template.device_nets):
+        chip = path.partition("/")[0]
+        for net in nets:
+            top_chip.setdefault(net, chip)
+    # weight of every group (its transistors, plus one so that gate-only
+    # nets get spread as well), grouped by chip
+    weights = {}
+    blocks = {}
+    for net in range(n):
+        root = sets.find(net)
+        if root not in weights:
+            weights[root] = 0
+            blocks.setdefault(top_chip.get(root, ""), []).append(root)
+        weights[root] += 1 + len(network.channels[net])
+    if len(blocks) >= parts:
+        units = [(sum(weights[root] for root in roots), roots)
+                 for roots in blocks.values()]
+    else:
+        units = [(weight, [root]) for root, weight in weights.items()]
+    # largest first onto the least loaded partition
+    units.sort(key=lambda unit: -unit[0])
+    loads = [0] * parts
+    root_owners = {}
+    for weight, roots in units:
+        part = loads.index(min(loads))
+        loads[part] += weight
+        for root in roots:
+            root_owners[root] = part
+    return [root_owners[sets.find(net)] for net in range(n)]
+
+
+class PartitionedSimulator:
+    """Simulator split over worker processes.
+
+    Every worker keeps the values of all nets but only evaluates the nets
+    of its partition. After each unit-delay step the workers publish the
+    nets they changed in shared memory and wait for each other, so they
+    advance in lock-step and the results (values, events and time) are
+    exactly those of Simulator.
+
+    If a worker fails or dies, every worker is stopped and the call
+    raises SimulationError with their tracebacks; the simulator can't be
+    used after that."""
+    def __init__(self, template: FlatTemplate, flattener: Flattener,
+                 workers=2):
+        self.network = SwitchNetwork(template, flattener)
+        self.template = template
+        self.workers = workers
+        self.owners = partition_nets(self.network, workers)
+        self.time = 0
+        self.events = 0
+        context = get_context()
+        barrier = context.Barrier(workers)
+        # per worker: two buffers (alternating steps) of pending flag,
+        # change count and changed nets, at most one change per owned net
+        sizes = [self.owners.count(part) + 2 for part in range(workers)]
+        buffers = [context.RawArray("i", 2 * size) for size in sizes]
+        self._pipes = []
+        self._processes = []
+        for part in range(workers):
+            ours, theirs = context.Pipe()
+            process = context.Process(
+                target=_worker,
+                args=(part, self.network, self.owners, buffers, barrier, theirs),
+                name=f"sim-partition-{part}", daemon=True
+            )
+            process.start()
+            self._pipes.append(ours)
+            self._processes.append(process)
+        log(LOG_VERB, f"Started {workers} simulation partitions of sizes {sizes}")
+
+    @staticmethod
+    def for_project(project, package_datas, id_=None, workers=2):
+        flattener = Flattener(project, package_datas)
+        return PartitionedSimulator(flattener.flatten(id_), flattener, workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        for pipe in self._pipes:
+            try:
+                pipe.send(("stop",))
+            except OSError:
+                # exited already
+                pass
+        for process in self._processes:
+            process.join()
+        self._pipes = []
+        self._processes = []
+
+    def _stop_workers(self):
+        for process in self._processes:
+            process.terminate()
+            process.join()
+        self._pipes = []
+        self._processes = []
+
+    def _send(self, part, message):
+        if not self._processes:
+            raise SimulationError("Partitioned simulator is closed")
+        try:
+            self._pipes[part].send(message)
+        except OSError:
+            # the worker is gone, find out why
+            self._receive(part)
+
+    def _receive(self, part):
+        """Answer of worker `part`. If it failed or died, stops every
+        worker and raises SimulationError with what the workers reported"""
+        if not self._processes:
+            raise SimulationError("Partitioned simulator is closed")
+        pipe = self._pipes[part]
+        errors = []
+        while not pipe.poll(POLL_INTERVAL):
+            # the others may be stuck on the barrier of a dead worker
+            if not all(process.is_alive() for process in self._processes):
+                break
+        else:
+            try:
+                status, result = pipe.recv()
+            except EOFError:
+                status, result = "error", "exited without answering"
+            if status == "ok":
+                return result
+            errors.append(f"partition {part}: {result}")
+        # a failing worker breaks the barrier of the others, collect all
+        # reports to include the one that started it
+        for other, other_pipe in enumerate(self._pipes):
+            try:
+                if other_pipe.poll(0 if other == part else POLL_INTERVAL):
+                    status, result = other_pipe.recv()
+                    if status == "error":
+                        errors.append(f"partition {other}: {result}")
+            except (EOFError, OSError):
+                pass
+        for other, process in enumerate(self._processes):
+            if not process.is_alive() and process.exitcode:
+                errors.append(f"partition {other} exited with code {process.exitcode}")
+        self._stop_workers()
+        raise SimulationError("Partitioned simulation failed\n" + "\n".join(errors))
+
+    def net(self, name: str) -> int:
+        return self.network.net(name)
+
+    def set(self, name: str, value: int | None):
+        self.net(name)
+        for part in range(self.workers):
+            self._send(part, ("set", name, value))
+
+    def probe(self, name: str) -> int:
+        net = self.net(name)
+        part = self.owners[net]
+        self._send(part, ("probe", net))
+        return self._receive(part)
+
+    def run(self, max_steps=10000) -> int:
+        for part in range(self.workers):
+            self._send(part, ("run", max_steps))
+        events = 0
+        for part in range(self.workers):
+            worker_events, steps, pending = self._receive(part)
+            events += worker_events
+        if pending:
+            log(LOG_WARN, f"Simulation did not settle after {max_steps} steps")
+        self.time += steps
+        self.events += events
+        return events
+
+
+class _PartitionSimulator(Simulator):
+    # Simulator that only schedules the nets it owns and records which of
+    # them changed
+    def __init__(self, network: SwitchNetwork, owned: bytearray):
+        self.owned = owned
+        self.changes: list[int] = []
+        super().__init__(network.template, None, network)
+
+    def _schedule(self, net):
+        if self.owned[net]:
+            super()._schedule(net)
+
+    def _changed(self, net):
+        if self.owned[net]:
+            self.changes.append(net)
+        super()._changed(net)
+
+    def apply(self, net, value):
+        """Take over a change from another partition"""
+        self.values[net] = value
+        Simulator._changed(self, net)
+
+    def run_partition(self, buffers: list, part: int, barrier,
+                      max_steps) -> tuple[int, int, bool]:
+        own = buffers[part]
+        # start of the buffer used in odd steps, for every partition
+        halves = [len(buffer) // 2 for buffer in buffers]
+        # inputs were set in every partition already
+        self.changes.clear()
+        events = 0
+        steps = 0
+        own[0] = bool(self._pending)
+        barrier.wait(BARRIER_TIMEOUT)
+        pending = any(buffer[0] for buffer in buffers)
+        while pending:
+            if steps >= max_steps:
+                break
+            events += self._step()
+            steps += 1
+            odd = steps & 1
+            base = halves[part] * odd
+            own[base + 1] = len(self.changes)
+            for i, net in enumerate(self.changes, base + 2):
+                own[i] = net << 2 | self.values[net]
+            self.changes.clear()
+            barrier.wait(BARRIER_TIMEOUT)
+            for other, buffer in enumerate(buffers):
+                if other == part:
+                    continue
+                start = halves[other] * odd + 2
+                for i in range(start, start + buffer[start - 1]):
+                    self.apply(buffer[i] >> 2, buffer[i] & 3)
+            own[base] = bool(self._pending)
+            barrier.wait(BARRIER_TIMEOUT)
+            pending = any(buffer[halves[other] * odd]
+                          for other, buffer in enumerate(buffers))
+        return events, steps, pending
+
+
+def _worker(part, network, owners, buffers, barrier, pipe):
+    owned = bytearray(owner == part for owner in owners)
+    simulator = _PartitionSimulator(network, owned)
+    buffers = [memoryview(buffer).cast("B").cast("i") for buffer in buffers]
+    try:
+        while True:
+            command, *args = pipe.recv()
+            if command == "set":
+                simulator.set(*args)
+            elif command == "probe":
+                pipe.send(("ok", simulator.values[args[0]]))
+            elif command == "run":
+                pipe.send(("ok", simulator.run_partition(buffers, part, barrier, args[0])))
+            elif command == "stop":
+                break
+    except BrokenBarrierError:
+        # another partition failed (and reports why), or didn't answer
+        pipe.send(("error", f"partition {part} gave up waiting for the others"))
+    except Exception:
+        # release the partitions waiting on us before reporting
+        barrier.abort()
+        pipe.send(("error", traceback.format_exc()))
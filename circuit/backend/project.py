@@ -1,43 +1,170 @@
-from os.path import join, basename, exists, dirname
+from os.path import join, basename, exists, dirname, getsize
 from os import makedirs, mkdir
+from shutil import copyfile
+from threading import Thread, Lock
 from json import loads, dumps, JSONDecodeError
 import re
 
 from .dag import DAG
+from .io_pool import pool_map, pool_size, read_json, read_json_files
 from circuitlogger import *
 from configuration import INCLUDED_PACKAGES
-from circuit.base_classes import Component, PluginComponent
+from circuit.base_classes import Component, PluginComponent, write_atomic, \
+    meta_size, plugin_definition
 from circuit.package_manager import trygetpackage
 
 
 class ProjectLoaderError(RuntimeError): pass
 
 
+class SaveStats:
+    """Files (and their bytes) a save wrote and skipped as unchanged"""
+    def __init__(self):
+        self.written_files = 0
+        self.written_bytes = 0
+        self.skipped_files = 0
+        self.skipped_bytes = 0
+
+    def written(self, size):
+        self.written_files += 1
+        self.written_bytes += size
+
+    def skipped(self, size):
+        self.skipped_files += 1
+        self.skipped_bytes += size
+
+    def merge(self, other: "SaveStats"):
+        self.written_files += other.written_files
+        self.written_bytes += other.written_bytes
+        self.skipped_files += other.skipped_files
+        self.skipped_bytes += other.skipped_bytes
+
+    def __str__(self):
+        return (f"wrote {self.written_files} files ({self.written_bytes} bytes), "
+                f"skipped {self.skipped_files} unchanged files ({self.skipped_bytes} bytes)")
+
+
 class ComponentWrapper:
-    def __init__(self, c: Component, n):
-        self.component = c
+    """Entry of a project component in config.json.
+
+    Components of a loaded project are parsed from their file on first
+    access of `component`; until then their children (as listed in the
+    config) stand in for them in the project DAG. Project.prefetch may
+    have parsed the file already, the component is still built by the
+    thread accessing it."""
+    def __init__(self, c: Component | None, n, project=None, id_=None,
+                 path=None, children=None, size=None):
+        self._component = c
+        self._children = children
+        # (width, height) as listed in the config
+        self._size: tuple[int, int] | None = size
+        self._lock = Lock()
+        # parsed file from Project.prefetch, waiting to be built
+        self._prefetched: dict | None = None
+        # callable building the component if it doesn't come from its json
+        # file (see binary_project)
+        self.source = None
         self.name = n
-        self.id_ = c.id_
-        project: Project = c.project
-        self.path = Project.id_to_file_name(
+        self.project: Project = c.project if c is not None else project
+        self.id_ = c.id_ if c is not None else id_
+        self.path = path or Project.id_to_file_name(
             self.id_,
-            project.get_component_file_names()
+            self.project.get_component_file_names()
         )
 
+    @property
+    def component(self) -> Component:
+        if self._component is None:
+            with self._lock:
+                if self._component is None:
+                    self._component = self._load()
+        return self._component
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._component is not None
+
+    @property
+    def is_prefetched(self) -> bool:
+        return self._prefetched is not None
+
+    def prefetched(self, jsondata: dict):
+        """Keep the file parsed in the background until the component is
+        used"""
+        with self._lock:
+            if self._component is None:
+                self._prefetched = jsondata
+
+    def size(self) -> tuple[int, int]:
+        """Width and height of the component as a chip, from the config
+        while it isn't loaded"""
+        if self._component is None and self._size is not None:
+            return self._size
+        return meta_size(self.component.metadata)
+
+    def children(self) -> list[str]:
+        """IDs of the components placed in this one"""
+        if self._component is None:
+            return self._children
+        return sorted({chip.type_id for chip in self._component.chips.values()})
+
+    def file_path(self, project_path=None) -> str:
+        project_path = project_path or self.project.path
+        if project_path is None:
+            return self.path
+        return join(project_path, "components", self.path)
+
+    def _load(self) -> Component:
+        if self.source is not None:
+            return self.source()
+        jsondata, self._prefetched = self._prefetched, None
+        if jsondata is None:
+            path = self.file_path()
+            log(LOG_VERB, "Loading component %s from %s", self.id_, path)
+            jsondata = read_json(path)
+            if isinstance(jsondata, Exception):
+                raise jsondata
+        return Component.from_json(self.project, self.id_, jsondata)
+
+    def load_from_json(self, jsondata: dict) -> Component:
+        """Build the component from its already parsed file, unless it got
+        loaded in the meantime"""
+        with self._lock:
+            if self._component is None:
+                self._component = Component.from_json(self.project, self.id_, jsondata)
+                self._prefetched = None
+        return self._component
+
     def serialize(self):
         return {
             "name": self.name,
-            "path": self.path
+            "path": self.path,
+            "children": self.children(),
+            "size": list(self.size())
         }
 
+    def save(self, project_path, stats: SaveStats = None) -> SaveStats:
+        """Write the component file into `project_path`, unless it's the
+        file the component came from and the component didn't change"""
+        stats = stats or SaveStats()
+        path = self.file_path(project_path)
+        if self.file_path() == path and exists(path) and \
+                not (self.is_loaded and self.component.is_dirty):
+            stats.skipped(getsize(path))
+        elif self.is_loaded or self.source is not None:
+            stats.written(self.component.save(path))
+        else:
+            # never touched, the file can be taken over as it is
+            copyfile(self.file_path(), path)
+            stats.written(getsize(path))
+        return stats
+
     @staticmethod
     def load_from_component_dict(project, ckey, cdict):
-        name = cdict["name"]
-        path = cdict["path"]
-        with open(path) as rf:
-            jsondata = loads(rf.read()) # TODO: error msgs
-        return ComponentWrapper(Component.from_json(project, ckey, jsondata),
-                                name)
+        size = cdict.get("size")
+        return ComponentWrapper(None, cdict["name"], project, ckey,
+                                cdict["path"], cdict.get("children"),
+                                tuple(size) if size is not None else None)
 
 
 class Project:
@@ -53,6 +180,8 @@ class Project:
             "components": {}
         }
         self.name = name
+        # directory the project was loaded from / saved to
+        self.path = None
         self.metadata = {
             "data-version": 1,
             "name": name,
@@ -61,12 +190,21 @@ class Project:
         self.is_loaded = True
         self.ddag = DAG()
         self.included_components = {}
+        # plugin component id -> directory of its package
+        self._plugin_paths: dict[str: str] = {}
         self.root_component = None
         self.selected_component = None
+        self.prefetch_thread: Thread | None = None
+        # config.json needs to be written (components track their own)
+        self.dirty = True
+
+    def mark_dirty(self):
+        self.dirty = True
 
     def set_meta(self, attrname, *values):
         if attrname in ("description", "name"):
             self.metadata[attrname] = " ".join(values)
+            self.mark_dirty()
 
     def load_from_config(self, data, package_datas):
         self.config = data.copy()
@@ -76,16 +214,36 @@ class Project:
         del self.config["meta"]
         for k in data["meta"]:
             if k in ("data-version", "name", "description"):
-                self.set_meta(k, data["meta"][k])
+                self.metadata[k] = data["meta"][k]
         del self.config["components"]
         self.config["components"] = {}
         for ckey in data["components"]:
-            cw = ComponentWrapper.load_from_component_dict(
+            self.config["components"][ckey] = ComponentWrapper.load_from_component_dict(
                 self,
                 ckey,
                 data["components"][ckey]
             )
-            self.config["components"][ckey] = cw
+        # Older configs don't list the children, they come from the
+        # component files (parsed on the I/O pool)
+        legacy = [cw for cw in self.config["components"].values() if cw._children is None]
+        jsons = read_json_files([cw.file_path() for cw in legacy])
+        for cw, jsondata in zip(legacy, jsons):
+            if isinstance(jsondata, Exception):
+                raise jsondata
+            cw._children = sorted({chip["type"] for chip in
+                                   jsondata.get("subcomponents", {}).values()})
+            cw._size = meta_size(jsondata.get("component-meta", {}))
+        edges = []
+        for ckey, cw in self.config["components"].items():
+            self.ddag.add_node(ckey, True)
+            for child in cw.children():
+                self.ddag.add_node(child, True)
+                edges.append((ckey, child))
+        self.ddag.connect_all(edges)
+        # the parsed files stay for when the components are first used,
+        # like those of Project.prefetch
+        for cw, jsondata in zip(legacy, jsons):
+            cw.prefetched(jsondata)
         project_dependencies = data["required-packages"]
         for packname in project_dependencies:
             if not packname in package_datas.keys():
@@ -95,10 +253,15 @@ class Project:
             for chipname in project_dependencies[packname]:
                 try:
                     component_class = package_data.PACKAGE[chipname]
-                    self.included_components[package_data.PACKAGE.mangled_name(chipname)] = component_class
+                    mangled = package_data.PACKAGE.mangled_name(chipname)
+                    self.included_components[mangled] = component_class
+                    self._plugin_paths[mangled] = dirname(package_data.__file__)
                 except KeyError:
                     log(LOG_FAIL, f"Chip {package_data.PACKAGE.mangled_name(chipname)} could not be found!")
                     raise ProjectLoaderError("Error obtaining component")
+        # older configs get the children lists and sizes on the next save
+        self.dirty = any("children" not in cdict or "size" not in cdict
+                         for cdict in data["components"].values())
         return self
 
     @staticmethod
@@ -118,23 +281,43 @@ class Project:
             fns.append(cw.path)
         return fns
 
-    def save(self, path):
+    def save(self, path) -> SaveStats:
+        """Save the project directory. Saving to the directory the project
+        came from only writes the files that changed; every file is
+        replaced atomically"""
+        stats = SaveStats()
         makedirs(path, exist_ok=True)
         if not exists(join(path, "components")):
             mkdir(join(path, "components"))
-        config_dict = {"meta": self.metadata}
-        config_dict |= self.config
-        del config_dict["components"]
-        config_dict["components"] = {}
-        for ckey in self.config["components"]:
-            cw = self.getComponentWrapper(ckey)
-            json = cw.serialize()
-            config_dict["components"][ckey] = json
-        with open(join(path, "config.json"), "w") as configfile:
-            configfile.write(dumps(config_dict, indent=4))
-        for ckey in self.config["components"]:
-            c: ComponentWrapper = self.config["components"][ckey]
-            c.component.save(join(path, "components", c.path))
+        wrappers = list(self.config["components"].values())
+        for cw in wrappers:
+            if cw.source is not None:
+                # building touches the project DAG, keep that on this thread
+                cw.component
+        # sizes in the config go stale when a component's metadata changes
+        if any(cw.is_loaded and cw.size() != cw._size for cw in wrappers):
+            self.dirty = True
+        config_path = join(path, "config.json")
+        if self.dirty or self.path != path or not exists(config_path):
+            config_dict = {"meta": self.metadata}
+            config_dict |= self.config
+            del config_dict["components"]
+            config_dict["components"] = {}
+            for ckey in self.config["components"]:
+                cw = self.getComponentWrapper(ckey)
+                json = cw.serialize()
+                config_dict["components"][ckey] = json
+            stats.written(write_atomic(config_path, dumps(config_dict, indent=4)))
+            for cw in wrappers:
+                if cw.is_loaded:
+                    cw._size = cw.size()
+        else:
+            stats.skipped(getsize(config_path))
+        for component_stats in pool_map(lambda cw: cw.save(path), wrappers):
+            stats.merge(component_stats)
+        self.path = path
+        self.dirty = False
+        return stats
 
     @staticmethod
     def load(path, package_datas: dict):
@@ -146,12 +329,85 @@ class Project:
             log(LOG_FAIL, f"Could not locate project config @ {path}!")
         except JSONDecodeError as e:
             log(LOG_FAIL, f"Malformed project json for project {path}! {e}")
-        return Project(basename(path)).load_from_config(config_data, package_datas)
+        project = Project(basename(path))
+        project.path = path
+        project.load_from_config(config_data, package_datas)
+        project.prefetch()
+        return project
+
+    def prefetch(self, ids=None):
+        """Read and parse component files in a background thread, by
+        default the ones reachable from the root component. Building a
+        component changes the project DAG, so that is left to the thread
+        using it"""
+        if ids is None:
+            root = self.config["root-component"]["id"]
+            if root is None or not self.componentExists(root):
+                return
+            ids = self.ddag.topo_order(root)
+        wrappers = [self.getComponentWrapper(id_) for id_ in ids
+                    if self.componentExists(id_)]
+        wrappers = [cw for cw in wrappers if not cw.is_loaded
+                    and not cw.is_prefetched and cw.source is None]
+        if wrappers:
+            self.prefetch_thread = Thread(
+                target=self._prefetch_files, args=(wrappers,),
+                name=f"prefetch-{self.name}", daemon=True
+            )
+            self.prefetch_thread.start()
+
+    @staticmethod
+    def _prefetch_files(wrappers: list[ComponentWrapper], workers=None):
+        chunk = max(1, pool_size(workers)) * 256
+        for start in range(0, len(wrappers), chunk):
+            chunk_wrappers = [cw for cw in wrappers[start:start + chunk]
+                              if not cw.is_loaded]
+            try:
+                jsons = read_json_files([cw.file_path() for cw in chunk_wrappers], workers)
+            except RuntimeError:
+                # the interpreter is exiting, no new pools
+                return
+            for cw, jsondata in zip(chunk_wrappers, jsons):
+                # errors are reported again when the component is used
+                if not isinstance(jsondata, Exception):
+                    cw.prefetched(jsondata)
+
+    def load_components(self, ids=None, workers=None) -> dict[str: Exception]:
+        """Load components (by default all of them). Files are read and
+        parsed on the I/O pool, the components are then built one after
+        another in the order of `ids`, so the DAG comes out the same as
+        when loading them one by one. Returns the errors by component id"""
+        ids = list(self.config["components"] if ids is None else ids)
+        wrappers = [self.getComponentWrapper(id_) for id_ in ids]
+        errors = {}
+        # in chunks, so only a few parsed files wait to be built at a time
+        chunk = max(1, pool_size(workers)) * 256
+        for start in range(0, len(wrappers), chunk):
+            chunk_wrappers = wrappers[start:start + chunk]
+            from_files = [cw for cw in chunk_wrappers if not cw.is_loaded
+                          and cw.source is None and not cw.is_prefetched]
+            jsons = dict(zip(
+                (cw.id_ for cw in from_files),
+                read_json_files([cw.file_path() for cw in from_files], workers)
+            ))
+            for cw in chunk_wrappers:
+                try:
+                    jsondata = jsons.get(cw.id_)
+                    if isinstance(jsondata, Exception):
+                        raise jsondata
+                    if jsondata is None:
+                        cw.component
+                    else:
+                        cw.load_from_json(jsondata)
+                except (OSError, ValueError, AssertionError, KeyError) as e:
+                    errors[cw.id_] = e
+        return errors
 
     def set_root_id(self, id_: str):
         if not id_ in self.config["components"].keys():
             raise KeyError("No component with ID " + id_)
         self.config["root-component"]["id"] = id_
+        self.mark_dirty()
 
     def new_component(self, id_: str, n=None):
         name = n or id_
@@ -161,6 +417,7 @@ class Project:
             raise ValueError(f"Component {id_} already exists!")
         c = Component(self, id_)
         self.config["components"][id_] = ComponentWrapper(c, name)
+        self.mark_dirty()
         return c
 
     def getComponentWrapper(self, id_) -> ComponentWrapper:
@@ -171,12 +428,30 @@ class Project:
             return self.getComponentWrapper(id_).component
         if self.pluginComponentExists(id_):
             pcClass = self.included_components[id_]
-            containerPackage = trygetpackage(id_, packdatas)
-            packpath = dirname(containerPackage.__file__)
+            packpath = self._plugin_paths.get(id_)
+            if packpath is None:
+                containerPackage = trygetpackage(id_, packdatas)
+                packpath = self._plugin_paths[id_] = dirname(containerPackage.__file__)
             component: PluginComponent = pcClass(self, id_, packpath)
             return component
         raise KeyError(f"Component {id_} does not exist!")
 
+    def component_size(self, id_) -> tuple[int, int]:
+        """Width and height of a component as a chip without loading it,
+        (0, 0) if it's unknown"""
+        if self.componentExists(id_):
+            return self.getComponentWrapper(id_).size()
+        packpath = self._plugin_paths.get(id_)
+        if packpath is not None and self.pluginComponentExists(id_):
+            pcClass = self.included_components[id_]
+            definition = plugin_definition(
+                id_, join(packpath, "components", pcClass._component_file_path),
+                pcClass._component_name
+            )
+            if definition is not None and definition.metadata:
+                return meta_size(definition.metadata)
+        return 0, 0
+
     def componentExists(self, id_) -> bool:
         """Check whether `id_` is a project component"""
         return id_ in self.config["components"].keys()
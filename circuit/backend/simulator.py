@@ -0,0 +1,390 @@
+from collections import deque
+
+from circuitlogger import *
+from .flattener import Flattener, FlatTemplate
+from .timing_wheel import TimingWheel
+
+
+# Net values
+V0 = 0
+V1 = 1
+VX = 2
+VALUE_CHARS = "01x"
+
+# Driver strengths; nets without a driver keep their charge
+S_NONE = 0
+S_INPUT = 1
+S_SUPPLY = 2
+
+# Transistor switching delay if the plugin json doesn't declare "delay"
+DEFAULT_DELAY = 1
+
+# Transistor conduction states (indexed by gate value)
+T_OFF = 0
+T_ON = 1
+T_UNKNOWN = 2
+NMOS_CONDUCTION = (T_OFF, T_ON, T_UNKNOWN)
+PMOS_CONDUCTION = (T_ON, T_OFF, T_UNKNOWN)
+
+
+class SimulationError(RuntimeError): pass
+
+
+def parse_value(s: str) -> int | None:
+    """'0'/'1'/'x' -> net value, 'z' -> None (release the input)"""
+    s = s.lower()
+    if s == "z":
+        return None
+    if s not in VALUE_CHARS:
+        raise ValueError(f"Invalid net value '{s}'")
+    return VALUE_CHARS.index(s)
+
+
+class SwitchNetwork:
+    """Transistor and supply tables of a flattened netlist"""
+    def __init__(self, template: FlatTemplate, flattener: Flattener):
+        self.template = template
+        n = template.net_count
+        self.net_count = n
+        # supply drivers
+        self.drive_values = bytearray(n)
+        self.drive_strengths = bytearray(n)
+        # transistors: gate net, channel nets, conduction table
+        self.t_gate: list[int] = []
+        self.t_a: list[int] = []
+        self.t_b: list[int] = []
+        self.t_conduction: list[tuple] = []
+        self.t_delay: list[int] = []
+        # net -> transistors it gates / transistors on its channel side
+        self.gate_fanout: list[list[int]] = [[] for _ in range(n)]
+        self.channels: list[list[int]] = [[] for _ in range(n)]
+        # truth table devices: (table, input nets, output nets); their
+        # outputs are driven like inputs
+        self.tables: list[tuple] = []
+        self.table_fanout: list[list[int]] = [[] for _ in range(n)]
+        self._load_devices(flattener)
+
+    def _load_devices(self, flattener: Flattener):
+        gate_positions = {}
+        skipped = set()
+        for type_id, nets in zip(self.template.device_types,
+                                 self.template.device_nets):
+            component = flattener.get_component(type_id)
+            table = self.template.tables.get(type_id)
+            if table is not None:
+                self._add_table(table, component, nets)
+                continue
+            model = component._sim_model
+            if model == "vcc" or model == "gnd":
+                for net in nets:
+                    self.drive_values[net] = V1 if model == "vcc" else V0
+                    self.drive_strengths[net] = S_SUPPLY
+            elif model == "nmos" or model == "pmos":
+                if type_id not in gate_positions:
+                    gate_positions[type_id] = self._gate_position(component)
+                gate_pos = gate_positions[type_id]
+                gate = nets[gate_pos]
+                a, b = [net for i, net in enumerate(nets) if i != gate_pos]
+                t = len(self.t_gate)
+                self.t_gate.append(gate)
+                self.t_a.append(a)
+                self.t_b.append(b)
+                self.t_conduction.append(
+                    NMOS_CONDUCTION if model == "nmos" else PMOS_CONDUCTION
+                )
+                self.t_delay.append(int(component.metadata.get("delay", DEFAULT_DELAY)))
+                self.gate_fanout[gate].append(t)
+                self.channels[a].append(t)
+                self.channels[b].append(t)
+            elif type_id not in skipped:
+                log(LOG_WARN, f"Component {type_id} has no simulation model, ignoring it")
+                skipped.add(type_id)
+
+    def _add_table(self, table, component, nets):
+        positions = {iid: i for i, iid in enumerate(component.get_io_indices())}
+        inputs = tuple(nets[positions[iid]] for iid in table.inputs)
+        outputs = tuple(nets[positions[iid]] for iid in table.outputs)
+        d = len(self.tables)
+        self.tables.append((table, inputs, outputs))
+        for net in inputs:
+            self.table_fanout[net].append(d)
+        for net in outputs:
+            self.drive_values[net] = VX
+            self.drive_strengths[net] = S_INPUT
+
+    @staticmethod
+    def _gate_position(component) -> int:
+        for i, iid in enumerate(component.get_io_indices()):
+            pin = component.get_pin(component.io_pin_id(iid))
+            if pin.label_.lower() == "gate":
+                return i
+        raise SimulationError(f"Transistor {component.id_} has no gate pin")
+
+    def net(self, name: str) -> int:
+        try:
+            return self.template.net(name)
+        except KeyError:
+            raise KeyError(f"No net named {name}") from None
+
+
+class Simulator:
+    """Event-driven switch-level simulator over a flattened netlist.
+
+    Nets driven by supplies or inputs are strong; all other nets take the
+    value of the strongest driver reachable through conducting transistors,
+    or keep their charge if there is none. Only the nets behind transistors
+    whose gate changed get re-evaluated."""
+    def __init__(self, template: FlatTemplate, flattener: Flattener,
+                 network: SwitchNetwork = None):
+        # a prebuilt network makes the flattener unnecessary
+        if network is None:
+            network = SwitchNetwork(template, flattener)
+        self.network = network
+        self.template = template
+        n = template.net_count
+        self.values = bytearray([VX]) * n
+        self.drive_values = bytearray(network.drive_values)
+        self.drive_strengths = bytearray(network.drive_strengths)
+        self.t_gate = network.t_gate
+        self.t_a = network.t_a
+        self.t_b = network.t_b
+        self.t_conduction = network.t_conduction
+        self.gate_fanout = network.gate_fanout
+        self.channels = network.channels
+        self.tables = network.tables
+        self.table_fanout = network.table_fanout
+        # current conduction of every transistor, follows its gate one
+        # step after it changed
+        self.t_state = bytearray([T_UNKNOWN]) * len(self.t_gate)
+        self._switching: list[int] = []
+        self.time = 0
+        self.events = 0
+        self._pending = deque()
+        self._queued = bytearray(n)
+        self._pending_tables = list(range(len(self.tables)))
+        self._queued_tables = bytearray([1]) * len(self.tables)
+        # settle everything once from the all-unknown state
+        for net in range(n):
+            if self.drive_strengths[net]:
+                self.values[net] = self.drive_values[net]
+            else:
+                self._schedule(net)
+        # supplies were set without _changed(), start the transistors they
+        # gate switched already (the others from x, still unknown)
+        t_state = self.t_state
+        values = self.values
+        for t, gate in enumerate(self.t_gate):
+            t_state[t] = self.t_conduction[t][values[gate]]
+
+    @staticmethod
+    def for_project(project, package_datas, id_=None):
+        flattener = Flattener(project, package_datas)
+        return Simulator(flattener.flatten(id_), flattener)
+
+    def net(self, name: str) -> int:
+        return self.network.net(name)
+
+    def set(self, name: str, value: int | None):
+        """Drive net `name` with `value`, or release it for None"""
+        net = self.net(name)
+        if value is None:
+            self.drive_strengths[net] = S_NONE
+            self._schedule(net)
+            return
+        self.drive_values[net] = value
+        self.drive_strengths[net] = S_INPUT
+        if self.values[net] != value:
+            self.values[net] = value
+            self._changed(net)
+
+    def probe(self, name: str) -> int:
+        return self.values[self.net(name)]
+
+    def _schedule(self, net):
+        if not self._queued[net]:
+            self._queued[net] = 1
+            self._pending.append(net)
+
+    def _schedule_table(self, d):
+        if not self._queued_tables[d]:
+            self._queued_tables[d] = 1
+            self._pending_tables.append(d)
+
+    def _changed(self, net):
+        # Transistors gated by the net may have switched, so both of their
+        # channel sides need a look; a strong net also affects everything
+        # directly behind its own transistors.
+        for t in self.gate_fanout[net]:
+            self._switching.append(t)
+            self._schedule(self.t_a[t])
+            self._schedule(self.t_b[t])
+        for d in self.table_fanout[net]:
+            self._schedule_table(d)
+        if self.drive_strengths[net]:
+            for t in self.channels[net]:
+                self._schedule(self.t_b[t] if self.t_a[t] == net else self.t_a[t])
+
+    def run(self, max_steps=10000) -> int:
+        """Process events until the circuit settles, returns the event count"""
+        events, steps = self._settle(max_steps)
+        self.time += steps
+        self.events += events
+        return events
+
+    def _settle(self, max_steps) -> tuple[int, int]:
+        events = 0
+        steps = 0
+        while self._pending or self._pending_tables:
+            if steps >= max_steps:
+                log(LOG_WARN, f"Simulation did not settle after {max_steps} steps")
+                break
+            events += self._step()
+            steps += 1
+        return events, steps
+
+    def _step(self) -> int:
+        # One unit-delay step: evaluate everything pending now against the
+        # transistor states of the previous step, changes get scheduled for
+        # the next one. This keeps the result independent of the order the
+        # groups are evaluated in.
+        t_state = self.t_state
+        values = self.values
+        for t in self._switching:
+            t_state[t] = self.t_conduction[t][values[self.t_gate[t]]]
+        self._switching.clear()
+        events = 0
+        # Table devices go first, so groups see their new outputs as
+        # drivers in the same step
+        tables = self._pending_tables
+        self._pending_tables = []
+        for d in tables:
+            self._queued_tables[d] = 0
+        for d in tables:
+            events += self._evaluate_table(d)
+        wave = self._pending
+        self._pending = deque()
+        for net in wave:
+            self._queued[net] = 0
+        done = set()
+        for net in wave:
+            if net in done or self.drive_strengths[net]:
+                continue
+            events += self._evaluate(net, done)
+        return events
+
+    def _evaluate_table(self, d) -> int:
+        """Drive the outputs of table device d from one table lookup"""
+        table, inputs, outputs = self.tables[d]
+        values = self.values
+        if any(values[net] == VX for net in inputs):
+            row = None
+        else:
+            row = table.evaluate([values[net] for net in inputs])
+        changes = 0
+        for j, net in enumerate(outputs):
+            value = VX if row is None else row >> j & 1
+            self.drive_values[net] = value
+            if values[net] != value:
+                values[net] = value
+                changes += 1
+                self._changed(net)
+        return changes
+
+    def _evaluate(self, start, done) -> int:
+        """Resolve the channel-connected group around `start`"""
+        values = self.values
+        drive_strengths = self.drive_strengths
+        group = [start]
+        done.add(start)
+        drivers = set()
+        strength = S_NONE
+        uncertain = False
+        i = 0
+        while i < len(group):
+            net = group[i]
+            i += 1
+            for t in self.channels[net]:
+                conduction = self.t_state[t]
+                if conduction == T_OFF:
+                    continue
+                uncertain |= conduction == T_UNKNOWN
+                other = self.t_b[t] if self.t_a[t] == net else self.t_a[t]
+                if drive_strengths[other]:
+                    s = drive_strengths[other]
+                    if s > strength:
+                        strength = s
+                        drivers = {self.drive_values[other]}
+                    elif s == strength:
+                        drivers.add(self.drive_values[other])
+                elif other not in done:
+                    done.add(other)
+                    group.append(other)
+        if strength == S_NONE or uncertain:
+            # floating (or maybe floating), keep the charge if consistent
+            drivers.update(values[net] for net in group)
+        value = drivers.pop() if len(drivers) == 1 else VX
+        changes = 0
+        for net in group:
+            if values[net] != value:
+                values[net] = value
+                changes += 1
+                self._changed(net)
+        return changes
+
+
+class TimedSimulator(Simulator):
+    """Simulator with per-transistor switching delays.
+
+    A gate change switches its transistors after their delay (the "delay"
+    in the plugin component json); everything else settles instantly.
+    Delays are inertial: a gate pulse shorter than the delay is dropped."""
+    def __init__(self, template: FlatTemplate, flattener: Flattener):
+        self.wheel = TimingWheel()
+        super().__init__(template, flattener)
+        self.t_delay = self.network.t_delay
+        self._switch_events = [None] * len(self.t_gate)
+        self.suppressed = 0
+
+    @staticmethod
+    def for_project(project, package_datas, id_=None):
+        flattener = Flattener(project, package_datas)
+        return TimedSimulator(flattener.flatten(id_), flattener)
+
+    def _changed(self, net):
+        value = self.values[net]
+        wheel = self.wheel
+        for t in self.gate_fanout[net]:
+            pending = self._switch_events[t]
+            if pending is not None:
+                wheel.cancel(pending)
+                self._switch_events[t] = None
+            conduction = self.t_conduction[t][value]
+            if conduction != self.t_state[t]:
+                self._switch_events[t] = wheel.schedule(
+                    wheel.now + self.t_delay[t], (t, conduction)
+                )
+            elif pending is not None:
+                # the gate went back before the transistor switched
+                self.suppressed += 1
+        for d in self.table_fanout[net]:
+            self._schedule_table(d)
+        if self.drive_strengths[net]:
+            for t in self.channels[net]:
+                self._schedule(self.t_b[t] if self.t_a[t] == net else self.t_a[t])
+
+    def run(self, until=None, max_steps=10000) -> int:
+        """Simulate up to time `until` (until nothing is pending if None)"""
+        events, _ = self._settle(max_steps)
+        while (next_events := self.wheel.pop_next(until)) is not None:
+            self.time, switches = next_events
+            for t, conduction in switches:
+                self._switch_events[t] = None
+                self.t_state[t] = conduction
+                self._schedule(self.t_a[t])
+                self._schedule(self.t_b[t])
+            events += self._settle(max_steps)[0]
+        if until is not None and until > self.time:
+            self.time = until
+            self.wheel.advance_to(until)
+        self.events += events
+        return events
@@ -0,0 +1,190 @@
+from math import hypot
+
+# Side of a grid cell, in component coordinates
+DEFAULT_CELL_SIZE = 16
+
+
+def rect_distance(rect, x, y) -> float:
+    """Distance from (x, y) to the closest point of rect (0 inside)"""
+    x0, y0, x1, y1 = rect
+    dx = x0 - x if x < x0 else x - x1 if x > x1 else 0
+    dy = y0 - y if y < y0 else y - y1 if y > y1 else 0
+    return hypot(dx, dy)
+
+
+class GridIndex:
+    """Uniform grid hash of axis-aligned rectangles (x0, y0, x1, y1),
+    bounds inclusive; a point is a rectangle of size 0.
+
+    Every key is listed in each cell its rectangle touches, so queries
+    only look at the cells they cover."""
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        # (cx, cy) -> keys with a rectangle touching the cell
+        self.cells: dict[tuple: list] = {}
+        self.rects: dict = {}
+        # cell bounds ever used (never shrink), limit nearest() searches
+        self._bounds = None
+
+    def __len__(self):
+        return len(self.rects)
+
+    def __contains__(self, key):
+        return key in self.rects
+
+    def _cell_range(self, x0, y0, x1, y1):
+        s = self.cell_size
+        return x0 // s, y0 // s, x1 // s, y1 // s
+
+    def insert(self, key, x0, y0, x1=None, y1=None):
+        x1 = x0 if x1 is None else x1
+        y1 = y0 if y1 is None else y1
+        rect = (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        if key in self.rects:
+            if self.rects[key] == rect:
+                return
+            self.remove(key)
+        self.rects[key] = rect
+        cx0, cy0, cx1, cy1 = self._cell_range(*rect)
+        cells = self.cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = cells.get((cx, cy))
+                if cell is None:
+                    cells[(cx, cy)] = [key]
+                else:
+                    cell.append(key)
+        if self._bounds is None:
+            self._bounds = (cx0, cy0, cx1, cy1)
+        else:
+            bx0, by0, bx1, by1 = self._bounds
+            self._bounds = (min(bx0, cx0), min(by0, cy0), max(bx1, cx1), max(by1, cy1))
+
+    # moving is inserting again
+    move = insert
+
+    def remove(self, key):
+        rect = self.rects.pop(key)
+        cx0, cy0, cx1, cy1 = self._cell_range(*rect)
+        cells = self.cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = cells[(cx, cy)]
+                cell.remove(key)
+                if not cell:
+                    del cells[(cx, cy)]
+
+    def query_rect(self, x0, y0, x1, y1) -> list:
+        """Keys whose rectangle intersects (x0, y0, x1, y1)"""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        cx0, cy0, cx1, cy1 = self._cell_range(x0, y0, x1, y1)
+        rects = self.rects
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self.cells):
+            # covers more cells than are in use, scanning is cheaper
+            return [key for key, (rx0, ry0, rx1, ry1) in rects.items()
+                    if rx0 <= x1 and x0 <= rx1 and ry0 <= y1 and y0 <= ry1]
+        found = []
+        seen = set()
+        cells = self.cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                for key in cells.get((cx, cy), ()):
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    rx0, ry0, rx1, ry1 = rects[key]
+                    if rx0 <= x1 and x0 <= rx1 and ry0 <= y1 and y0 <= ry1:
+                        found.append(key)
+        return found
+
+    def query_point(self, x, y, radius=0) -> list:
+        """Keys whose rectangle is at most `radius` away from (x, y)"""
+        if radius <= 0:
+            return self.query_rect(x, y, x, y)
+        return [key for key in self.query_rect(x - radius, y - radius, x + radius, y + radius)
+                if rect_distance(self.rects[key], x, y) <= radius]
+
+    def nearest(self, x, y, max_distance=None):
+        """Key of the rectangle closest to (x, y), None if there is none
+        (within max_distance)"""
+        if not self.rects:
+            return None
+        s = self.cell_size
+        cx, cy = x // s, y // s
+        bx0, by0, bx1, by1 = self._bounds
+        last_ring = max(cx - bx0, bx1 - cx, cy - by0, by1 - cy, 0)
+        best = None
+        best_distance = None
+        cells = self.cells
+        rects = self.rects
+        visited = 0
+        for ring in range(last_ring + 1):
+            # everything in cells further out is at least this far away
+            if best is not None and best_distance <= (ring - 1) * s:
+                break
+            if max_distance is not None and (ring - 1) * s > max_distance:
+                break
+            if visited > len(rects):
+                # sparse grid, the rings are mostly empty: scan instead
+                return self._nearest_scan(x, y, max_distance)
+            if ring == 0:
+                ring_cells = [(cx, cy)]
+            else:
+                ring_cells = [(cx + d, cy - ring) for d in range(-ring, ring + 1)]
+                ring_cells += [(cx + d, cy + ring) for d in range(-ring, ring + 1)]
+                ring_cells += [(cx - ring, cy + d) for d in range(-ring + 1, ring)]
+                ring_cells += [(cx + ring, cy + d) for d in range(-ring + 1, ring)]
+            visited += len(ring_cells)
+            for cell in ring_cells:
+                for key in cells.get(cell, ()):
+                    distance = rect_distance(rects[key], x, y)
+                    if best is None or distance < best_distance:
+                        best = key
+                        best_distance = distance
+        if best is None or (max_distance is not None and best_distance > max_distance):
+            return None
+        return best
+
+    def _nearest_scan(self, x, y, max_distance=None):
+        best = None
+        best_distance = None
+        for key, rect in self.rects.items():
+            distance = rect_distance(rect, x, y)
+            if best is None or distance < best_distance:
+                best = key
+                best_distance = distance
+        if best is None or (max_distance is not None and best_distance > max_distance):
+            return None
+        return best
+
+
+class SpatialIndex:
+    """Where the pins and chips of a component are.
+
+    Pins are points, chips the rectangle of their component's size with
+    the chip position as the top left corner (a point if the size isn't
+    known). Results are pin and chip ids."""
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.pins = GridIndex(cell_size)
+        self.chips = GridIndex(cell_size)
+
+    @staticmethod
+    def from_component(component, cell_size=DEFAULT_CELL_SIZE):
+        index = SpatialIndex(cell_size)
+        for pid, pin in component.pins.items():
+            index.pins.insert(pid, pin.x, pin.y)
+        for cid, chip in component.chips.items():
+            index.chips.insert(cid, *component.chip_rect(chip))
+        return index
+
+    def query_point(self, x, y, radius=0) -> tuple[list[str], list[str]]:
+        """Ids of the pins and chips at (x, y), or within `radius` of it"""
+        return self.pins.query_point(x, y, radius), self.chips.query_point(x, y, radius)
+
+    def query_rect(self, x0, y0, x1, y1) -> tuple[list[str], list[str]]:
+        """Ids of the pins and chips in / overlapping the rectangle"""
+        return self.pins.query_rect(x0, y0, x1, y1), self.chips.query_rect(x0, y0, x1, y1)
+
+    def nearest_pin(self, x, y, max_distance=None) -> str | None:
+        return self.pins.nearest(x, y, max_distance)
@@ -2,9 +2,19 @@ from locals import *
 from circuitlogger import *
 from thread_communicator import ServerData, Directive, DirectiveType
 from .project import Project
+from .binary_project import is_binary_path, save_binary, load_binary
+from .simulator import Simulator, TimedSimulator, parse_value, VALUE_CHARS
+from .batchsim import BatchSimulator, read_vector_file
+from .codegen import CompiledSimulator, CompileError
+from .partition import PartitionedSimulator
+from .flattener import Flattener
+from .truthtable import TruthTableCache, TRUTH_TABLE_DIR
+from .command_stats import CommandStats, profile_call
+from .commands import CommandTrie, InvalidCommandException
 from circuit.base_classes import Package, Component
 
 from json import loads, JSONDecodeError
+from os.path import join, splitext
 
 
 CONSOLE_HELP = f"""\033[1A
@@ -15,16 +25,19 @@ Valid commands:
 Type 'help <command>' for more info on any command."""
 
 
-class InvalidCommandException(SyntaxError): pass
-
-
 class CCP:
     # Console command processor, not chinese communist party
+
+    # public methods that aren't commands
+    INTERNAL_METHODS = ("process_command", "run_command", "mainloop",
+                        "print_valid_commands", "set_simulator", "get_simulator")
+
     def __init__(self, tc: ServerData):
         self.threadCommunicator = tc
         self.history = []
         self.should_close = False
         self.previous_result = None
+        self.command_stats = CommandStats()
         try:
             self.command_help_data = loads(open("circuit/backend/command_help.json").read())
         except JSONDecodeError:
@@ -33,6 +46,8 @@ class CCP:
         except FileNotFoundError:
             log(LOG_FAIL, f"Console manual file could not be located!")
             self.command_help_data = {}
+        self.commands = CommandTrie(self, self.command_help_data.get("manual"),
+                                    self.INTERNAL_METHODS)
 
 
     def help(self, *args):
@@ -50,6 +65,8 @@ class CCP:
                         command_manual = command_manual["subcommands"]
                 fmt = command_manual["format"]
                 description = command_manual.get("description", "")
+                # log output is written in the background, keep it in order
+                flush_logger()
                 print(f"Printing help for '{' '.join(args)}'")
                 print(f"Usage: {fmt}")
                 if description:
@@ -67,23 +84,37 @@ class CCP:
         self.exit(*args)
 
     @logAutoIndent
-    def execute(self, path, *args):
+    def execute(self, path, *options):
+        # Lines are run directly; only log / keep them in the history when asked
+        for option in options:
+            if option not in ("trace", "history"):
+                raise InvalidCommandException(f"Unknown execute option '{option}'")
+        trace = "trace" in options
+        keep_history = "history" in options
         try:
             DBG.set_cr_on_log(False)
             with open(path) as file:
-                for line in file.readlines():
-                    line = line.removesuffix("\n")
-                    if not line:
+                for line in file:
+                    tokens = line.split()
+                    if not tokens:
                         continue
-                    self.process_command(line, help_on_fail=False)
+                    if trace:
+                        log(LOG_DEBG, "Executing command: '%s'", line.rstrip("\n"))
+                    if keep_history:
+                        self.history.append(line.rstrip("\n"))
+                    self.run_command(tokens, help_on_fail=False)
         except FileNotFoundError:
             log(LOG_FAIL, f"Execute file '{path}' could not be opened!")
         finally:
             DBG.set_cr_on_log()
 
     def saveall(self, path, *args):
-        self.threadCommunicator.openProject.save(path)
         log(LOG_VERB, f"Saving all to {path}...")
+        if is_binary_path(path):
+            save_binary(self.threadCommunicator.openProject, path)
+        else:
+            stats = self.threadCommunicator.openProject.save(path)
+            log(LOG_INFO, f"Saved {path}: {stats}")
 
     def project(self, *args):
         self.help("project")
@@ -93,7 +124,10 @@ class CCP:
         self.threadCommunicator.openProject = openProject
 
     def project_open(self, path, *args):
-        openProject = Project.load(path, self.threadCommunicator.package_datas)
+        if is_binary_path(path):
+            openProject = load_binary(path, self.threadCommunicator.package_datas)
+        else:
+            openProject = Project.load(path, self.threadCommunicator.package_datas)
         self.threadCommunicator.openProject = openProject
 
     def project_meta(self, *args):
@@ -119,6 +153,7 @@ class CCP:
             self.threadCommunicator.openProject.included_components[mangled_cname] = chip_class # TODO: move to project method
             already_included_chips.append(chip)
         self.threadCommunicator.openProject.config["required-packages"][pack] = already_included_chips
+        self.threadCommunicator.openProject.mark_dirty()
 
     def project_setroot(self, cname, *args):
         self.threadCommunicator.openProject.set_root_id(cname)
@@ -132,7 +167,7 @@ class CCP:
         else:
             raise KeyError(f"Component {name} does not exist!")
 
-    def chip_place(self, cname, x, y, *args):
+    def chip_place(self, cname, x: int, y: int, *args):
         scn = self.threadCommunicator.selectedComponent
         sc: Component = self.threadCommunicator.openProject.getComponent(
             scn, self.threadCommunicator.package_datas
@@ -142,7 +177,7 @@ class CCP:
         )
         sc.add_chip(c, x, y)
 
-    def pin_place(self, x, y, *args):
+    def pin_place(self, x: int, y: int, *args):
         scn = self.threadCommunicator.selectedComponent
         sc: Component = self.threadCommunicator.openProject.getComponent(
             scn, self.threadCommunicator.package_datas
@@ -187,6 +222,140 @@ class CCP:
         )
         sc.wire_connect(idx, from_, to)
 
+    def sim(self, *args):
+        self.help("sim")
+
+    def sim_init(self, *args):
+        simulator = Simulator.for_project(
+            self.threadCommunicator.openProject,
+            self.threadCommunicator.package_datas,
+            args[0] if args else None
+        )
+        events = simulator.run()
+        self.set_simulator(simulator)
+        log(LOG_INFO, f"Simulating {simulator.template.device_count} devices "
+            + f"on {simulator.template.net_count} nets ({events} events to settle)")
+
+    def sim_compile(self, *args):
+        try:
+            simulator = CompiledSimulator.for_project(
+                self.threadCommunicator.openProject,
+                self.threadCommunicator.package_datas,
+                args[0] if args else None
+            )
+        except CompileError as e:
+            raise InvalidCommandException(f"{e}. Use 'sim init' instead.")
+        simulator.run()
+        self.set_simulator(simulator)
+        log(LOG_INFO, f"Compiled {simulator.template.device_count} devices "
+            + f"on {simulator.template.net_count} nets")
+
+    def sim_timed(self, *args):
+        simulator = TimedSimulator.for_project(
+            self.threadCommunicator.openProject,
+            self.threadCommunicator.package_datas,
+            args[0] if args else None
+        )
+        events = simulator.run()
+        self.set_simulator(simulator)
+        log(LOG_INFO, f"Simulating {simulator.template.device_count} devices "
+            + f"on {simulator.template.net_count} nets with delays "
+            + f"({events} events to settle, t={simulator.time})")
+
+    def sim_cached(self, *args):
+        project = self.threadCommunicator.openProject
+        directory = None
+        if project.path is None:
+            pass
+        elif is_binary_path(project.path):
+            directory = f"{splitext(project.path)[0]}_{TRUTH_TABLE_DIR}"
+        else:
+            directory = join(project.path, TRUTH_TABLE_DIR)
+        tables = self.threadCommunicator.truth_tables
+        if tables is None or tables.directory != directory:
+            tables = TruthTableCache(directory=directory)
+            self.threadCommunicator.truth_tables = tables
+        flattener = Flattener(
+            project, self.threadCommunicator.package_datas, tables
+        )
+        simulator = Simulator(flattener.flatten(args[0] if args else None), flattener)
+        events = simulator.run()
+        self.set_simulator(simulator)
+        log(LOG_INFO, f"Simulating {simulator.template.device_count} devices "
+            + f"({len(simulator.tables)} truth tables) on "
+            + f"{simulator.template.net_count} nets ({events} events to settle)")
+        log(LOG_INFO, f"Truth table cache: {len(tables)} components, "
+            + f"{tables.rows} rows, {tables.hits} hits, {tables.misses} misses")
+
+    def sim_parallel(self, workers: int, *args):
+        if workers < 1:
+            raise InvalidCommandException("At least one worker is needed")
+        simulator = PartitionedSimulator.for_project(
+            self.threadCommunicator.openProject,
+            self.threadCommunicator.package_datas,
+            args[0] if args else None,
+            workers
+        )
+        events = simulator.run()
+        self.set_simulator(simulator)
+        log(LOG_INFO, f"Simulating {simulator.template.device_count} devices "
+            + f"on {simulator.template.net_count} nets in {workers} processes "
+            + f"({events} events to settle)")
+
+    def set_simulator(self, simulator):
+        previous = self.threadCommunicator.simulator
+        if isinstance(previous, PartitionedSimulator):
+            previous.close()
+        self.threadCommunicator.simulator = simulator
+
+    def get_simulator(self) -> Simulator:
+        if self.threadCommunicator.simulator is None:
+            self.sim_init()
+        return self.threadCommunicator.simulator
+
+    def sim_set(self, net, value, *args):
+        try:
+            self.get_simulator().set(net, parse_value(value))
+        except ValueError as e:
+            raise InvalidCommandException(e)
+
+    def sim_run(self, limit: int = None):
+        # the limit is an end time for timed simulations, a step cap for
+        # the event-driven ones
+        simulator = self.get_simulator()
+        if limit is None:
+            events = simulator.run()
+        elif isinstance(simulator, TimedSimulator):
+            events = simulator.run(until=limit)
+        elif isinstance(simulator, CompiledSimulator):
+            raise InvalidCommandException("Compiled simulations settle in one pass, "
+                                          "'sim run' takes no limit for them")
+        else:
+            events = simulator.run(max_steps=limit)
+        log(LOG_INFO, f"Processed {events} events, t={simulator.time}")
+
+    def sim_probe(self, *nets):
+        simulator = self.get_simulator()
+        for net in nets:
+            log(LOG_INFO, f"{net} = {VALUE_CHARS[simulator.probe(net)]}")
+
+    def sim_batch(self, path, *args):
+        try:
+            inputs, outputs, vectors = read_vector_file(path)
+        except FileNotFoundError:
+            raise InvalidCommandException(f"Vector file '{path}' could not be opened!")
+        except ValueError as e:
+            raise InvalidCommandException(e)
+        simulator = BatchSimulator.for_project(
+            self.threadCommunicator.openProject,
+            self.threadCommunicator.package_datas,
+            args[0] if args else None
+        )
+        result = simulator.run(inputs, outputs, vectors)
+        log(LOG_INFO, f"{' '.join(inputs)} : {' '.join(outputs)}")
+        for vector, row in zip(vectors, result.rows()):
+            log(LOG_INFO, f"{vector} : {row}")
+        return result
 
     def debug(self, lvl: str):
         if lvl.lower() in ("base", "b"):
@@ -205,41 +374,79 @@ class CCP:
             log(LOG_FAIL, f"Invalid level '{lvl}'. Valid levels are 'Base', "\
                 +"'Verbose', 'Debug', 'Info', 'Warning', 'Fatal'.")
 
+    def stats(self, *args):
+        for line in self.command_stats.report():
+            log(LOG_INFO, line)
+
+    def stats_on(self, *args):
+        if args and args[0] not in ("alloc", "allocations"):
+            raise InvalidCommandException(f"Unknown stats option '{args[0]}'")
+        self.command_stats.enable(trace_allocations=bool(args))
+        log(LOG_INFO, "Recording command statistics"
+            + (" and allocations" if args else ""))
+
+    def stats_off(self, *args):
+        self.command_stats.disable()
+
+    def stats_reset(self, *args):
+        self.command_stats.reset()
+
+    def profile(self, *command):
+        if not command:
+            raise InvalidCommandException("No command to profile")
+        for line in profile_call(self.process_command, " ".join(command)):
+            log(LOG_INFO, line)
+
+    def profile_dump(self, path, *command):
+        if not command:
+            raise InvalidCommandException("No command to profile")
+        profile_call(self.process_command, " ".join(command), dump_path=path)
+        log(LOG_INFO, f"Wrote profile of '{' '.join(command)}' to {path}")
+
     def print_valid_commands(self):
+        flush_logger()
         print(CONSOLE_HELP % "\n".join(
             list(self.command_help_data.get("manual", {}).keys())))
 
     def process_command(self, command: str, help_on_fail=True):
         if command == "": return
-        log(LOG_DEBG, f"Executing command: '{command}'")
+        log(LOG_DEBG, "Executing command: '%s'", command)
         self.history.append(command)
-        operation, *args = command.split()
-        for arg in args.copy():
-            if hasattr(self, f"{operation}_{arg}"):
-                operation = f"{operation}_{arg}"
-                del args[0]
+        tokens = command.split()
+        if tokens:
+            self.run_command(tokens, help_on_fail)
+
+    def run_command(self, tokens: list[str], help_on_fail=True):
+        """Run a command line split into tokens, without logging it or
+        keeping it in the history"""
+        command, args = self.commands.resolve(tokens)
+        if command is None or command.method is None:
+            log(LOG_FAIL, f"Invalid command '{tokens[0]}'!")
+            if help_on_fail:
+                self.print_valid_commands()
+            return
+        try:
+            args = command.arguments(args)
+            if self.command_stats.enabled:
+                result = self.command_stats.call(command.name, command.method, args)
             else:
-                break
-        if hasattr(self, operation) and not operation.startswith("__"):
-            try:
-                self.previous_result = getattr(self, operation)(*args) or self.previous_result
-            except InvalidCommandException as e:
-                log(LOG_FAIL, f"The command format provided is not valid.")
-                log(LOG_FAIL, f"Message: {e}")
-                if help_on_fail:
-                    self.print_valid_commands()
-            except Exception as e:
-                log(LOG_FAIL, f"There was an error ({repr(e)}) executing the command.")
-                if help_on_fail:
-                    self.print_valid_commands()
-                #raise e
-        else:
-            log(LOG_FAIL, f"Invalid command '{operation}'!")
+                result = command.method(*args)
+            self.previous_result = result or self.previous_result
+        except InvalidCommandException as e:
+            log(LOG_FAIL, f"The command format provided is not valid.")
+            log(LOG_FAIL, f"Message: {e}")
+            if help_on_fail:
+                self.print_valid_commands()
+        except Exception as e:
+            log(LOG_FAIL, f"There was an error ({repr(e)}) executing the command.")
             if help_on_fail:
                 self.print_valid_commands()
+            #raise e
 
     def mainloop(self):
         while not self.should_close:
+            # show what the last command logged before the prompt
+            flush_logger()
             command = input("\r"+TERMINAL_PROMPT)
             self.process_command(command)
 
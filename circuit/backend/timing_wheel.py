@@ -0,0 +1,138 @@
+from heapq import heappush, heappop
+
+
+class Event:
+    __slots__ = ("time", "payload", "active")
+
+    def __init__(self, time, payload):
+        self.time = time
+        self.payload = payload
+        self.active = True
+
+
+class TimingWheel:
+    """Hierarchical timing wheel for integer event times.
+
+    Level L has 2**bits slots of 2**(bits*L) time units each and holds the
+    events in the current level L+1 block, so an event cascades down at
+    most `levels` times before it fires. Events past the top level go to
+    a calendar queue of per-rotation buckets. Cancelling is O(1): events
+    are only flagged and dropped when their slot is reached."""
+    def __init__(self, bits=8, levels=4):
+        self.bits = bits
+        self.slots = 1 << bits
+        self.mask = self.slots - 1
+        self.levels = levels
+        self.wheels = [[[] for _ in range(self.slots)] for _ in range(levels)]
+        # bit i set if slot i of a level may hold events
+        self.bitmaps = [0] * levels
+        # overflow calendar: top level rotation -> events, heap of rotations
+        self.overflow: dict[int: list] = {}
+        self.rotations: list[int] = []
+        self.now = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def schedule(self, time: int, payload) -> Event:
+        if time < self.now:
+            raise ValueError(f"Cannot schedule an event at {time}, it is {self.now} already")
+        event = Event(time, payload)
+        self._insert(event)
+        self.size += 1
+        return event
+
+    def cancel(self, event: Event):
+        if event.active:
+            event.active = False
+            self.size -= 1
+
+    def _insert(self, event: Event):
+        time = event.time
+        now = self.now
+        bits = self.bits
+        for level in range(self.levels):
+            shift = bits * (level + 1)
+            if time >> shift == now >> shift:
+                slot = (time >> (bits * level)) & self.mask
+                self.wheels[level][slot].append(event)
+                self.bitmaps[level] |= 1 << slot
+                return
+        rotation = time >> (bits * self.levels)
+        bucket = self.overflow.get(rotation)
+        if bucket is None:
+            self.overflow[rotation] = [event]
+            heappush(self.rotations, rotation)
+        else:
+            bucket.append(event)
+
+    def next_time(self) -> int | None:
+        """Time of the earliest pending event, without advancing"""
+        if not self.size:
+            return None
+        bits = self.bits
+        for level in range(self.levels):
+            wheel = self.wheels[level]
+            start = (self.now >> (bits * level)) & self.mask
+            pending = self.bitmaps[level] >> start
+            while pending:
+                slot = start + (pending & -pending).bit_length() - 1
+                live = [event for event in wheel[slot] if event.active]
+                wheel[slot] = live
+                if live:
+                    if level == 0:
+                        return (self.now & ~self.mask) | slot
+                    return min(event.time for event in live)
+                self.bitmaps[level] &= ~(1 << slot)
+                pending = self.bitmaps[level] >> start
+        while self.rotations:
+            bucket = self.overflow.get(self.rotations[0])
+            live = [event for event in bucket or () if event.active]
+            if live:
+                self.overflow[self.rotations[0]] = live
+                return min(event.time for event in live)
+            self.overflow.pop(heappop(self.rotations), None)
+        return None
+
+    def advance_to(self, time: int):
+        """Move the clock to `time`. Nothing may be pending before it."""
+        # pull in everything that lives in the blocks `time` enters, top
+        # level first
+        old = self.now
+        self.now = time
+        bits = self.bits
+        top = bits * self.levels
+        if time >> top != old >> top:
+            for event in self.overflow.pop(time >> top, ()):
+                if event.active:
+                    self._insert(event)
+        for level in range(self.levels - 1, 0, -1):
+            shift = bits * level
+            if time >> shift != old >> shift:
+                slot = (time >> shift) & self.mask
+                events = self.wheels[level][slot]
+                self.wheels[level][slot] = []
+                self.bitmaps[level] &= ~(1 << slot)
+                for event in events:
+                    if event.active:
+                        self._insert(event)
+
+    def pop_next(self, until=None) -> tuple[int, list] | None:
+        """(time, payloads) of every event at the earliest pending time, or
+        None if nothing is pending (up to and including `until`)"""
+        time = self.next_time()
+        if time is None or (until is not None and time > until):
+            return None
+        self.advance_to(time)
+        slot = time & self.mask
+        events = self.wheels[0][slot]
+        self.wheels[0][slot] = []
+        self.bitmaps[0] &= ~(1 << slot)
+        payloads = []
+        for event in events:
+            if event.active:
+                event.active = False
+                payloads.append(event.payload)
+        self.size -= len(payloads)
+        return time, payloads
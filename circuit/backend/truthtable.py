@@ -0,0 +1,189 @@
+from collections import OrderedDict
+from hashlib import sha256
+from json import loads, dumps, JSONDecodeError
+from os import makedirs
+from os.path import join, exists
+
+from circuitlogger import *
+from circuit.base_classes import PluginComponent, write_atomic
+from .batchsim import BatchSimulator
+from .simulator import SwitchNetwork, V1, S_SUPPLY
+
+# More inputs than this are not tabulated (2**n rows per table)
+MAX_TABLE_INPUTS = 12
+# Cache budget, in table rows
+DEFAULT_MAX_ROWS = 1 << 20
+# Persistent tables live in this directory inside the project directory
+TRUTH_TABLE_DIR = "truthtables"
+
+
+def fingerprint(flattener, id_, memo: dict = None) -> str:
+    """Content hash of a component's behaviour.
+
+    Covers the pins, io pins, chips and wires of the component and the
+    fingerprints of the components its chips place, but nothing that
+    doesn't change what it does (positions, labels, names)."""
+    memo = {} if memo is None else memo
+    if id_ not in memo:
+        # children first, bottom-up along the project DAG
+        for cid in reversed(flattener.project.ddag.topo_order(id_)):
+            if cid not in memo:
+                memo[cid] = _fingerprint(flattener.get_component(cid), memo)
+    return memo[id_]
+
+
+def _fingerprint(component, memo) -> str:
+    h = sha256()
+    if isinstance(component, PluginComponent):
+        pins = {pid: pin.label_ for pid, pin in component.pins.items()}
+        h.update(dumps([
+            "plugin", component.id_, component._sim_model,
+            component.metadata.get("delay"), pins
+        ], sort_keys=True).encode())
+        return h.hexdigest()
+    chips = {cid: memo[chip.type_id] for cid, chip in component.chips.items()}
+    wires = {
+        wid: sorted([conn.from_.terminal(), conn.to.terminal()]
+                    for conn in wire.connections)
+        for wid, wire in component.wires.items()
+    }
+    h.update(dumps([
+        "component", sorted(component.pins), component.io_pins, chips, wires
+    ], sort_keys=True).encode())
+    return h.hexdigest()
+
+
+class TruthTable:
+    """Outputs of a combinational component for every input combination.
+
+    Bit i of a row index is input i, bit j of a row is output j; inputs and
+    outputs are io indices of the component."""
+    def __init__(self, inputs: list[str], outputs: list[str], rows: list[int]):
+        self.inputs = inputs
+        self.outputs = outputs
+        self.rows = rows
+
+    @property
+    def size(self) -> int:
+        return len(self.rows)
+
+    def serialize(self):
+        return {
+            "inputs": self.inputs,
+            "outputs": self.outputs,
+            "rows": self.rows
+        }
+
+    @staticmethod
+    def from_json(json: dict):
+        return TruthTable(json["inputs"], json["outputs"], json["rows"])
+
+    @staticmethod
+    def characterize(flattener, id_):
+        """Simulate every input combination of component `id_`. None if it
+        has too many inputs or isn't combinational (some output stays x)"""
+        component = flattener.get_component(id_)
+        template = flattener.template(id_)
+        network = SwitchNetwork(template, flattener)
+        # ports that only drive transistor gates are inputs
+        inputs = []
+        outputs = []
+        for iid, net in template.ports.items():
+            if network.drive_strengths[net] == S_SUPPLY:
+                continue
+            (outputs if network.channels[net] else inputs).append(iid)
+        if len(inputs) > MAX_TABLE_INPUTS or not outputs:
+            return None
+        names = [f"p{component.io_pin_id(iid)}" for iid in inputs]
+        vectors = [
+            "".join("1" if index >> i & 1 else "0" for i in range(len(inputs)))
+            for index in range(1 << len(inputs))
+        ]
+        result = BatchSimulator(template, flattener).run(
+            names, [f"p{component.io_pin_id(iid)}" for iid in outputs], vectors
+        )
+        if any(result.xs):
+            return None
+        rows = [0] * len(vectors)
+        for j, ones in enumerate(result.ones):
+            for index in range(len(vectors)):
+                rows[index] |= (ones >> index & 1) << j
+        return TruthTable(inputs, outputs, rows)
+
+    def evaluate(self, inputs: list[int]) -> int:
+        """Row for input values (V0/V1)"""
+        index = 0
+        for i, value in enumerate(inputs):
+            index |= (value == V1) << i
+        return self.rows[index]
+
+
+class TruthTableCache:
+    """Truth tables by component fingerprint.
+
+    Least recently used tables are dropped once the tables hold more than
+    `max_rows` rows. With a directory, tables are also kept there as
+    <fingerprint>.json and survive evictions and restarts. Components that
+    can't be tabulated are remembered as None."""
+    def __init__(self, max_rows=DEFAULT_MAX_ROWS, directory=None):
+        self.max_rows = max_rows
+        self.directory = directory
+        self.tables: OrderedDict[str: TruthTable | None] = OrderedDict()
+        self.rows = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.tables)
+
+    def get(self, key: str) -> TruthTable | None:
+        table = self.tables[key]
+        self.tables.move_to_end(key)
+        return table
+
+    def put(self, key: str, table: TruthTable | None):
+        if key in self.tables:
+            self.rows -= _rows(self.tables.pop(key))
+        self.tables[key] = table
+        self.rows += _rows(table)
+        while self.rows > self.max_rows and len(self.tables) > 1:
+            _, evicted = self.tables.popitem(last=False)
+            self.rows -= _rows(evicted)
+
+    def table(self, flattener, id_, memo: dict = None) -> TruthTable | None:
+        """Truth table of component `id_`, characterized on the first miss"""
+        key = fingerprint(flattener, id_, memo)
+        if key in self.tables:
+            self.hits += 1
+            return self.get(key)
+        self.misses += 1
+        table = self._load(key)
+        if table is None:
+            log(LOG_VERB, f"Characterizing component {id_}...")
+            table = TruthTable.characterize(flattener, id_)
+            self._store(key, table)
+        self.put(key, table)
+        return table
+
+    def _path(self, key):
+        return join(self.directory, key + ".json")
+
+    def _load(self, key) -> TruthTable | None:
+        if self.directory is None or not exists(self._path(key)):
+            return None
+        try:
+            with open(self._path(key)) as file:
+                return TruthTable.from_json(loads(file.read()))
+        except (JSONDecodeError, KeyError):
+            log(LOG_WARN, f"Ignoring broken truth table {self._path(key)}")
+            return None
+
+    def _store(self, key, table: TruthTable | None):
+        if self.directory is None or table is None:
+            return
+        makedirs(self.directory, exist_ok=True)
+        write_atomic(self._path(key), dumps(table.serialize()))
+
+
+def _rows(table: TruthTable | None) -> int:
+    return 1 if table is None else table.size
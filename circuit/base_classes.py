@@ -1,12 +1,22 @@
+from array import array
+from collections.abc import MutableMapping, Sequence
 from json import loads, JSONDecodeError, dumps
-from os.path import basename, join
+from os import replace
+from os.path import basename, join, getmtime, getsize
+from heapq import heapify, heappop, heappush
+from time import monotonic
 
 from .backend.dag import DAG
+from .backend.netlist import Netlist, pin_terminal, chip_terminal
+from .backend.spatial import SpatialIndex
 from circuitlogger import log
 from locals import *
 
 
 def serialize(dict_):
+    if hasattr(dict_, "serialize"):
+        # column tables serialize all their rows at once
+        return dict_.serialize()
     json = {}
     for k in dict_:
         object_ = dict_[k]
@@ -17,7 +27,55 @@ def serialize(dict_):
     return json
 
 
+def write_atomic(path, text: str) -> int:
+    """Write `text` to a temporary file next to `path`, then rename it over
+    `path` so a crash never leaves a half written file. Returns the size"""
+    temp = path + ".tmp"
+    with open(temp, "w") as file:
+        file.write(text)
+    size = getsize(temp)
+    replace(temp, path)
+    return size
+
+
+def meta_size(metadata: dict) -> tuple[int, int]:
+    """Width and height of a component as a chip, from its metadata (new
+    components have -1 for unset)"""
+    return max(0, metadata.get("width", 0)), max(0, metadata.get("height", 0))
+
+
+class IndexAllocator:
+    """Hands out the smallest unused integer key (as str) of a collection"""
+    def __init__(self, used_keys=()):
+        self.sync(used_keys)
+
+    def sync(self, used_keys):
+        used = {int(k) for k in used_keys if str(k).isdigit()}
+        self._next = max(used) + 1 if used else 0
+        self._freed = [i for i in range(self._next) if i not in used]
+        heapify(self._freed)
+        self._freed_set = set(self._freed)
+
+    def allocate(self) -> str:
+        if self._freed:
+            idx = heappop(self._freed)
+            self._freed_set.discard(idx)
+            return str(idx)
+        idx = self._next
+        self._next += 1
+        return str(idx)
+
+    def free(self, key):
+        idx = int(key)
+        if idx >= self._next or idx in self._freed_set:
+            return
+        heappush(self._freed, idx)
+        self._freed_set.add(idx)
+
+
 class Pin:
+    __slots__ = ("x", "y", "has_label", "label_", "linked_to_wire", "wire", "owner", "key")
+
     def __init__(self, x, y):
         self.x = int(x)
         self.y = int(y)
@@ -25,18 +83,28 @@ class Pin:
         self.label_ = ""
         self.linked_to_wire = False
         self.wire = -1
+        # component the pin belongs to, told about changes, and its key
+        # there
+        self.owner: Component | None = None
+        self.key: str | None = None
 
     def move(self, x, y):
         self.x = int(x)
         self.y = int(y)
+        if self.owner is not None:
+            self.owner.pin_moved(self)
 
     def label(self, l):
         self.has_label = True
         self.label_ = l
+        if self.owner is not None:
+            self.owner.mark_dirty("pins")
 
     def link_to_wire(self, widx):
         self.linked_to_wire = True
         self.wire = int(widx)
+        if self.owner is not None:
+            self.owner.mark_dirty("pins")
 
     @staticmethod
     def from_json(json: dict):
@@ -67,6 +135,293 @@ class Pin:
         return d
 
 
+# Row flags of the column tables
+_PRESENT = 1
+_LABELED = 2
+_LINKED = 4
+# Integer keys beyond this many rows past the end of a table are kept as
+# objects instead of growing the columns
+_MAX_ROW_GAP = 1024
+
+
+class _ColumnTable(MutableMapping):
+    """Objects of a component kept in columns (arrays) instead of one
+    python object each, keyed like the dict it replaces.
+
+    A key that is an integer string is the row of its object; indexing
+    returns a view of that row, which stays valid until the key is
+    deleted. Other keys keep their objects as they are in `others`.
+
+    Every lookup of a row makes a new view, so objects of a table can't
+    be told apart by identity: compare their `key` instead. Storing an
+    object copies its values into the row; a view stored under a key
+    that isn't a row is copied into a plain object first, it would
+    otherwise keep reading its old row.
+
+    Subclasses set `view` and implement _extend(n) (grow every column by
+    n rows), _store(row, obj) (obj None when the row is deleted) and
+    _detach(view) (plain object with the values of a view)."""
+    view = None
+
+    def __init__(self, owner=None):
+        # component told about changes made through the views
+        self.owner: Component | None = owner
+        self.flags = bytearray()
+        self.others: dict = {}
+        self._count = 0
+
+    def _row(self, key) -> int | None:
+        if key.isdigit() and key.isascii() and (key[0] != "0" or key == "0"):
+            row = int(key)
+            if row < len(self.flags) + _MAX_ROW_GAP:
+                return row
+        return None
+
+    def _has(self, row) -> bool:
+        return row is not None and row < len(self.flags) and self.flags[row] != 0
+
+    def __getitem__(self, key):
+        key = str(key)
+        row = self._row(key)
+        if self._has(row):
+            return self.view(self, row)
+        return self.others[key]
+
+    def __setitem__(self, key, obj):
+        key = str(key)
+        row = self._row(key)
+        if row is None or key in self.others:
+            if isinstance(obj, self.view):
+                obj = self._detach(obj)
+            obj.owner = self.owner
+            obj.key = key
+            self.others[key] = obj
+            return
+        if row >= len(self.flags):
+            n = row + 1 - len(self.flags)
+            self.flags.extend(bytes(n))
+            self._extend(n)
+        if not self.flags[row]:
+            self._count += 1
+        self._store(row, obj)
+
+    def __delitem__(self, key):
+        key = str(key)
+        row = self._row(key)
+        if self._has(row):
+            self._store(row, None)
+            self.flags[row] = 0
+            self._count -= 1
+        else:
+            self.others.pop(key).owner = None
+
+    def __contains__(self, key):
+        key = str(key)
+        return self._has(self._row(key)) or key in self.others
+
+    def __iter__(self):
+        for row, flag in enumerate(self.flags):
+            if flag:
+                yield str(row)
+        yield from list(self.others)
+
+    def __len__(self):
+        return self._count + len(self.others)
+
+    def rows(self) -> list[int]:
+        """Rows in use"""
+        return [row for row, flag in enumerate(self.flags) if flag]
+
+
+class StoredPin(Pin):
+    """Pin of a PinTable, reading and writing the table's columns"""
+    __slots__ = ("table", "row")
+
+    def __init__(self, table: "PinTable", row: int):
+        self.table = table
+        self.row = row
+
+    @property
+    def x(self):
+        return self.table.xs[self.row]
+
+    @x.setter
+    def x(self, value):
+        self.table.xs[self.row] = value
+
+    @property
+    def y(self):
+        return self.table.ys[self.row]
+
+    @y.setter
+    def y(self, value):
+        self.table.ys[self.row] = value
+
+    @property
+    def has_label(self):
+        return bool(self.table.flags[self.row] & _LABELED)
+
+    @has_label.setter
+    def has_label(self, value):
+        self.table._set_flag(self.row, _LABELED, value)
+
+    @property
+    def label_(self):
+        return self.table.labels.get(self.row, "")
+
+    @label_.setter
+    def label_(self, value):
+        self.table.labels[self.row] = value
+
+    @property
+    def linked_to_wire(self):
+        return bool(self.table.flags[self.row] & _LINKED)
+
+    @linked_to_wire.setter
+    def linked_to_wire(self, value):
+        self.table._set_flag(self.row, _LINKED, value)
+
+    @property
+    def wire(self):
+        return self.table.wires[self.row]
+
+    @wire.setter
+    def wire(self, value):
+        self.table.wires[self.row] = value
+
+    @property
+    def owner(self):
+        return self.table.owner
+
+    @property
+    def key(self):
+        return str(self.row)
+
+
+class PinTable(_ColumnTable):
+    """Pins by id: x, y and wire columns, labels by row"""
+    view = StoredPin
+
+    def __init__(self, owner=None):
+        super().__init__(owner)
+        self.xs = array("i")
+        self.ys = array("i")
+        self.wires = array("i")
+        self.labels: dict[int: str] = {}
+
+    def _extend(self, n):
+        zeros = bytes(4 * n)
+        self.xs.frombytes(zeros)
+        self.ys.frombytes(zeros)
+        self.wires.frombytes(zeros)
+
+    def _set_flag(self, row, flag, state):
+        if state:
+            self.flags[row] |= flag
+        else:
+            self.flags[row] &= ~flag
+
+    def _detach(self, pin: "StoredPin") -> Pin:
+        detached = Pin(pin.x, pin.y)
+        detached.has_label = pin.has_label
+        detached.label_ = pin.label_
+        detached.linked_to_wire = pin.linked_to_wire
+        detached.wire = pin.wire
+        return detached
+
+    def _store(self, row, pin: Pin | None):
+        self.labels.pop(row, None)
+        if pin is None:
+            return
+        self.xs[row] = pin.x
+        self.ys[row] = pin.y
+        self.wires[row] = pin.wire
+        self.flags[row] = _PRESENT | pin.linked_to_wire * _LINKED
+        if pin.has_label:
+            self.flags[row] |= _LABELED
+            self.labels[row] = pin.label_
+
+    @staticmethod
+    def from_columns(owner, keys, xs, ys, wires, labels: dict[int: str]):
+        """Table from columns of ints; wires of -1 are unlinked, labels are
+        by position in the columns"""
+        table = PinTable(owner)
+        if list(keys) != list(range(len(keys))):
+            for i, key in enumerate(keys):
+                pin = Pin(xs[i], ys[i])
+                if wires[i] >= 0:
+                    pin.link_to_wire(wires[i])
+                if i in labels:
+                    pin.label(labels[i])
+                table[str(key)] = pin
+            return table
+        # keys 0..n-1 in order: the columns are taken over as they are
+        table.xs = array("i", xs)
+        table.ys = array("i", ys)
+        table.wires = array("i", wires)
+        table.flags = bytearray(_PRESENT | (w >= 0) * _LINKED for w in table.wires)
+        for row in labels:
+            table.flags[row] |= _LABELED
+        table.labels = dict(labels)
+        table._count = len(keys)
+        return table
+
+    @staticmethod
+    def from_json(json: dict, owner=None):
+        keys = []
+        xs = []
+        ys = []
+        wires = []
+        labels = {}
+        others = {}
+        for k, pin in json.items():
+            if not (k.isdigit() and k.isascii()):
+                others[k] = Pin.from_json(pin)
+                continue
+            label = pin.get("label")
+            if label is not None:
+                labels[len(keys)] = label
+            keys.append(int(k))
+            xs.append(int(pin["x"]))
+            ys.append(int(pin["y"]))
+            wire = pin.get("wire")
+            wires.append(-1 if wire is None else int(wire))
+        table = PinTable.from_columns(owner, keys, xs, ys, wires, labels)
+        for k, pin in others.items():
+            table[k] = pin
+        return table
+
+    def records(self):
+        """(row, x, y, label or None, wire or -1) of the pins in rows"""
+        xs = self.xs
+        ys = self.ys
+        wires = self.wires
+        labels = self.labels
+        for row, flag in enumerate(self.flags):
+            if flag:
+                yield (row, xs[row], ys[row],
+                       labels[row] if flag & _LABELED else None,
+                       wires[row] if flag & _LINKED else -1)
+
+    def serialize(self):
+        json = {}
+        xs = self.xs
+        ys = self.ys
+        wires = self.wires
+        labels = self.labels
+        for row, flag in enumerate(self.flags):
+            if not flag:
+                continue
+            d = {"wire": wires[row]} if flag & _LINKED else {}
+            d["x"] = xs[row]
+            d["y"] = ys[row]
+            if flag & _LABELED:
+                d["label"] = labels[row]
+            json[str(row)] = d
+        json |= serialize(self.others)
+        return json
+
+
 class WireDataHandler:
     def __init__(self):
         self.dataFormat = {}
@@ -89,10 +444,19 @@ class Wire:
     class Connection:
 
         class Endpoint:
-            # subclasses must override this
+            __slots__ = ()
+
+            # subclasses must override these
             def serialize(self): pass
 
+            def terminal(self): pass
+
+            # (chip id, io index), chip id -1 for pins (see Wire.ends)
+            def pair(self): pass
+
         class PinEndpoint(Endpoint):
+            __slots__ = ("id",)
+
             def __init__(self, id_):
                 self.id = int(id_)
 
@@ -102,7 +466,15 @@ class Wire:
                     "id": self.id
                 }
 
+            def terminal(self):
+                return pin_terminal(self.id)
+
+            def pair(self):
+                return -1, self.id
+
         class ChipEndpoint(Endpoint):
+            __slots__ = ("cid", "iid")
+
             def __init__(self, cid, iid):
                 self.cid = int(cid)
                 self.iid = int(iid)
@@ -114,6 +486,14 @@ class Wire:
                     "iid": self.iid
                 }
 
+            def terminal(self):
+                return chip_terminal(self.cid, self.iid)
+
+            def pair(self):
+                return self.cid, self.iid
+
+        __slots__ = ("from_", "to")
+
         def __init__(self):
             self.from_: Wire.Connection.Endpoint = None
             self.to: Wire.Connection.Endpoint = None
@@ -150,6 +530,37 @@ class Wire:
             else:
                 raise ValueError(s)
 
+        @staticmethod
+        def endpointFromJson(json: dict):
+            if json["type"] == "pin":
+                return Wire.Connection.PinEndpoint(json["id"])
+            elif json["type"] == "chip":
+                return Wire.Connection.ChipEndpoint(json["cid"], json["iid"])
+            else:
+                raise ValueError(json)
+
+        @staticmethod
+        def endpointFromPair(cid, id_):
+            if cid < 0:
+                return Wire.Connection.PinEndpoint(id_)
+            return Wire.Connection.ChipEndpoint(cid, id_)
+
+        @staticmethod
+        def pairFromJson(json: dict):
+            if json["type"] == "pin":
+                return -1, int(json["id"])
+            elif json["type"] == "chip":
+                return int(json["cid"]), int(json["iid"])
+            else:
+                raise ValueError(json)
+
+        @staticmethod
+        def from_json(json: dict):
+            c = Wire.Connection()
+            c.set_from(Wire.Connection.endpointFromJson(json["from"]))
+            c.set_to(Wire.Connection.endpointFromJson(json["to"]))
+            return c
+
         @staticmethod
         def new(s1, s2):
             c = Wire.Connection()
@@ -163,46 +574,262 @@ class Wire:
                 "to": self.to.serialize()
             }
 
+    class Connections(Sequence):
+        """The connections of a wire, built from its `ends` when accessed"""
+        def __init__(self, wire: "Wire"):
+            self.ends = wire.ends
+
+        def __len__(self):
+            return len(self.ends) // 4
+
+        def __getitem__(self, i):
+            if isinstance(i, slice):
+                return [self[j] for j in range(*i.indices(len(self)))]
+            if i < 0:
+                i += len(self)
+            if not 0 <= i < len(self):
+                raise IndexError(i)
+            from_cid, from_id, to_cid, to_id = self.ends[4 * i:4 * i + 4]
+            c = Wire.Connection()
+            c.from_ = Wire.Connection.endpointFromPair(from_cid, from_id)
+            c.to = Wire.Connection.endpointFromPair(to_cid, to_id)
+            return c
+
+        def __iter__(self):
+            for i in range(len(self)):
+                yield self[i]
+
+        def append(self, c: "Wire.Connection"):
+            self.ends.extend(c.from_.pair() + c.to.pair())
+
+    __slots__ = ("ends",)
+
     def __init__(self):
-        self.connections: list[Wire.Connection] = []
+        # from chip id, from id, to chip id, to id per connection; chip id
+        # -1 for pin endpoints. Changing a Connection taken from
+        # `connections` doesn't change the wire.
+        self.ends = array("i")
+
+    @property
+    def connections(self) -> Connections:
+        return Wire.Connections(self)
 
     def serialize(self):
+        ends = self.ends
+        connections = []
+        for i in range(0, len(ends), 4):
+            conn = {}
+            for key, cid, id_ in (("from", ends[i], ends[i + 1]),
+                                  ("to", ends[i + 2], ends[i + 3])):
+                conn[key] = {"type": "pin", "id": id_} if cid < 0 \
+                    else {"type": "chip", "cid": cid, "iid": id_}
+            connections.append(conn)
         return {
-            "connections": [conn.serialize() for conn in self.connections]
+            "connections": connections
         }
 
+    @staticmethod
+    def from_json(json: dict):
+        w = Wire()
+        pairFromJson = Wire.Connection.pairFromJson
+        for conn in json["connections"]:
+            w.ends.extend(pairFromJson(conn["from"]) + pairFromJson(conn["to"]))
+        return w
+
     def add_connection(self, c: Connection):
-        self.connections.append(c)
+        self.ends.extend(c.from_.pair() + c.to.pair())
 
     def connect(self, s1, s2):
         self.add_connection(Wire.Connection.new(s1, s2))
 
 
 class Chip:
-    def __init__(self, component, x, y):
+    __slots__ = ("x", "y", "component", "type_id", "owner", "key")
+
+    def __init__(self, component, x, y, type_id=None):
         self.x = int(x)
         self.y = int(y)
+        # Chips loaded from json only know their component id; the
+        # component itself is resolved through the project when needed
         self.component = component
+        self.type_id = component.id_ if component is not None else type_id
+        # component the chip is placed in, told about changes, and its key
+        # there
+        self.owner: Component | None = None
+        self.key: str | None = None
 
     def move(self, x, y):
         self.x = int(x)
         self.y = int(y)
+        if self.owner is not None:
+            self.owner.chip_moved(self)
 
     @staticmethod
     def from_json(json):
-        # TODO: Find a good way to handle component types
-        c = Chip()
-        c.move(json["x"], json["y"])
+        return Chip(None, json["x"], json["y"], json["type"])
 
     def serialize(self):
         return {
-            "type": self.component.id_,
+            "type": self.type_id,
             "x": self.x,
             "y": self.y
         }
 
 
+class StoredChip(Chip):
+    """Chip of a ChipTable, reading and writing the table's columns"""
+    __slots__ = ("table", "row")
+
+    def __init__(self, table: "ChipTable", row: int):
+        self.table = table
+        self.row = row
+
+    @property
+    def x(self):
+        return self.table.xs[self.row]
+
+    @x.setter
+    def x(self, value):
+        self.table.xs[self.row] = value
+
+    @property
+    def y(self):
+        return self.table.ys[self.row]
+
+    @y.setter
+    def y(self, value):
+        self.table.ys[self.row] = value
+
+    @property
+    def type_id(self):
+        return self.table.type_ids[self.table.types[self.row]]
+
+    @property
+    def component(self):
+        return self.table.components.get(self.row)
+
+    @property
+    def owner(self):
+        return self.table.owner
+
+    @property
+    def key(self):
+        return str(self.row)
+
+
+class ChipTable(_ColumnTable):
+    """Chips by id: x, y and type columns (types are indices into
+    `type_ids`), components of chips placed with one by row"""
+    view = StoredChip
+
+    def __init__(self, owner=None):
+        super().__init__(owner)
+        self.xs = array("i")
+        self.ys = array("i")
+        self.types = array("i")
+        self.type_ids: list = []
+        self._type_indices: dict = {}
+        self.components: dict[int: Component] = {}
+
+    def type_index(self, type_id) -> int:
+        idx = self._type_indices.get(type_id)
+        if idx is None:
+            idx = self._type_indices[type_id] = len(self.type_ids)
+            self.type_ids.append(type_id)
+        return idx
+
+    def used_type_ids(self) -> list:
+        """Type ids of the chips, each once"""
+        types = self.types
+        used = [self.type_ids[i] for i in sorted({types[row] for row in self.rows()})]
+        for chip in self.others.values():
+            if chip.type_id not in used:
+                used.append(chip.type_id)
+        return used
+
+    def _extend(self, n):
+        zeros = bytes(4 * n)
+        self.xs.frombytes(zeros)
+        self.ys.frombytes(zeros)
+        self.types.frombytes(zeros)
+
+    def _detach(self, chip: "StoredChip") -> Chip:
+        return Chip(chip.component, chip.x, chip.y, chip.type_id)
+
+    def _store(self, row, chip: Chip | None):
+        self.components.pop(row, None)
+        if chip is None:
+            return
+        self.xs[row] = chip.x
+        self.ys[row] = chip.y
+        self.types[row] = self.type_index(chip.type_id)
+        if chip.component is not None:
+            self.components[row] = chip.component
+        self.flags[row] = _PRESENT
+
+    @staticmethod
+    def from_columns(owner, keys, xs, ys, type_ids):
+        table = ChipTable(owner)
+        if list(keys) != list(range(len(keys))):
+            for i, key in enumerate(keys):
+                table[str(key)] = Chip(None, xs[i], ys[i], type_ids[i])
+            return table
+        # keys 0..n-1 in order: the columns are taken over as they are
+        type_index = table.type_index
+        table.xs = array("i", xs)
+        table.ys = array("i", ys)
+        table.types = array("i", [type_index(type_id) for type_id in type_ids])
+        table.flags = bytearray([_PRESENT]) * len(keys)
+        table._count = len(keys)
+        return table
+
+    @staticmethod
+    def from_json(json: dict, owner=None):
+        others = {k: chip for k, chip in json.items()
+                  if not (k.isdigit() and k.isascii())}
+        chips = [chip for k, chip in json.items() if k not in others]
+        table = ChipTable.from_columns(
+            owner,
+            [int(k) for k in json if k not in others],
+            [int(chip["x"]) for chip in chips],
+            [int(chip["y"]) for chip in chips],
+            [chip["type"] for chip in chips]
+        )
+        for k, chip in others.items():
+            table[k] = Chip.from_json(chip)
+        return table
+
+    def records(self):
+        """(row, x, y, type id) of the chips in rows"""
+        xs = self.xs
+        ys = self.ys
+        types = self.types
+        type_ids = self.type_ids
+        for row, flag in enumerate(self.flags):
+            if flag:
+                yield row, xs[row], ys[row], type_ids[types[row]]
+
+    def serialize(self):
+        json = {}
+        xs = self.xs
+        ys = self.ys
+        types = self.types
+        type_ids = self.type_ids
+        for row, flag in enumerate(self.flags):
+            if flag:
+                json[str(row)] = {
+                    "type": type_ids[types[row]],
+                    "x": xs[row],
+                    "y": ys[row]
+                }
+        json |= serialize(self.others)
+        return json
+
+
 class Component:
+    # parts of a component tracked for changes since the last save
+    PARTS = ("metadata", "pins", "chips", "wires")
+
     def __init__(self, project, id_):
         # TODO: Find some good way to obtain this from id
         # IMPORTANT NOTE ABOUT PROJECT: Components may be used throughout multiple projects.
@@ -212,9 +839,9 @@ class Component:
         self.project = project
         self.projectDDAG: DAG = self.project.ddag
         self.projectDDAG.add_node(id_, True)
-        self.pins = {}
+        self.pins = PinTable(self)
         self.io_pins = {}
-        self.chips = {}
+        self.chips = ChipTable(self)
         self.wires = {}
         self.metadata = {
             "data-version": 1,
@@ -223,23 +850,52 @@ class Component:
             "backgroud-color": "#000000",
             "box-label": ""
         }
-        self.new_pin_idx = lambda: self._new_idx(self.pins)
-        self.new_iopin_idx = lambda: self._new_idx(self.io_pins)
-        self.new_chip_idx = lambda: self._new_idx(self.chips)
-        self.new_wire_idx = lambda: self._new_idx(self.wires)
-
-    def _new_idx(self, dict_: dict) -> str:
-        # Runs in o(n) (i think)
-        used_keys = set(dict_.keys())
-        idx = 0
-        while True:
-            if str(idx) in used_keys:
-                idx += 1
-            else:
-                return str(idx)
+        self._pin_ids = IndexAllocator()
+        self._iopin_ids = IndexAllocator()
+        self._chip_ids = IndexAllocator()
+        self._wire_ids = IndexAllocator()
+        # Built on first use by get_netlist / get_spatial_index, then
+        # kept up to date
+        self._netlist: Netlist | None = None
+        self._spatial: SpatialIndex | None = None
+        # Parts changed since the component was loaded or saved; a new
+        # component has never been written
+        self.dirty: set[str] = set(Component.PARTS)
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self.dirty)
+
+    def mark_dirty(self, part="metadata"):
+        self.dirty.add(part)
+
+    def new_pin_idx(self) -> str:
+        return self._pin_ids.allocate()
+
+    def new_iopin_idx(self) -> str:
+        return self._iopin_ids.allocate()
+
+    def new_chip_idx(self) -> str:
+        return self._chip_ids.allocate()
+
+    def new_wire_idx(self) -> str:
+        return self._wire_ids.allocate()
+
+    def sync_indices(self):
+        """Resync the index allocators after the dicts were filled directly"""
+        self._pin_ids.sync(self.pins.keys())
+        self._iopin_ids.sync(self.io_pins.keys())
+        self._chip_ids.sync(self.chips.keys())
+        self._wire_ids.sync(self.wires.keys())
 
     def new_pin(self, x: int, y: int):
-        self.pins[self.new_pin_idx()] = Pin(x, y)
+        idx = self.new_pin_idx()
+        self.pins[idx] = Pin(x, y)
+        self.mark_dirty("pins")
+        if self._netlist is not None:
+            self._netlist.add_terminal(pin_terminal(idx))
+        if self._spatial is not None:
+            self._spatial.pins.insert(idx, int(x), int(y))
 
     def new_wire(self, e1: str, e2: str):
         w = Wire()
@@ -261,6 +917,9 @@ class Component:
                 pinobj.link_to_wire(idx)
             del inv[0]
         self.wires[idx].add_connection(conn)
+        self.mark_dirty("wires")
+        if self._netlist is not None:
+            self._netlist.add_connection(idx, conn)
 
     def mark_pin_as_io(self, idx: str, state=True):
         assert self.pins.get(idx, None)
@@ -270,7 +929,9 @@ class Component:
             for k in self.io_pins:
                 if str(self.io_pins[k]) == idx:
                     del self.io_pins[k]
+                    self._iopin_ids.free(k)
                     break
+        self.mark_dirty("pins")
 
     def add_chip(self, component, x, y):
         warning = "Cannot place %s in %s recursively"
@@ -278,7 +939,15 @@ class Component:
             component.id_, self.id_
         )
         assert not prevent_place, warning % (self.id_, component.id_)
-        self.chips[self.new_chip_idx()] = Chip(component, x, y)
+        idx = self.new_chip_idx()
+        self.chips[idx] = Chip(component, x, y)
+        self.mark_dirty("chips")
+        # the project config lists each component's children
+        self.project.mark_dirty()
+        if self._netlist is not None:
+            self._netlist.add_chip(idx, self.chips[idx])
+        if self._spatial is not None:
+            self._spatial.chips.insert(idx, *self.chip_rect(self.chips[idx]))
         # Add dependency
         self.projectDDAG.connect(self.id_, component.id_)
 
@@ -291,8 +960,58 @@ class Component:
     def get_wire(self, idx: str):
         return self.wires[idx]
 
+    def get_io_indices(self) -> list[str]:
+        """IDs a parent uses to address this component's pins (c<cid>.<iid>)"""
+        return list(self.io_pins.keys())
+
+    def io_pin_id(self, iid) -> str:
+        return str(self.io_pins[str(iid)])
+
+    def get_netlist(self) -> Netlist:
+        if self._netlist is None:
+            self._netlist = Netlist.from_component(self)
+        return self._netlist
+
+    def get_spatial_index(self) -> SpatialIndex:
+        if self._spatial is None:
+            self._spatial = SpatialIndex.from_component(self)
+        return self._spatial
+
+    def chip_component(self, chip: Chip) -> "Component | None":
+        """Component a chip places (loading it if needed), None if it can't
+        be found"""
+        if chip.component is not None:
+            return chip.component
+        try:
+            # plugin components resolve without package datas once their
+            # package is known to the project
+            return self.project.getComponent(chip.type_id, {})
+        except KeyError:
+            return None
+
+    def chip_rect(self, chip: Chip) -> tuple[int, int, int, int]:
+        """Area a chip covers, from the size of the component it places
+        (just its position if that isn't known). Doesn't load the
+        component, project components have their size in the config"""
+        if chip.component is not None:
+            width, height = meta_size(chip.component.metadata)
+        else:
+            width, height = self.project.component_size(chip.type_id)
+        return chip.x, chip.y, chip.x + width, chip.y + height
+
+    def pin_moved(self, pin: Pin):
+        self.mark_dirty("pins")
+        if self._spatial is not None:
+            self._spatial.pins.move(pin.key, pin.x, pin.y)
+
+    def chip_moved(self, chip: Chip):
+        self.mark_dirty("chips")
+        if self._spatial is not None:
+            self._spatial.chips.move(chip.key, *self.chip_rect(chip))
+
     def setid(self, id_):
         self.id_ = id_
+        self.mark_dirty()
 
     @staticmethod
     def from_json(project, id_, json: dict):
@@ -304,8 +1023,15 @@ class Component:
         c = Component(project, id_)
         c.metadata = json["component-meta"]
         c.io_pins = json["io-pins"]
-        for k in json["pins"]:
-            c.pins[k] = Pin.from_json(json["pins"][k])
+        c.pins = PinTable.from_json(json["pins"], c)
+        c.chips = ChipTable.from_json(json["subcomponents"], c)
+        for type_id in c.chips.used_type_ids():
+            c.projectDDAG.add_node(type_id, True)
+            c.projectDDAG.connect(id_, type_id)
+        for k in json["wires"]:
+            c.wires[k] = Wire.from_json(json["wires"][k])
+        c.sync_indices()
+        c.dirty.clear()
         return c
 
     @staticmethod
@@ -322,23 +1048,81 @@ class Component:
             log(LOG_FAIL, f"Component from {path} has invalid json")
             raise
 
-    def save(self, filepath):
-        with open(filepath, "w") as wfile:
-            json = {}
-            json["component-meta"] = self.metadata
-            json["pins"] = serialize(self.pins)
-            json["io-pins"] = self.io_pins
-            json["subcomponents"] = serialize(self.chips)
-            json["wires"] = serialize(self.wires)
-            wfile.write(dumps(json, indent=4))
+    def save(self, filepath) -> int:
+        """Write the component to `filepath` (atomically), returns the size"""
+        json = {}
+        json["component-meta"] = self.metadata
+        json["pins"] = serialize(self.pins)
+        json["io-pins"] = self.io_pins
+        json["subcomponents"] = serialize(self.chips)
+        json["wires"] = serialize(self.wires)
+        size = write_atomic(filepath, dumps(json, indent=4))
+        self.dirty.clear()
+        return size
+
+
+class PluginDefinition:
+    """Parsed json file of a plugin component, shared by all its instances"""
+    def __init__(self, path, mtime, metadata: dict, pins: dict):
+        self.path = path
+        self.mtime = mtime
+        self.metadata = metadata
+        self.pins = pins
+        self.checked = monotonic()
+
+
+# Process-wide: mangled component id -> definition
+_plugin_definitions: dict[str: PluginDefinition] = {}
+# Seconds a definition is used without checking its file's mtime
+PLUGIN_RECHECK_INTERVAL = 1.0
+
+
+def plugin_definition(id_, path, name="Basic Component") -> PluginDefinition | None:
+    """Definition of plugin component `id_` from the json at `path`, parsed
+    again only if the file changed. None if it can't be loaded"""
+    definition = _plugin_definitions.get(id_)
+    if definition is not None and definition.path == path:
+        now = monotonic()
+        if now - definition.checked < PLUGIN_RECHECK_INTERVAL:
+            return definition
+        try:
+            if getmtime(path) == definition.mtime:
+                definition.checked = now
+                return definition
+        except OSError:
+            pass
+    # TODO: Proper asset handling / data version checking etc.
+    # AKA Resource manager in general
+    try:
+        mtime = getmtime(path)
+        with open(path) as f:
+            component_data = loads(f.read())
+    except FileNotFoundError:
+        log(LOG_FAIL, f"Failed to initialize component '{name}': File {path} not found!")
+        return None
+    except JSONDecodeError:
+        log(LOG_FAIL, f"Failed to initialize component '{name}': Malformed JSON in {path}!")
+        return None
+    pins = PinTable.from_json(component_data.get("pins", {}))
+    definition = PluginDefinition(
+        path, mtime, component_data.get("component-meta"), pins
+    )
+    _plugin_definitions[id_] = definition
+    return definition
 
 
 class PluginComponent(Component):
-    """Component class for package plugin components"""
+    """Component class for package plugin components.
+
+    Instances are views onto the shared PluginDefinition of their id: pins
+    and metadata are not copied and must not be changed."""
     # TODO: Think about global update candidates here
 
     _component_name = "Basic Component"
     _component_file_path = "dummy.json"
+    # Switch-level behaviour used by the simulator ("vcc", "gnd", "nmos",
+    # "pmos"), None if the component can't be simulated
+    _sim_model = None
 
     def __init__(self, project, id_, package_path):
         super().__init__(project, id_)
@@ -349,15 +1133,18 @@ class PluginComponent(Component):
         ))
 
     def _load_from_component_file(self, path):
-        # TODO: Proper asset handling / data version checking etc.
-        # AKA Resource manager in general
-        try:
-            with open(path) as f:
-                component_data = loads(f.read())
-        except FileNotFoundError:
-            log(LOG_FAIL, f"Failed to initialize component '{self._component_name}': File {path} not found!")
-        except JSONDecodeError:
-            log(LOG_FAIL, f"Failed to initialize component '{self._component_name}': Malformed JSON in {path}!")
+        definition = plugin_definition(self.id_, path, self._component_name)
+        if definition is None:
+            return
+        self.metadata = definition.metadata or self.metadata
+        self.pins = definition.pins
+
+    # Every pin of a plugin component is part of its interface
+    def get_io_indices(self) -> list[str]:
+        return list(self.pins.keys())
+
+    def io_pin_id(self, iid) -> str:
+        return str(iid)
 
 
 class Package:
@@ -53,5 +53,5 @@ def trygetpackage(pluginComponentId: str, package_datas: dict):
     for package in package_datas.keys():
         pack: Package = package_datas[package].PACKAGE
         if pack.has_component(pluginComponentId):
-            return package # return actual module object
+            return package_datas[package] # return actual module object
     raise KeyError(f"Could not locate plugin component {pluginComponentId}")
@@ -1,4 +1,9 @@
-from time import perf_counter
+import atexit
+import sys
+import traceback
+from collections import deque
+from threading import Thread, Event, Lock
+from time import perf_counter, sleep
 
 from functools import wraps
 
@@ -27,13 +32,9 @@ def sfmt(str_: str, len_: int, ws=False):
     return str_ + remain * (" " if ws else ".")
 """
 
-def _ts() -> str:
-    global _launch_time
-    time_float = perf_counter()-_launch_time
-    time_secs = int(time_float)
-    time_offset = round(time_float - time_secs, 4)
-    return f"{str(time_secs).zfill(5)}.\
-{str(time_offset).ljust(6, '0').removeprefix('0.')}"
+def _ts(t=None) -> str:
+    # seconds since launch, 00012.3456
+    return f"{(perf_counter() if t is None else t) - _launch_time:010.4f}"
 
 
 def log_indent():
@@ -46,55 +47,171 @@ def log_dedent():
     _log_indents -= LOG_SPACING
 
 
-def setup_logger():
+_LEVEL_COLORS = {
+    LOG_BASE: "\033[90m",
+    LOG_VERB: "\033[35m",
+    LOG_DEBG: "\033[2;33m",
+    LOG_INFO: "\033[0m",
+    LOG_WARN: "\033[1;33m",
+    LOG_FAIL: "\033[41m"
+}
+_LEVEL_TEXTS = {
+    LOG_BASE: "BASE",
+    LOG_VERB: "VERB",
+    LOG_DEBG: "DEBG",
+    LOG_INFO: "INFO",
+    LOG_WARN: "WARN",
+    LOG_FAIL: "FAIL"
+}
+
+# Records waiting for the writer thread. Appending to / popping from a
+# deque is atomic, so logging takes no lock; _wakeup tells the writer
+# there is something to do and _drained that it emptied the queue
+_queue = deque()
+_wakeup = Event()
+_drained = Event()
+_writer: Thread | None = None
+_writer_lock = Lock()
+
+
+def setup_logger(path="program.log"):
     global _log_file
-    _log_file = open("program.log", "w", encoding="utf-8")
+    _log_file = open(path, "w", encoding="utf-8")
+    _start_writer()
 
 
-def exit_logger():
-    global _log_file
-    _log_file.flush()
-    _log_file.close()
+def _start_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = Thread(target=_write_loop, name="logger", daemon=True)
+            _writer.start()
+
+
+def flush_logger():
+    """Wait until everything logged so far is written"""
+    while _writer is not None and _writer.is_alive():
+        _drained.clear()
+        _wakeup.set()
+        # set once the writer emptied the queue and wrote the last batch
+        if _drained.wait(0.1) and not _queue:
+            return
 
 
-def log(level, text, nts=False, use_indent=True, **kwargs):
-    # TODO: clean up this function ffs
+def exit_logger():
     global _log_file
-    if level >= DBG.get():
-        level_colors = {
-            LOG_BASE: "\033[90m",
-            LOG_VERB: "\033[35m",
-            LOG_DEBG: "\033[2;33m",
-            LOG_INFO: "\033[0m",
-            LOG_WARN: "\033[1;33m",
-            LOG_FAIL: "\033[41m"
-        }
-        level_texts = {
-            LOG_BASE: "BASE",
-            LOG_VERB: "VERB",
-            LOG_DEBG: "DEBG",
-            LOG_INFO: "INFO",
-            LOG_WARN: "WARN",
-            LOG_FAIL: "FAIL"
-        }
+    flush_logger()
+    if _queue:
+        # no writer (left), write the rest here
+        _write_batch(_take_batch())
+    if _log_file is not None:
+        _log_file.flush()
+        _log_file.close()
+        _log_file = None
+
+
+atexit.register(exit_logger)
+
+
+def log(level, text, *args, nts=False, use_indent=True, **kwargs):
+    """Log `text` if `level` passes the debug level.
+
+    Formatting happens on the writer thread, and only for messages that
+    are shown: pass "%"-style arguments after the text, or a function
+    returning the text, instead of building expensive f-strings. Objects
+    passed as arguments must not be changed afterwards. kwargs go to
+    print() (e.g. end="")."""
+    if level < DBG.get():
+        return
+    if _writer is None:
+        _start_writer()
+    _queue.append((level, text, args, nts, _log_indents * use_indent,
+                   perf_counter(), DBG.cr_on_log, kwargs))
+    if len(_queue) >= LOG_QUEUE_SIZE:
+        # the writer can't keep up, wait for it instead of growing
+        flush_logger()
+    elif not _wakeup.is_set():
+        _wakeup.set()
+
+
+def _write_loop():
+    while True:
+        _wakeup.wait()
+        # let a few records gather instead of waking up for each
+        sleep(LOG_WRITE_DELAY)
+        _wakeup.clear()
+        while _queue:
+            try:
+                _write_batch(_take_batch())
+            except Exception:
+                # keep the writer alive, a broken record is not worth a hang
+                traceback.print_exc()
+        _drained.set()
+
+
+def _take_batch() -> list[tuple]:
+    batch = []
+    pop = _queue.popleft
+    try:
+        for _ in range(LOG_BATCH_SIZE):
+            batch.append(pop())
+    except IndexError:
+        pass
+    return batch
+
+
+def _format(text, args) -> str:
+    if callable(text):
+        text = text()
+    if args:
+        try:
+            return text % args
+        except (TypeError, ValueError) as e:
+            return f"{text} {args!r} (bad log arguments: {e})"
+    return str(text)
+
+
+# Console prefix (before and after the timestamp) and file prefix of each level
+_PREFIXES = {
+    level: (f"\r\033[0m[\033[36m{SW_NAME}\033[0m::\033[32m",
+            f"\033[0m::{_LEVEL_COLORS[level] + _LEVEL_TEXTS[level]}\033[0m]",
+            f"[{SW_NAME}::", f"::{_LEVEL_TEXTS[level]}]")
+    for level in _LEVEL_COLORS
+}
+
+
+def _write_batch(batch):
+    console = []
+    lines = []
+    for level, text, args, nts, indent, t, cr_on_log, kwargs in batch:
+        if args or not isinstance(text, str):
+            text = _format(text, args)
+        color = _LEVEL_COLORS[level]
         if nts:     # No time stamp (no prefix)
-            print(f"{level_colors[level]}{text}\033[0m", **kwargs)
-            return
-        t = _ts()
-        print_indent_count = _log_indents*use_indent
-        pre = f"\r\033[0m[\033[36m{SW_NAME}\033[0m::" \
-            + f"\033[32m{t}\033[0m::" \
-            + f"{level_colors[level]+level_texts[level]}\033[0m]"
-        final_text = f"{pre} {' '*print_indent_count} \
-{level_colors[level]}{text}\033[0m"
-        uncolored_pref = f"[{SW_NAME}::{t}::{level_texts[level]}]"
-        uncolored_text = f"{uncolored_pref}{' '*print_indent_count}{text}"
-        if DBG.cr_on_log:
-            final_text = "\r" + final_text
-        print(final_text, **kwargs)
-        if DBG.cr_on_log:
-            print(TERMINAL_PROMPT, end="")
-        _log_file.write(uncolored_text+"\n")
+            final_text = f"{color}{text}\033[0m"
+        else:
+            ts = _ts(t)
+            pre, post, file_pre, file_post = _PREFIXES[level]
+            spaces = " " * indent
+            final_text = f"{pre}{ts}{post} {spaces} {color}{text}\033[0m"
+            if cr_on_log:
+                final_text = "\r" + final_text
+            lines.append(f"{file_pre}{ts}{file_post}{spaces}{text}\n")
+        if not kwargs:
+            console.append(final_text + "\n")
+        elif kwargs.keys() <= {"end", "flush"}:
+            console.append(final_text + kwargs.get("end", "\n"))
+        else:
+            # e.g. print(file=...), write what we have first
+            sys.stdout.write("".join(console))
+            console = []
+            print(final_text, **kwargs)
+        if cr_on_log and not nts:
+            console.append(TERMINAL_PROMPT)
+    sys.stdout.write("".join(console))
+    sys.stdout.flush()
+    if _log_file is not None and lines:
+        _log_file.write("".join(lines))
 
 
 def logAutoIndent(function):
@@ -1,4 +1,16 @@
 INCLUDED_PACKAGES = [
     "packages._builtins",
     "packages.betterled"
-]
\ No newline at end of file
+]
+
+# Threads reading, parsing and writing component files (1 = serial)
+IO_POOL_SIZE = 8
+# Parse component json in worker processes instead of threads
+IO_PARSE_PROCESSES = False
+
+# Zoom from which the GUI draws chips in detail instead of as labeled boxes
+LOD_DETAIL_ZOOM = 2.0
+# Memory for pre-rendered chip surfaces shared by the GUI, in bytes
+LOD_CACHE_BYTES = 64 * 1024 * 1024
+# Memory for rendered text (labels) shared by all panes, in bytes
+TEXT_CACHE_BYTES = 8 * 1024 * 1024
@@ -1 +1,2 @@
 from . import renderer
+from . import lod
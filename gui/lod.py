@@ -0,0 +1,303 @@
+from math import ceil, floor, log2
+
+import pygame
+
+import configuration
+from circuit.backend.spatial import GridIndex
+from .pane import WindowPane, render_text
+from .renderer import Item
+from .surface_cache import SurfaceCache
+
+# Zoom levels per doubling of the zoom; views snap to them so cached
+# surfaces are blitted at their own scale
+ZOOM_STEPS = 4
+MIN_ZOOM = 1 / 64
+MAX_ZOOM = 64
+# Grid cell size of a view's chip index, in component coordinates
+VIEW_CELL_SIZE = 128
+BORDER_COLOR = (160, 160, 160)
+WIRE_COLOR = (64, 192, 64)
+PIN_COLOR = (224, 224, 64)
+LABEL_COLOR = 0xffffff
+
+
+def zoom_bucket(zoom) -> int:
+    return round(log2(zoom) * ZOOM_STEPS)
+
+
+def bucket_zoom(bucket) -> float:
+    return 2 ** (bucket / ZOOM_STEPS)
+
+
+def meta_color(metadata, key="background-color", default=(0, 0, 0)) -> tuple:
+    """Color of a "#rrggbb" component-meta entry"""
+    value = metadata.get(key)
+    if not value:
+        return default
+    try:
+        value = int(value.lstrip("#"), 16)
+    except ValueError:
+        return default
+    return value >> 16, value >> 8 & 0xff, value & 0xff
+
+
+# Chip surfaces of all views
+surface_cache = SurfaceCache(configuration.LOD_CACHE_BYTES)
+
+
+def discard_component(id_, cache: SurfaceCache = surface_cache):
+    """Drop the surfaces of a component at every zoom, after it changed"""
+    cache.discard_if(lambda key: key[0] == id_)
+
+
+def render_component(component, zoom, font: pygame.font.Font) -> pygame.Surface:
+    """Surface of a component as a chip at `zoom`: its background, the
+    boxes of its own chips, its wires, pins and box label"""
+    metadata = component.metadata
+    width = max(0, metadata.get("width", 0)) * zoom
+    height = max(0, metadata.get("height", 0)) * zoom
+    surf = pygame.Surface((round(width) + 1, round(height) + 1))
+    surf.fill(meta_color(metadata))
+    # chip type -> component, resolved once
+    inners = {}
+
+    def chip_component(chip):
+        inner = inners.get(chip.type_id, False)
+        if inner is False:
+            inner = inners[chip.type_id] = component.chip_component(chip)
+        return inner
+
+    for chip in component.chips.values():
+        inner = chip_component(chip)
+        x0, y0, x1, y1 = component.chip_rect(chip)
+        rect = (round(x0 * zoom), round(y0 * zoom),
+                round((x1 - x0) * zoom) + 1, round((y1 - y0) * zoom) + 1)
+        if inner is not None:
+            surf.fill(meta_color(inner.metadata), surf.get_rect().clip(rect))
+        pygame.draw.rect(surf, BORDER_COLOR, rect, 1)
+
+    def position(cid, id_):
+        if cid < 0:
+            pin = component.pins[str(id_)]
+            return pin.x * zoom, pin.y * zoom
+        chip = component.chips[str(cid)]
+        inner = chip_component(chip)
+        pin = inner.pins[inner.io_pin_id(id_)]
+        return (chip.x + pin.x) * zoom, (chip.y + pin.y) * zoom
+
+    for wire in component.wires.values():
+        ends = wire.ends
+        for i in range(0, len(ends), 4):
+            try:
+                start = position(ends[i], ends[i + 1])
+                end = position(ends[i + 2], ends[i + 3])
+            except (KeyError, AttributeError):
+                # endpoint of a component that isn't loaded
+                continue
+            pygame.draw.line(surf, WIRE_COLOR, start, end)
+    pin_size = max(1, round(zoom / 2))
+    bounds = surf.get_rect()
+    for pin in component.pins.values():
+        # cut to the surface, fill() moves rectangles starting outside it
+        surf.fill(PIN_COLOR, bounds.clip(round(pin.x * zoom) - pin_size // 2,
+                                         round(pin.y * zoom) - pin_size // 2, pin_size, pin_size))
+    pygame.draw.rect(surf, BORDER_COLOR, surf.get_rect(), 1)
+    label = metadata.get("box-label")
+    if label:
+        w, h = font.size(label)
+        if w <= surf.get_width() and h <= surf.get_height():
+            text = font.render(label, True, BORDER_COLOR)
+            surf.blit(text, ((surf.get_width() - w) // 2, (surf.get_height() - h) // 2))
+    if pygame.display.get_surface() is not None:
+        surf = surf.convert()
+    return surf
+
+
+class ComponentView(Item):
+    """The chips placed in a component, seen through a whole pane: (x, y)
+    in component coordinates is at the pane's top left, scaled by `zoom`.
+
+    Below LOD_DETAIL_ZOOM a chip is a box in its component's
+    background-color with its box-label. From there on the chip is a
+    surface rendered once per component and zoom level and kept in a
+    SurfaceCache.
+
+    The view keeps its last frame: panning scrolls it and only draws the
+    strips that came into view. Call rebuild() after chips were added or
+    moved, and invalidate() after discard_component() for a changed
+    component."""
+    def __init__(self, component, font: pygame.font.Font, x=0, y=0, zoom=1.0,
+                 cache: SurfaceCache | None = None):
+        super().__init__()
+        self.component = component
+        self.font = font
+        self.x, self.y = x, y
+        self.cache = surface_cache if cache is None else cache
+        self.bucket = 0
+        self.zoom = 1.0
+        self._set_zoom(zoom)
+        self.index: GridIndex | None = None
+        # chip id -> component id, drawing order
+        self.types: dict[str: str] = {}
+        self.order: dict[str: int] = {}
+        # component id -> (component, background color, box label, label size)
+        self._looks: dict[str: tuple] = {}
+        self._frame: pygame.Surface | None = None
+        # (pixel origin, zoom level, background) the frame was drawn with
+        self._frame_state = None
+        self.rebuild()
+
+    def rebuild(self):
+        """Index the component's chips again"""
+        component = self.component
+        self.index = GridIndex(VIEW_CELL_SIZE)
+        self.types = {}
+        self.order = {}
+        self._looks = {}
+        for cid, chip in component.chips.items():
+            self.index.insert(cid, *component.chip_rect(chip))
+            self.types[cid] = chip.type_id
+            self.order[cid] = len(self.order)
+            if chip.type_id not in self._looks:
+                inner = component.chip_component(chip)
+                metadata = inner.metadata if inner is not None else {}
+                label = metadata.get("box-label", "")
+                self._looks[chip.type_id] = (inner, meta_color(metadata), label,
+                                             self.font.size(label) if label else (0, 0))
+        self.invalidate()
+
+    def invalidate(self):
+        """Draw the whole view again"""
+        self._frame_state = None
+        self.changed()
+
+    def _set_zoom(self, zoom):
+        self.bucket = zoom_bucket(min(max(zoom, MIN_ZOOM), MAX_ZOOM))
+        self.zoom = bucket_zoom(self.bucket)
+
+    def bbox(self):
+        if self.pane is None:
+            return 0, 0, 0, 0
+        return 0, 0, self.pane.b_x + 1, self.pane.b_y + 1
+
+    def pan(self, dx, dy):
+        """Scroll the view by (dx, dy) pixels"""
+        self.x += dx / self.zoom
+        self.y += dy / self.zoom
+        self.changed()
+
+    def set_zoom(self, zoom, around=(0, 0)):
+        """Zoom to the closest zoom level, keeping the component point at
+        pane position `around` in place"""
+        ax, ay = around
+        cx, cy = self.to_component(around)
+        self._set_zoom(zoom)
+        self.x = cx - ax / self.zoom
+        self.y = cy - ay / self.zoom
+        self.changed()
+
+    def to_component(self, position) -> tuple[float, float]:
+        """Component coordinates of a pane position"""
+        x, y = position
+        return self.x + x / self.zoom, self.y + y / self.zoom
+
+    def visible_chips(self, pane: WindowPane) -> list[str]:
+        return self._chips_in(pygame.Rect(0, 0, pane.b_x + 1, pane.b_y + 1),
+                              self._origin())
+
+    def _origin(self) -> tuple[int, int]:
+        """Pixel of the pane's top left at the current zoom"""
+        return round(self.x * self.zoom), round(self.y * self.zoom)
+
+    def _chips_in(self, rect: pygame.Rect, origin) -> list[str]:
+        """Chips overlapping an area of the view, in drawing order"""
+        zoom = self.zoom
+        # chips are drawn up to a pixel (and rounding) past their rectangle
+        x0 = (rect.x + origin[0] - 2) / zoom
+        y0 = (rect.y + origin[1] - 2) / zoom
+        x1 = (rect.right + origin[0] + 2) / zoom
+        y1 = (rect.bottom + origin[1] + 2) / zoom
+        chips = self.index.query_rect(floor(x0), floor(y0), ceil(x1), ceil(y1))
+        chips.sort(key=self.order.__getitem__)
+        return chips
+
+    def draw(self, pane):
+        size = (pane.b_x + 1, pane.b_y + 1)
+        origin = self._origin()
+        frame = self._frame
+        if frame is None or frame.get_size() != size:
+            frame = self._frame = pygame.Surface(size)
+            self._frame_state = None
+        state = self._frame_state
+        w, h = size
+        if state is None or state[1:] != (self.bucket, pane.color):
+            areas = [frame.get_rect()]
+        else:
+            dx = state[0][0] - origin[0]
+            dy = state[0][1] - origin[1]
+            if abs(dx) >= w or abs(dy) >= h:
+                areas = [frame.get_rect()]
+            else:
+                # keep what is still in view, draw what scrolled in
+                frame.scroll(dx, dy)
+                areas = []
+                if dx > 0:
+                    areas.append(pygame.Rect(0, 0, dx, h))
+                elif dx < 0:
+                    areas.append(pygame.Rect(w + dx, 0, -dx, h))
+                if dy > 0:
+                    areas.append(pygame.Rect(0, 0, w, dy))
+                elif dy < 0:
+                    areas.append(pygame.Rect(0, h + dy, w, -dy))
+        for area in areas:
+            frame.set_clip(area)
+            frame.fill(pane.color)
+            if self.zoom >= configuration.LOD_DETAIL_ZOOM:
+                self._draw_surfaces(frame, area, origin)
+            else:
+                self._draw_boxes(frame, area, origin)
+        frame.set_clip(None)
+        self._frame_state = (origin, self.bucket, pane.color)
+        pane.dsp.blit(frame, (pane.off_x, pane.off_y))
+
+    def _draw_boxes(self, frame, area, origin):
+        fill = frame.fill
+        blit = frame.blit
+        font = self.font
+        zoom = self.zoom
+        ox, oy = origin
+        rects = self.index.rects
+        types = self.types
+        looks = self._looks
+        for cid in self._chips_in(area, origin):
+            x0, y0, x1, y1 = rects[cid]
+            _, color, label, (w, h) = looks[types[cid]]
+            sx = round(x0 * zoom) - ox
+            sy = round(y0 * zoom) - oy
+            box_w = round((x1 - x0) * zoom) + 1
+            box_h = round((y1 - y0) * zoom) + 1
+            # fill() moves rectangles starting left of / above the
+            # surface instead of cutting them
+            fill(color, area.clip(sx, sy, box_w, box_h))
+            if label and w <= box_w and h <= box_h:
+                blit(render_text(font, label, LABEL_COLOR, color),
+                     (sx + (box_w - w) // 2, sy + (box_h - h) // 2))
+
+    def _draw_surfaces(self, frame, area, origin):
+        blit = frame.blit
+        zoom = self.zoom
+        ox, oy = origin
+        rects = self.index.rects
+        types = self.types
+        cache = self.cache
+        for cid in self._chips_in(area, origin):
+            type_id = types[cid]
+            surf = cache.get((type_id, self.bucket))
+            if surf is None:
+                inner = self._looks[type_id][0]
+                if inner is None:
+                    continue
+                surf = render_component(inner, zoom, self.font)
+                cache.put((type_id, self.bucket), surf)
+            x0, y0, _, _ = rects[cid]
+            blit(surf, (round(x0 * zoom) - ox, round(y0 * zoom) - oy))
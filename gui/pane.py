@@ -1,8 +1,85 @@
+from itertools import chain
+
 import pygame
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import configuration
+from .surface_cache import SurfaceCache
 
 
 hex_to_tuple = lambda hex: (hex >> 16, hex >> 8 & 0xff, hex & 0xff)
 
+# Rendered text of all panes
+text_cache = SurfaceCache(configuration.TEXT_CACHE_BYTES)
+
+
+def render_text(font: pygame.font.Font, text, color, bgcolor=None) -> pygame.Surface:
+    """Antialiased text surface (hex color, bgcolor a tuple or None),
+    rendered once and then taken from text_cache"""
+    key = (font, text, color, bgcolor)
+    surf = text_cache.get(key)
+    if surf is None:
+        surf = font.render(text, True, hex_to_tuple(color), bgcolor)
+        text_cache.put(key, surf)
+    return surf
+
+
+def clip_segments(segments, left, top, right, bottom) -> list[tuple]:
+    """Liang-Barsky clipping of ((x1, y1), (x2, y2)) segments against a
+    rectangle (edges included). Returns the (x1, y1, x2, y2) of the parts
+    inside, dropping segments that miss it. All segments are clipped in
+    one pass with numpy if it is installed (segments may then also be an
+    array of shape (n, 4) or (n, 2, 2))"""
+    if numpy is not None and len(segments) > 16:
+        return _clip_segments_numpy(segments, left, top, right, bottom)
+    clipped = []
+    for (x1, y1), (x2, y2) in segments:
+        dx = x2 - x1
+        dy = y2 - y1
+        t0 = 0
+        t1 = 1
+        for p, q in ((-dx, x1 - left), (dx, right - x1),
+                     (-dy, y1 - top), (dy, bottom - y1)):
+            if p == 0:
+                if q < 0:
+                    break
+            elif p < 0:
+                t0 = max(t0, q / p)
+            else:
+                t1 = min(t1, q / p)
+        else:
+            if t0 <= t1:
+                clipped.append((x1 + t0 * dx, y1 + t0 * dy,
+                                x1 + t1 * dx, y1 + t1 * dy))
+    return clipped
+
+
+def _clip_segments_numpy(segments, left, top, right, bottom) -> list[tuple]:
+    if isinstance(segments, numpy.ndarray):
+        coords = segments.astype(float).reshape(-1, 4)
+    else:
+        # much faster than numpy.asarray on nested tuples
+        coords = numpy.fromiter(chain.from_iterable(chain.from_iterable(segments)),
+                                float, count=4 * len(segments)).reshape(-1, 4)
+    x1, y1, x2, y2 = coords.T
+    dx = x2 - x1
+    dy = y2 - y1
+    p = numpy.stack((-dx, dx, -dy, dy))
+    q = numpy.stack((x1 - left, right - x1, y1 - top, bottom - y1))
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        r = q / p
+    t0 = numpy.where(p < 0, r, 0).max(axis=0)
+    t1 = numpy.where(p > 0, r, 1).min(axis=0)
+    keep = (t0 <= t1) & ~((p == 0) & (q < 0)).any(axis=0)
+    t0 = t0[keep]
+    t1 = t1[keep]
+    x1, y1, dx, dy = x1[keep], y1[keep], dx[keep], dy[keep]
+    return numpy.stack((x1 + t0 * dx, y1 + t0 * dy,
+                        x1 + t1 * dx, y1 + t1 * dy), axis=1).tolist()
+
 
 class WindowPane:
     def __init__(self, dsp: pygame.Surface, offset=(0, 0),
@@ -58,6 +135,10 @@ class WindowPane:
         self.children.append(child)
         return self
 
+    def screen_rect(self) -> pygame.Rect:
+        """Area of the pane on the display"""
+        return pygame.Rect(self.off_x, self.off_y, self.b_x, self.b_y)
+
     def rect(self, color, bbox, border_radius=0):
         x, y, w, h = bbox
         w = max(0, min(w, self.b_x-x))
@@ -167,16 +248,29 @@ class WindowPane:
                 end = intersectionPoint
                 region2 = determineRegion(*end)
 
+    def lines(self, color, segments, width):
+        """Draw many ((x1, y1), (x2, y2)) segments at once, clipped to the
+        pane like line()"""
+        draw_line = pygame.draw.line
+        dsp = self.dsp
+        ox = self.off_x
+        oy = self.off_y
+        for x1, y1, x2, y2 in clip_segments(segments, 0, 0, self.b_x, self.b_y):
+            draw_line(dsp, color, (x1 + ox, y1 + oy), (x2 + ox, y2 + oy), width)
+
     def draw(self):
-        self.rect(self.color, (0, 0, *self.bounds), 2)
+        self.draw_self()
         for child in self.children:
             child.draw()
 
+    def draw_self(self):
+        """Draw the pane without its children"""
+        self.rect(self.color, (0, 0, *self.bounds), 2)
+
     def render_text(self, font: pygame.font.Font, text, color, position,
                     bgcol=None):
         bgcolor = bgcol or self.color
-        text_surf = font.render(text, True, hex_to_tuple(color), bgcolor)
-        self.blit(text_surf, position, None)
+        self.blit(render_text(font, text, color, bgcolor), position, None)
 
 
 class RootPane(WindowPane):
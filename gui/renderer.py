@@ -0,0 +1,235 @@
+import pygame
+
+from circuit.backend.spatial import GridIndex
+from .pane import WindowPane, RootPane, hex_to_tuple
+
+# Grid cell size of the per-pane item indices, in pixels
+ITEM_CELL_SIZE = 64
+
+
+def to_color(color):
+    return color if isinstance(color, tuple) else hex_to_tuple(color)
+
+
+def drawable_area(pane: WindowPane) -> pygame.Rect:
+    """Screen area items of `pane` can draw to; WindowPane.line keeps
+    points on the far edges of the bounds"""
+    return pygame.Rect(pane.off_x, pane.off_y, pane.b_x + 1, pane.b_y + 1)
+
+
+class Item:
+    """Something a Renderer draws in a pane, in pane coordinates.
+
+    Subclasses implement bbox() and draw(pane). Call changed() after
+    changing an item that is shown, so its old and new area get redrawn."""
+    def __init__(self, color=0xffffff):
+        self.color = to_color(color)
+        self.renderer: Renderer | None = None
+        self.pane: WindowPane | None = None
+
+    # subclasses must override these
+    def bbox(self) -> tuple[int, int, int, int]:
+        """x, y, w, h of the area the item draws to"""
+        pass
+
+    def draw(self, pane: WindowPane): pass
+
+    def changed(self):
+        if self.renderer is not None:
+            self.renderer.update(self)
+
+
+class RectItem(Item):
+    def __init__(self, x, y, w, h, color=0xffffff, border_radius=0):
+        super().__init__(color)
+        self.x, self.y, self.w, self.h = x, y, w, h
+        self.border_radius = border_radius
+
+    def bbox(self):
+        return self.x, self.y, self.w, self.h
+
+    def move(self, x, y):
+        self.x, self.y = x, y
+        self.changed()
+
+    def draw(self, pane):
+        pane.rect(self.color, (self.x, self.y, self.w, self.h), self.border_radius)
+
+
+class WireItem(Item):
+    """Line segments ((x1, y1), (x2, y2)) of a wire"""
+    def __init__(self, segments, color=0xffffff, width=1):
+        super().__init__(color)
+        self.segments = list(segments)
+        self.width = width
+
+    def bbox(self):
+        xs = [x for segment in self.segments for x, _ in segment]
+        ys = [y for segment in self.segments for _, y in segment]
+        if not xs:
+            return 0, 0, 0, 0
+        # lines are up to `width` thick around their centre
+        x0, y0 = min(xs) - self.width, min(ys) - self.width
+        return x0, y0, max(xs) + self.width - x0 + 1, max(ys) + self.width - y0 + 1
+
+    def set_segments(self, segments):
+        self.segments = list(segments)
+        self.changed()
+
+    def draw(self, pane):
+        pane.lines(self.color, self.segments, self.width)
+
+
+class TextItem(Item):
+    def __init__(self, font: pygame.font.Font, text, x, y, color=0xffffff, bgcolor=None):
+        super().__init__(color)
+        self.font = font
+        self.text = text
+        self.x, self.y = x, y
+        # render_text takes hex colors
+        self.hex_color = color
+        self.bgcolor = bgcolor
+
+    def bbox(self):
+        return (self.x, self.y, *self.font.size(self.text))
+
+    def set_text(self, text):
+        self.text = text
+        self.changed()
+
+    def draw(self, pane):
+        pane.render_text(self.font, self.text, self.hex_color, (self.x, self.y), self.bgcolor)
+
+
+class Renderer:
+    """Retained-mode drawing of a pane tree and the items in its panes.
+
+    Adding, changing and removing items (and changing panes) marks their
+    screen area as damaged. render() redraws only the damaged rectangles,
+    with just the panes and items that intersect them, and hands those
+    rectangles to pygame.display.update.
+
+    pygame clips a line to the damaged rectangle before rasterizing it, so
+    a sloped line crossing the edge of one can come out a pixel off from
+    a full redraw; horizontal and vertical lines are exact."""
+    def __init__(self, root: RootPane, cell_size=ITEM_CELL_SIZE):
+        self.root = root
+        self.cell_size = cell_size
+        # pane -> index of its items (pane coordinates)
+        self.indices: dict[WindowPane: GridIndex] = {}
+        # item -> drawing order (later on top)
+        self._order: dict[Item: int] = {}
+        self._next_order = 0
+        self.damaged: list[pygame.Rect] = []
+        self._full = True
+
+    def add(self, pane: WindowPane, item: Item):
+        item.renderer = self
+        item.pane = pane
+        self._order[item] = self._next_order
+        self._next_order += 1
+        index = self.indices.get(pane)
+        if index is None:
+            index = self.indices[pane] = GridIndex(self.cell_size)
+        self._insert(index, item)
+
+    def update(self, item: Item):
+        """The item changed: redraw where it was and where it is now"""
+        index = self.indices[item.pane]
+        self._damage_item(item, index.rects[item])
+        self._insert(index, item)
+
+    def remove(self, item: Item):
+        index = self.indices[item.pane]
+        self._damage_item(item, index.rects[item])
+        index.remove(item)
+        del self._order[item]
+        item.renderer = None
+        item.pane = None
+
+    def items(self, pane: WindowPane) -> list[Item]:
+        index = self.indices.get(pane)
+        return sorted(index.rects, key=self._order.get) if index else []
+
+    def _insert(self, index: GridIndex, item: Item):
+        x, y, w, h = item.bbox()
+        rect = (x, y, x + max(w, 1) - 1, y + max(h, 1) - 1)
+        index.insert(item, *rect)
+        self._damage_item(item, rect)
+
+    def _damage_item(self, item, rect):
+        x0, y0, x1, y1 = rect
+        damage = drawable_area(item.pane).clip(
+            pygame.Rect(x0 + item.pane.off_x, y0 + item.pane.off_y, x1 - x0 + 1, y1 - y0 + 1)
+        )
+        if damage.w and damage.h:
+            self.damaged.append(damage)
+
+    def damage(self, rect):
+        """Redraw a screen rectangle on the next frame"""
+        self.damaged.append(pygame.Rect(rect))
+
+    def damage_pane(self, pane: WindowPane):
+        self.damage(pane.screen_rect())
+
+    def move_pane(self, pane: WindowPane, offset=None, bounds=None):
+        """Move / resize a pane, redrawing its old and new area"""
+        self.damage_pane(pane)
+        if offset is not None:
+            pane.set_offset(offset)
+        if bounds is not None:
+            pane.set_bounds(bounds)
+        self.damage_pane(pane)
+
+    def invalidate(self):
+        """Redraw everything on the next frame (e.g. after a resize)"""
+        self._full = True
+
+    def _merged_damage(self) -> list[pygame.Rect]:
+        screen = self.root.screen_rect()
+        rects = []
+        for rect in self.damaged:
+            rect = rect.clip(screen)
+            if not (rect.w and rect.h):
+                continue
+            # fold overlapping rectangles together until none overlap
+            hit = rect.collidelist(rects)
+            while hit >= 0:
+                rect = rect.union(rects.pop(hit))
+                hit = rect.collidelist(rects)
+            rects.append(rect)
+        return rects
+
+    def render(self) -> list[pygame.Rect]:
+        """Redraw the damaged areas and update them on the display.
+        Returns the updated rectangles"""
+        if self._full:
+            self.root.update()
+            rects = [self.root.screen_rect()]
+            self._full = False
+        else:
+            rects = self._merged_damage()
+        self.damaged = []
+        if not rects:
+            return rects
+        dsp = self.root.dsp
+        clip = dsp.get_clip()
+        for rect in rects:
+            dsp.set_clip(rect)
+            self._draw_pane(self.root, rect)
+        dsp.set_clip(clip)
+        pygame.display.update(rects)
+        return rects
+
+    def _draw_pane(self, pane: WindowPane, rect: pygame.Rect):
+        if not drawable_area(pane).colliderect(rect):
+            return
+        pane.draw_self()
+        index = self.indices.get(pane)
+        if index:
+            x0, y0 = pane.abs_to_rel_position(rect.topleft)
+            items = index.query_rect(x0, y0, x0 + rect.w - 1, y0 + rect.h - 1)
+            for item in sorted(items, key=self._order.get):
+                item.draw(pane)
+        for child in pane.children:
+            self._draw_pane(child, rect)
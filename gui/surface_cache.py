@@ -0,0 +1,65 @@
+from collections import OrderedDict
+
+import pygame
+
+
+class SurfaceCache:
+    """Pre-rendered surfaces by key, least recently used ones dropped once
+    they take more than `budget` bytes"""
+    def __init__(self, budget):
+        self.budget = budget
+        self.surfaces: OrderedDict[object: pygame.Surface] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    def __contains__(self, key):
+        return key in self.surfaces
+
+    @staticmethod
+    def _size(surf: pygame.Surface) -> int:
+        return surf.get_pitch() * surf.get_height()
+
+    def get(self, key) -> pygame.Surface | None:
+        surf = self.surfaces.get(key)
+        if surf is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.surfaces.move_to_end(key)
+        return surf
+
+    def put(self, key, surf: pygame.Surface):
+        """Cache a surface; one larger than the whole budget is not kept"""
+        self.discard(key)
+        size = self._size(surf)
+        if size > self.budget:
+            return
+        self.surfaces[key] = surf
+        self.bytes += size
+        while self.bytes > self.budget:
+            _, old = self.surfaces.popitem(last=False)
+            self.bytes -= self._size(old)
+            self.evictions += 1
+
+    def discard(self, key):
+        surf = self.surfaces.pop(key, None)
+        if surf is not None:
+            self.bytes -= self._size(surf)
+
+    def discard_if(self, predicate):
+        for key in [key for key in self.surfaces if predicate(key)]:
+            self.discard(key)
+
+    def clear(self):
+        self.surfaces.clear()
+        self.bytes = 0
+
+    def stats(self) -> str:
+        return (f"{len(self.surfaces)} surfaces, {self.bytes // 1024}/"
+                f"{self.budget // 1024}KiB, {self.hits} hits, "
+                f"{self.misses} misses, {self.evictions} evicted")
@@ -6,6 +6,9 @@ LOG_WARN = 4    # important mishaps
 LOG_FAIL = 5    # absolute failure
 LOG_SILENT_MODE = 6     # For setting floor
 LOG_SPACING = 4
+LOG_QUEUE_SIZE = 65536     # records waiting to be written before log() blocks
+LOG_BATCH_SIZE = 1024      # records written at once
+LOG_WRITE_DELAY = 0.005    # seconds the writer waits for more records
 
 SW_NAME = "LCST"
 SW_NAME_LONG = "Large Circuit Simulation Tool"
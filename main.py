@@ -29,6 +29,8 @@ if __name__ == "__main__":
         log_dedent()
         log(LOG_DEBG, "Finished loading packages!")
         log(LOG_INFO, f"Successfully loaded {loaded_package_count}/{len(package_list)} packages!")
+        # the log lines above are still queued for the writer thread
+        flush_logger()
         print(package_datas)
         tc = ServerData(package_datas)
         tc.newThread("server", launchServer, daemon=False)
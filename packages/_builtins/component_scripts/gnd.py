@@ -4,3 +4,4 @@ from quickrefs import *
 class GND(PluginComponent):
     _component_name = "GND"
     _component_file_path = "gnd.json"
+    _sim_model = "gnd"
@@ -4,3 +4,4 @@ from quickrefs import *
 class NMOS_FET(PluginComponent):
     _component_name = "N-MOSFET"
     _component_file_path = "nmos_fet.json"
+    _sim_model = "nmos"
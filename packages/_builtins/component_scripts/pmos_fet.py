@@ -4,3 +4,4 @@ from quickrefs import *
 class PMOS_FET(PluginComponent):
     _component_name = "P-MOSFET"
     _component_file_path = "pmos_fet.json"
+    _sim_model = "pmos"
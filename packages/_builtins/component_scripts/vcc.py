@@ -4,3 +4,4 @@ from quickrefs import *
 class VCC(PluginComponent):
     _component_name = "VCC"
     _component_file_path = "vcc.json"
+    _sim_model = "vcc"
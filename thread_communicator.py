@@ -97,4 +97,6 @@ class ServerData(ThreadCommunicator):
         self.package_datas = package_datas
         self.openProject: Project = None
         self.selectedComponent: str = None
+        self.simulator = None
+        self.truth_tables = None
         self.init()